@@ -0,0 +1,61 @@
+'''
+Core allocation for running matches side by side.
+
+Each match slot gets `CORES_PER_MATCH` cores of its own, and each player (thread or zygote child) is pinned to one of
+them. The players have those cores to themselves: the worker processes, with the engine, the DB writes and the zygote,
+all run on the `RESERVED_CORES`, shared with the rest of the box, so concurrency is capped at what's left.
+'''
+import os
+import statistics
+import time
+
+CORES_PER_MATCH = 2
+RESERVED_CORES = 1
+
+
+def usable_cores():
+	return sorted(os.sched_getaffinity(0))
+
+
+def plan_slots(cores=None, reserve=RESERVED_CORES, per_match=CORES_PER_MATCH):
+	'''
+	Split the usable cores into match slots. On a box too small for even one slot, returns a single unpinned slot
+	(None), so matches still run.
+	'''
+	cores = usable_cores() if cores is None else list(cores)
+	available = cores[reserve:] if len(cores) > reserve else []
+	slots = [tuple(available[i:i + per_match]) for i in range(0, len(available) - per_match + 1, per_match)]
+	return slots or [None]
+
+
+def reserved_cores(cores=None, reserve=RESERVED_CORES):
+	'''
+	The cores `plan_slots` leaves out, for the workers themselves; None if there are no slots to keep them off.
+	'''
+	cores = usable_cores() if cores is None else list(cores)
+	if plan_slots(cores, reserve) == [None]:
+		return None
+	return tuple(cores[:reserve])
+
+
+def pin(pid, cores):
+	'''
+	Restrict a process, or a thread given its native id, to `cores`; 0 is the calling thread, and threads it starts
+	afterwards inherit its cores. Does nothing for an unpinned slot.
+	'''
+	if cores:
+		os.sched_setaffinity(pid, cores)
+
+
+def measure_jitter(samples=100, interval=0.001):
+	'''
+	How late `time.sleep(interval)` wakes up, in seconds, as `(median, p99, max)`: a probe for how long a player can
+	be kept off its core by the scheduler and its neighbours.
+	'''
+	overshoots = []
+	for _ in range(samples):
+		start = time.perf_counter()
+		time.sleep(interval)
+		overshoots.append(time.perf_counter() - start - interval)
+	overshoots.sort()
+	return statistics.median(overshoots), overshoots[min(len(overshoots) - 1, int(len(overshoots) * 0.99))], overshoots[-1]
@@ -0,0 +1,188 @@
+'''
+Move old results out of `hack.db` so the queries and rebuilds that scan them stay fast.
+
+Rows of `ARCHIVED_TABLES` older than the horizon go into one SQLite file per month (by `cr_date`) under `archive/`
+next to the database, then the hot database is vacuumed. Official tournaments are never archived, so the official
+leaderboard doesn't change, and the `head_to_head` rollup is left as it is, so it still covers every game.
+
+`connect_history` attaches the archives to a connection and adds `all_<table>` views over hot and archived rows, for
+when history is needed:
+
+	python3 archive.py query "select p1, count(*) from all_pairing_results group by 1" --since 2020-10
+'''
+import argparse
+import logging
+import os
+import sqlite3
+
+import db
+
+LOGGER = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'archive'
+ARCHIVED_TABLES = ['pairing_results', 'pairing_series', 'tournament_results']
+
+# Archive rows older than this many days.
+HORIZON_DAYS = 30
+
+# SQLite attaches at most 10 databases to a connection unless it was built with more.
+MAX_ATTACHED = 10
+
+# The newest row always stays: with none left, SQLite would hand out ids the archives already have.
+ARCHIVABLE = '''
+	cr_date < datetime('now', ?)
+	and tournament_id not in (select tournament_id from main.official)
+	and id < (select max(id) from main.{table})
+'''
+
+
+def archive_dir():
+	return os.path.join(os.path.dirname(db.DB_FILE), ARCHIVE_DIR)
+
+
+def partition_path(month):
+	return os.path.join(archive_dir(), 'hack-%s.db' % (month, ))
+
+
+def partitions(since=None):
+	'''
+	Months with an archive, oldest first, from `since` ('YYYY-MM') on.
+	'''
+	if not os.path.isdir(archive_dir()):
+		return []
+	months = sorted(name[len('hack-'):-len('.db')] for name in os.listdir(archive_dir()) if name.startswith('hack-') and name.endswith('.db'))
+	return [month for month in months if since is None or month >= since]
+
+
+def columns(cur, schema, table):
+	cur.execute('select name from %s.pragma_table_info(?)' % (schema, ), (table, ))
+	return [name for (name, ) in cur.fetchall()]
+
+
+def prepare_partition(cur, table):
+	'''
+	Create `table` in the attached `part` with main's columns, or add the columns main has gained since.
+	'''
+	cur.execute('select name, type, pk from main.pragma_table_info(?) order by cid', (table, ))
+	definitions = cur.fetchall()
+	cur.execute('create table if not exists part.%s (%s)' % (table, ', '.join(
+		'%s %s%s' % (name, definition, ' primary key' if pk else '') for name, definition, pk in definitions
+	)))
+
+	existing = set(columns(cur, 'part', table))
+	for name, definition, _pk in definitions:
+		if name not in existing:
+			cur.execute('alter table part.%s add column %s %s' % (table, name, definition))
+
+
+def archive(days=HORIZON_DAYS, vacuum=True):
+	'''
+	Move every archivable row older than `days` into its month's partition. Returns `{table: rows moved}`.
+	'''
+	horizon = '-%d days' % (days, )
+	os.makedirs(archive_dir(), exist_ok=True)
+
+	# Autocommit, so each month's move is one explicit transaction across both files and ATTACH happens outside it.
+	conn = sqlite3.connect(db.DB_FILE, timeout=db.BUSY_TIMEOUT, isolation_level=None)
+	cur = conn.cursor()
+
+	months = set()
+	for table in ARCHIVED_TABLES:
+		cur.execute('select distinct substr(cr_date, 1, 7) from %s where %s' % (table, ARCHIVABLE.format(table=table)), (horizon, ))
+		months.update(month for (month, ) in cur.fetchall())
+
+	moved = dict.fromkeys(ARCHIVED_TABLES, 0)
+	for month in sorted(months):
+		cur.execute('attach database ? as part', (partition_path(month), ))
+		try:
+			cur.execute('begin immediate')
+			for table in ARCHIVED_TABLES:
+				prepare_partition(cur, table)
+				names = ', '.join(columns(cur, 'main', table))
+				where = '%s and substr(cr_date, 1, 7) = ?' % (ARCHIVABLE.format(table=table), )
+				cur.execute('insert into part.%s (%s) select %s from main.%s where %s' % (table, names, names, table, where), (horizon, month))
+				cur.execute('delete from main.%s where %s' % (table, where), (horizon, month))
+				moved[table] += cur.rowcount
+			cur.execute('commit')
+		except:
+			cur.execute('rollback')
+			raise
+		finally:
+			cur.execute('detach database part')
+
+		LOGGER.info('archived %s', month)
+		if vacuum:
+			part = sqlite3.connect(partition_path(month))
+			part.execute('vacuum')
+			part.close()
+
+	if vacuum and any(moved.values()):
+		LOGGER.info('vacuuming %s', db.DB_FILE)
+		cur.execute('vacuum')
+
+	conn.close()
+	return moved
+
+
+def connect_history(since=None):
+	'''
+	A connection to the database with the archives from `since` ('YYYY-MM') on attached, and a temporary
+	`all_<table>` view over the hot and archived rows of each archived table. The caller closes it.
+	'''
+	months = partitions(since)
+	if len(months) >= MAX_ATTACHED:
+		raise ValueError('%d months of archives, pass a later since to read at most %d' % (len(months), MAX_ATTACHED - 1))
+
+	conn = sqlite3.connect(db.DB_FILE, timeout=db.BUSY_TIMEOUT)
+	cur = conn.cursor()
+	for idx, month in enumerate(months):
+		cur.execute('attach database ? as part%d' % (idx, ), (partition_path(month), ))
+
+	for table in ARCHIVED_TABLES:
+		names = columns(cur, 'main', table)
+		selects = ['select %s from main.%s' % (', '.join(names), table)]
+		for idx in range(len(months)):
+			schema = 'part%d' % (idx, )
+			present = set(columns(cur, schema, table))
+			if not present:
+				continue
+			# Archived before a column was added: it's null there.
+			selects.append('select %s from %s.%s' % (
+				', '.join(name if name in present else 'null as ' + name for name in names),
+				schema,
+				table,
+			))
+		cur.execute('create temp view all_%s as %s' % (table, ' union all '.join(selects)))
+
+	return conn
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	archive_parser = subparsers.add_parser('archive', help='move old rows into the monthly archives')
+	archive_parser.add_argument('--days', type=int, default=HORIZON_DAYS, help='keep this many days in hack.db')
+	archive_parser.add_argument('--no-vacuum', action='store_true')
+
+	query_parser = subparsers.add_parser('query', help='run a query with the all_<table> views')
+	query_parser.add_argument('sql')
+	query_parser.add_argument('--since', help="first archived month to include, as 'YYYY-MM'")
+
+	args = parser.parse_args()
+
+	if args.command == 'archive':
+		for table, rows in archive(args.days, not args.no_vacuum).items():
+			print('%s: %d rows archived' % (table, rows))
+
+	elif args.command == 'query':
+		conn = connect_history(args.since)
+		for row in conn.execute(args.sql):
+			print('\t'.join(str(x) for x in row))
+		conn.close()
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	db.setupdb()
+	main()
@@ -6,6 +6,12 @@ set -o pipefail
 
 mkdir -p ./www/logs
 
+# Finish any tournaments that were interrupted, e.g. by the container restarting.
+for tournament_id in $(python3 ./engine.py --unfinished); do
+	echo "Resuming round $tournament_id"
+	python3 ./engine.py ${tournament_id} |& tee -a ./www/logs/${tournament_id}.txt
+done
+
 while :
 do
 	tournament_id=$(date +%s)
@@ -30,6 +36,9 @@ do
 			)
 		done
 
+		# what ran in this tournament; only changed files take up space
+		python3 ./snapshots.py take "tournament-${tournament_id}"
+
 		# run a tournament, .txt so the browser can show it without triggering a download (dirty hack)
 		python3 ./engine.py ${tournament_id}
 
@@ -41,8 +50,10 @@ do
 		break
 	fi
 
-	# update www
-	make -j4
+	# The pages make used to rebuild here are rendered on request by webapp.py now; make still builds a static copy.
+
+	# gzip the finished log for nginx's gzip_static
+	python3 ./compress.py www
 
 	sleep 1
 done
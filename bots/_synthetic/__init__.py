@@ -0,0 +1,79 @@
+'''
+A field of any size for scale testing, registered with the engine as the `synthetic` bot factory: `synthetic:<n>` is
+variant n. The leading underscore keeps the directory itself out of `Engine.get_players`.
+
+Each variant weights the card types differently and has its own habit of playing its last card again, all drawn from
+a generator seeded with n, so a name always plays the same way and a big field isn't a field of clones. Where there's a
+pool the deck is drawn from it with the same weights. They answer instantly, so what a scale run measures is the
+engine, not the bots.
+'''
+import random
+
+from collections import Counter
+
+from .. import base
+
+CARD_TYPES = 'RPSCLT'
+
+
+def names(count):
+	return [str(n) for n in range(count)]
+
+
+class SyntheticPlayer(base.Player):
+	def __init__(self, params, player_in_queue, player_out_queue):
+		super().__init__(player_in_queue, player_out_queue)
+		self.weights, self.stickiness = params
+		self.rng = random.Random()
+
+	def weight(self, card):
+		return self.weights[CARD_TYPES.index(card)]
+
+	def pick_deck(self, pool, size):
+		'''
+		Draw `size` cards from `pool` without replacement, favouring the cards this variant likes to play.
+		'''
+		remaining = Counter(pool)
+		deck = []
+		for _ in range(size):
+			cards = sorted(card for card, count in remaining.items() if count)
+			card = self.rng.choices(cards, [self.weight(x) * remaining[x] for x in cards])[0]
+			remaining[card] -= 1
+			deck.append(card)
+		return deck
+
+	def run(self):
+		header = self.receive()
+		if 'pool' in header:
+			self.send({'ready': True, 'deck': self.pick_deck(header['pool'], header['rounds'])})
+		else:
+			self.send({'ready': True})
+
+		last = None
+		for _ in range(header['rounds']):
+			deck = self.receive()['deck']
+			available = sorted(set(deck))
+			if last in available and self.rng.random() < self.stickiness:
+				card = last
+			else:
+				card = self.rng.choices(available, [self.weight(x) for x in available])[0]
+			self.send({'hand': card})
+			last = card
+			self.receive()
+
+
+class Variant:
+	'''
+	Stands in for a bot module: the engine only needs its `Player`.
+	'''
+
+	def __init__(self, n):
+		rng = random.Random(n)
+		self.params = ([rng.random() + 0.01 for _ in CARD_TYPES], rng.random() * 0.5)
+
+	def Player(self, player_in_queue, player_out_queue):
+		return SyntheticPlayer(self.params, player_in_queue, player_out_queue)
+
+
+def variant(name):
+	return Variant(int(name))
@@ -4,6 +4,8 @@ import sys
 from .. import base
 
 class Player(base.Player):
+	PROTOCOL = 2
+
 	def run(self):
 		header = self.receive()
 
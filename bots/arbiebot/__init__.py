@@ -3,7 +3,6 @@ import logging
 import random
 import sys
 
-from itertools import groupby
 from .. import base
 
 
@@ -28,39 +27,23 @@ class Player(base.Player):
 
 		self.send(setup)
 
-		original_pool = header['pool'].copy() if opp != 'chickenbot' else ['C'] * len(header['pool'])
-		opp_plays = []
+		if opp == 'chickenbot':
+			self.model.pool = base.PoolTracker(['C'] * len(header['pool']))
 
 		for _ in range(rounds):
 			round_header = self.receive()
-			deck = round_header['deck'].copy()
+			deck = round_header['deck']
 
-			opp_potential = original_pool.copy()
+			# self.model.pool drops each card the opponent plays as the round footers arrive.
+			most_likely = self.model.pool.most_likely()
 
-			for x in opp_plays:
-				try:
-					opp_potential.remove(x)
-				except ValueError:
-					pass
-
-			counts = {
-				card: len(list(cards))
-				for card, cards in groupby(opp_potential)
-			}
-
-			most_likely = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:1]
-
-			LOGGER.info('Orig. pool=%r', original_pool)
-			LOGGER.info('Opp. plays=%r', opp_plays)
-			LOGGER.info('Opp. poss.=%r', opp_potential)
-			LOGGER.info('Counts    =%r', counts)
+			LOGGER.info('Opp. poss.=%r', self.model.pool.counts)
 			LOGGER.info('Prediciton=%r', most_likely)
 
 			if not most_likely:
 				hand = random.choice(deck)
 			else:
-				card, _ = most_likely[0]
-				hand = self.opposite_of(card)
+				hand = self.opposite_of(most_likely)
 
 				if hand not in deck:
 					hand = random.choice(deck)
@@ -69,8 +52,7 @@ class Player(base.Player):
 				'hand': hand,
 			})
 
-			response = self.receive()
-			opp_plays.append(response['hands'][1 - idx])
+			self.receive()
 
 	@staticmethod
 	def opposite_of(hand):
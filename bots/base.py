@@ -1,10 +1,274 @@
+import json
+import os
+import pkgutil
+import random
+
+from collections import Counter, defaultdict, deque
+
+# Precomputed deck strategies from deckopt.py, keyed on 'gen:rounds'.
+DECK_TABLE = os.path.join(os.path.dirname(__file__), 'decks.json')
+
+_deck_table = None
+
+
+def choose_deck(game_header):
+	'''
+	Pick a deck for this game from the precomputed table, or None if it has no entry for this gen and number of rounds.
+	'''
+	global _deck_table
+	if _deck_table is None:
+		try:
+			# Through the package's loader, so this also works for a past version imported from a snapshot zip.
+			_deck_table = json.loads(pkgutil.get_data(__package__, os.path.basename(DECK_TABLE)))
+		except OSError:
+			_deck_table = {}
+
+	strategy = _deck_table.get('%d:%d' % (game_header['gen'], game_header['rounds']))
+	if not strategy:
+		return None
+
+	decks, weights = zip(*strategy.items())
+	return list(random.choices(decks, weights)[0])
+
+
+class PoolTracker:
+	'''
+	What the opponent could still have, starting from the pool and removing each card they play.
+	'''
+
+	def __init__(self, pool):
+		self.counts = Counter(pool)
+
+	def play(self, card):
+		if self.counts[card] > 0:
+			self.counts[card] -= 1
+
+	def most_likely(self):
+		card, count = max(self.counts.items(), key=lambda x: x[1], default=(None, 0))
+		return card if count > 0 else None
+
+
+class DeckCounts:
+	'''
+	Card counts for your own deck, updated from round footers rather than recounting `deck` every round.
+
+	When the opponent steals from you the footer doesn't say what they took, so the counts are rebuilt from the next
+	round header; that only happens after a theft.
+	'''
+
+	def __init__(self, deck=()):
+		self.counts = Counter(deck)
+		self.size = len(deck)
+		self.stale = not deck
+
+	def sync(self, deck):
+		if self.stale or len(deck) != self.size:
+			self.counts = Counter(deck)
+			self.size = len(deck)
+			self.stale = False
+
+	def remove(self, card):
+		self.counts[card] -= 1
+		self.size -= 1
+
+	def add(self, card):
+		self.counts[card] += 1
+		self.size += 1
+
+
+class NGramModel:
+	'''
+	Frequencies of the opponent's next play given their previous `n - 1` plays.
+	'''
+
+	def __init__(self, n=2):
+		self.n = n
+		self.context = deque(maxlen=n - 1)
+		self.counts = defaultdict(Counter)
+
+	def update(self, card):
+		self.counts[tuple(self.context)][card] += 1
+		self.context.append(card)
+
+	def predict(self):
+		return self.counts.get(tuple(self.context), Counter())
+
+
+class DeckEstimate:
+	'''
+	An estimate of the opponent's current deck.
+
+	`possible` is an upper bound on each card and `known` a lower bound, from Look results and cards stolen from you.
+	`size` is exact. In generations without a pool the deck is known from the start.
+	'''
+
+	def __init__(self, pool, size, exact=False):
+		self.possible = Counter(pool)
+		self.known = Counter(pool) if exact else Counter()
+		self.size = size
+
+	def remove(self, card):
+		if self.possible[card] > 0:
+			self.possible[card] -= 1
+		elif card == 'C':
+			# It's legal to pick a deck that's all Chicken, whatever the pool says.
+			self.possible = Counter({'C': self.size - 1})
+		if self.known[card] > 0:
+			self.known[card] -= 1
+		self.size -= 1
+
+	def gain(self, card, count=1):
+		self.possible[card] += count
+		self.known[card] += count
+
+	def look(self, cards):
+		for card, count in Counter(cards).items():
+			self.known[card] = max(self.known[card], count)
+			self.possible[card] = max(self.possible[card], count)
+
+	def probabilities(self):
+		unknown = self.size - sum(self.known.values())
+		spare = {card: max(0, count - self.known[card]) for card, count in self.possible.items()}
+		spare_total = sum(spare.values())
+
+		return {
+			card: (self.known[card] + (unknown * spare.get(card, 0) / spare_total if spare_total else 0)) / self.size
+			for card in set(self.possible) | set(self.known)
+		} if self.size else {}
+
+
+class OpponentModel:
+	'''
+	Trackers fed from every message a `Player` receives, so bots can use them without any bookkeeping of their own.
+
+	- `pool`: the opponent's remaining possible pool
+	- `own`: counts of your own deck
+	- `history`: n-gram model of the opponent's plays
+	- `deck`: Look/Take aware estimate of the opponent's deck
+	'''
+
+	def __init__(self, game_header, n=2):
+		rounds = game_header['rounds']
+		if 'pool' in game_header:
+			pool = game_header['pool']
+			self.deck = DeckEstimate(pool, rounds)
+		else:
+			# Gen0 and Gen1 decks are fixed by the generation.
+			pool = ['R', 'P', 'S'] * (rounds if game_header['gen'] == 0 else rounds // 3)
+			self.deck = DeckEstimate(pool, len(pool), exact=True)
+
+		self.pool = PoolTracker(pool)
+		self.own = DeckCounts()
+		self.history = NGramModel(n)
+
+	def round_header(self, round_header):
+		if self.own.stale and self.own.counts:
+			# The opponent stole from us last round; whatever is missing is now in their deck.
+			before = self.own.counts
+			self.own.sync(round_header['deck'])
+			for card, count in (before - self.own.counts).items():
+				self.deck.gain(card, count)
+		else:
+			self.own.sync(round_header['deck'])
+
+	def round_footer(self, round_footer):
+		idx = round_footer['idx']
+		mine, theirs = round_footer['hands'][idx], round_footer['hands'][1 - idx]
+		chicken = 'C' in (mine, theirs)
+
+		self.pool.play(theirs)
+		self.history.update(theirs)
+
+		# A Take returns the victim's card before stealing, unless the victim played Take too.
+		if not (mine == 'T' and theirs != 'T' and not chicken):
+			self.deck.remove(theirs)
+		if not (theirs == 'T' and mine != 'T' and not chicken):
+			self.own.remove(mine)
+
+		if 'took' in round_footer:
+			self.deck.remove(round_footer['took'])
+			self.own.add(round_footer['took'])
+
+		if 'lost' in round_footer:
+			# Protocol 2 says what was stolen, so there's nothing to resync.
+			self.own.remove(round_footer['lost'])
+			self.deck.gain(round_footer['lost'])
+			self.deck.size += 1
+		elif theirs == 'T' and not chicken and self.own.size:
+			# We lost a card but not which one; the next round header tells us.
+			self.own.size -= 1
+			self.own.stale = True
+			self.deck.size += 1
+
+		if 'look' in round_footer:
+			self.deck.look(round_footer['look'])
+
+
 class Player:
+	'''
+	Bots set `PROTOCOL = 2` to have the engine send only what changed each round. `receive` fills the messages back in,
+	so a bot sees the same `deck`, `hands` and `scores` either way; `deck` is the same list every round, updated in
+	place, so don't modify it.
+	'''
+
+	PROTOCOL = 1
+
 	def __init__(self, player_in_queue, player_out_queue):
 		self.player_in_queue = player_in_queue
 		self.player_out_queue = player_out_queue
+		self.model = None
+		self.protocol = 1
+		self.deck = None
+		self.scores = None
+		self.hand = None
 
 	def send(self, obj):
+		if 'ready' in obj and self.PROTOCOL != 1:
+			obj = dict(obj, protocol=self.PROTOCOL)
+			self.protocol = self.PROTOCOL
+			if 'deck' in obj:
+				self.deck = list(obj['deck'])
+		elif 'hand' in obj:
+			self.hand = obj['hand']
 		self.player_out_queue.put(obj)
 
 	def receive(self):
-		return self.player_in_queue.get()
+		obj = self.player_in_queue.get()
+		if self.protocol == 2:
+			self.expand(obj)
+		self.observe(obj)
+		return obj
+
+	def expand(self, obj):
+		if 'played' in obj:
+			idx = obj['idx']
+			self.deck.remove(self.hand)
+
+			# Same order as `BaseGame.apply`, so the deck matches what protocol 1 would have sent.
+			changes = [('returned', self.deck.append), ('took', self.deck.append), ('lost', self.deck.remove)]
+			if idx == 1:
+				changes[1], changes[2] = changes[2], changes[1]
+			for key, change in changes:
+				if key in obj:
+					change(obj[key])
+
+			self.scores = [score + payoff for score, payoff in zip(self.scores, obj['payoffs'])]
+			obj['scores'] = self.scores
+			obj['hands'] = [self.hand, obj['played']] if idx == 0 else [obj['played'], self.hand]
+
+		elif 'round' in obj:
+			if 'scores' in obj:
+				self.scores = obj['scores']
+			obj['deck'] = self.deck
+
+	def observe(self, obj):
+		if 'players' in obj:
+			self.model = OpponentModel(obj)
+			if 'deck' in obj:
+				self.deck = list(obj['deck'])
+		elif self.model is None:
+			return
+		elif 'hands' in obj:
+			self.model.round_footer(obj)
+		elif 'deck' in obj:
+			self.model.round_header(obj)
@@ -0,0 +1,136 @@
+import logging
+import math
+import random
+import time
+
+from .. import base
+from .. import sim
+
+LOGGER = logging.getLogger(__name__)
+
+# Well inside the 100ms move budget, leaving room for the engine and the other player's thread.
+BUDGET = 0.03
+
+# Cards to pad a short estimate of the opponent's deck with, when nothing better is known.
+FILLER = ('R', 'P', 'S')
+
+
+class Player(base.Player):
+	'''
+	Monte Carlo search: each candidate card is scored by random rollouts against a deck sampled from the opponent
+	model, with rollouts shared out between candidates by UCB1 until the time budget runs out.
+	'''
+
+	PROTOCOL = 2
+
+	def run(self):
+		header = self.receive()
+
+		rounds = header['rounds']
+
+		setup = {
+			'ready': True,
+		}
+
+		if 'pool' in header:
+			setup['deck'] = base.choose_deck(header) or self.balanced_deck(header['pool'], rounds)
+
+		self.send(setup)
+
+		scores = [0, 0]
+
+		for _ in range(rounds):
+			round_header = self.receive()
+
+			deadline = time.perf_counter() + BUDGET
+			hand, rollouts = self.search(round_header, scores, rounds, deadline)
+			LOGGER.info('round %d: %s after %d rollouts', round_header['round'], hand, rollouts)
+
+			self.send({
+				'hand': hand,
+			})
+
+			response = self.receive()
+			scores = response['scores']
+
+	@staticmethod
+	def balanced_deck(pool, rounds):
+		# Balanced R/P/S, as far as the pool allows; no special cards, so no card cost.
+		remaining = [card for card in pool if card in ('R', 'P', 'S')]
+		deck = []
+		for card in ['R', 'P', 'S'] * rounds:
+			if len(deck) == rounds:
+				break
+			if card in remaining:
+				remaining.remove(card)
+				deck.append(card)
+		return deck
+
+	def opponent_deck_sampler(self, size):
+		'''
+		Sample `size` cards the opponent could be holding. An estimate with too few cards is padded from the card types
+		it might hold, and one with too many is cut down, since a rollout needs exactly one card per remaining round.
+		'''
+		estimate = self.model.deck
+		known = list(estimate.known.elements())
+		spare = list((estimate.possible - estimate.known).elements())
+		unknown = min(len(spare), estimate.size - len(known))
+		filler = sorted(set(known + spare)) or FILLER
+
+		def sample():
+			deck = known + random.sample(spare, unknown)
+			if len(deck) < size:
+				deck += random.choices(filler, k=size - len(deck))
+			elif len(deck) > size:
+				deck = random.sample(deck, size)
+			return deck
+
+		return sample
+
+	def search(self, round_header, scores, rounds, deadline):
+		idx = round_header['idx']
+		deck = round_header['deck']
+		candidates = sorted(set(deck))
+		if len(candidates) == 1:
+			return candidates[0], 0
+
+		remaining = rounds - round_header['round'] + 1
+		sample_opponent_deck = self.opponent_deck_sampler(remaining)
+		totals = {card: 0.0 for card in candidates}
+		visits = {card: 0 for card in candidates}
+		n = 0
+
+		while n < len(candidates) or time.perf_counter() < deadline:
+			if n < len(candidates):
+				card = candidates[n]
+			else:
+				card = max(candidates, key=lambda x: totals[x] / visits[x] + math.sqrt(2 * math.log(n) / visits[x]))
+
+			theirs = sample_opponent_deck()
+			if not theirs:
+				break
+			decks = [None, None]
+			decks[idx] = deck
+			decks[1 - idx] = theirs
+			state = sim.State.new(decks, rounds, scores, round_header['round'])
+
+			hands = [None, None]
+			hands[idx] = card
+			hands[1 - idx] = random.choice(theirs)
+			state, _took = sim.step(state, hands)
+			state = sim.rollout(state)
+
+			# UCB1 wants rewards in [0, 1]. Each round moves the margin by at most one point, so the change in margin
+			# over the rest of the game goes from the worst loss at 1 / (2 * remaining + 1) up to 1, and both players
+			# dying, worse than any loss on points, is 0.
+			if state.dead:
+				value = 0.0
+			else:
+				gain = (state.scores[idx] - state.scores[1 - idx]) - (scores[idx] - scores[1 - idx])
+				value = (gain + remaining + 1) / (2 * remaining + 1)
+
+			totals[card] += value
+			visits[card] += 1
+			n += 1
+
+		return max(candidates, key=lambda x: totals[x] / visits[x] if visits[x] else -math.inf), n
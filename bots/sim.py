@@ -0,0 +1,170 @@
+'''
+A compact, immutable game state for lookahead search inside a bot.
+
+Decks are tuples of card counts, so a state is a handful of small tuples: "cloning" is just keeping a reference, and
+`step` returns a new state following the same rules as `game.BaseGame.apply`.
+'''
+import random
+
+from collections import namedtuple
+
+CARDS = ('R', 'P', 'S', 'C', 'L', 'T')
+INDEX = {card: i for i, card in enumerate(CARDS)}
+
+R, P, S, C, L, T = range(len(CARDS))
+
+BEATS = {(R, S), (P, R), (S, P)}
+
+
+class State(namedtuple('State', 'decks scores round total_rounds dead')):
+	'''
+	`decks` is a pair of count tuples indexed like `CARDS`, `dead` is set when both players played Chicken.
+	'''
+
+	@classmethod
+	def new(cls, decks, total_rounds, scores=(0, 0), round=1):
+		return cls(tuple(counts(deck) for deck in decks), tuple(scores), round, total_rounds, False)
+
+	@property
+	def over(self):
+		return self.dead or self.round > self.total_rounds
+
+	def hands(self, player_idx):
+		return [CARDS[i] for i, count in enumerate(self.decks[player_idx]) if count]
+
+	def deck(self, player_idx):
+		return [card for card, count in zip(CARDS, self.decks[player_idx]) for _ in range(count)]
+
+
+def counts(deck):
+	result = [0] * len(CARDS)
+	for card in deck:
+		result[INDEX[card]] += 1
+	return tuple(result)
+
+
+def draw(deck, rng=random):
+	'''
+	Pick a card index from a count tuple, weighted by count; `random.choice` over the expanded deck.
+	'''
+	x = rng.randrange(sum(deck))
+	for i, count in enumerate(deck):
+		x -= count
+		if x < 0:
+			return i
+
+
+def step(state, hands, rng=random):
+	'''
+	Play one round. `hands` are card letters; returns `(state, took)` where `took` is the stolen card (or None) for
+	each player. Playing a card that isn't in the deck raises ValueError.
+	'''
+	if state.over:
+		raise ValueError('game is over')
+
+	cards = [INDEX[hand] for hand in hands]
+	decks = [list(state.decks[0]), list(state.decks[1])]
+
+	for player_idx, card in enumerate(cards):
+		if not decks[player_idx][card]:
+			raise ValueError('invalid card: %s' % (hands[player_idx], ))
+
+	chickens = [card == C for card in cards]
+	if all(chickens):
+		return state._replace(scores=(-1, -1), round=state.total_rounds + 1, dead=True), [None, None]
+
+	if L in cards:
+		payoffs = (0, 0)
+	elif any(chickens):
+		payoffs = (int(chickens[0]), int(chickens[1]))
+	elif cards[0] in (C, L, T) and cards[1] in (C, L, T):
+		payoffs = (0, 0)
+	elif T in cards:
+		payoffs = (int(cards[0] != T), int(cards[1] != T))
+	elif (cards[0], cards[1]) in BEATS:
+		payoffs = (1, 0)
+	elif (cards[1], cards[0]) in BEATS:
+		payoffs = (0, 1)
+	else:
+		payoffs = (0, 0)
+
+	for player_idx, card in enumerate(cards):
+		decks[player_idx][card] -= 1
+
+	took = [None, None]
+	if not any(chickens):
+		for player_idx, card in enumerate(cards):
+			if card != T:
+				continue
+
+			victim = decks[1 - player_idx]
+			if cards[1 - player_idx] != T:
+				victim[cards[1 - player_idx]] += 1
+
+			if any(victim):
+				stolen = draw(victim, rng)
+				victim[stolen] -= 1
+				decks[player_idx][stolen] += 1
+				took[player_idx] = CARDS[stolen]
+
+	scores = (state.scores[0] + payoffs[0], state.scores[1] + payoffs[1])
+	return State((tuple(decks[0]), tuple(decks[1])), scores, state.round + 1, state.total_rounds, False), took
+
+
+def _payoff(a, b):
+	decks = [[0] * len(CARDS), [0] * len(CARDS)]
+	decks[0][a] += 1
+	decks[1][b] += 1
+	state, _took = step(State((tuple(decks[0]), tuple(decks[1])), (0, 0), 1, 1, False), [CARDS[a], CARDS[b]])
+	return None if state.dead else state.scores
+
+
+# Per-round payoffs for every pair of cards, or None when both players die. Take also moves cards, so it goes
+# through `step` instead.
+PAYOFFS = [[_payoff(a, b) for b in range(len(CARDS))] for a in range(len(CARDS))]
+
+
+def rollout(state, rng=random):
+	'''
+	Play the rest of the game with both players picking uniformly from their decks; returns the final state.
+	'''
+	while not state.over:
+		state, hands = _shuffled_rollout(state, rng)
+		if hands is not None:
+			state, _took = step(state, hands, rng)
+	return state
+
+
+def _shuffled_rollout(state, rng):
+	# Until somebody plays Take the decks only shrink, so uniform play is the same as shuffling each deck and playing
+	# in order. Stops at the first Take, returning the hands for that round so the caller can `step` it.
+	remaining = state.total_rounds - state.round + 1
+	hands = [
+		rng.sample([i for i, count in enumerate(deck) for _ in range(count)], remaining)
+		for deck in state.decks
+	]
+
+	p1_score, p2_score = state.scores
+	played = 0
+	take = None
+	for a, b in zip(*hands):
+		if a == T or b == T:
+			take = [CARDS[a], CARDS[b]]
+			break
+
+		payoff = PAYOFFS[a][b]
+		if payoff is None:
+			return state._replace(scores=(-1, -1), round=state.total_rounds + 1, dead=True), None
+
+		played += 1
+		p1_score += payoff[0]
+		p2_score += payoff[1]
+
+	decks = []
+	for deck, cards in zip(state.decks, hands):
+		deck = list(deck)
+		for card in cards[:played]:
+			deck[card] -= 1
+		decks.append(tuple(deck))
+
+	return State(tuple(decks), (p1_score, p2_score), state.round + played, state.total_rounds, False), take
@@ -0,0 +1,155 @@
+'''
+Forecast tournament outcomes from head-to-head results instead of running live tournaments.
+
+Pairwise win/loss/draw/chicken probabilities are estimated from the `head_to_head` rollup, then each bracket laid out by
+`Engine.allocate_tournament` is solved exactly by dynamic programming. Seedings are random, so the per-bracket results
+are averaged over sampled seedings.
+'''
+import argparse
+import logging
+import random
+
+from collections import defaultdict
+
+from db import head_to_head, latest_engine_params
+from engine import Engine
+
+LOGGER = logging.getLogger(__name__)
+
+# Pseudo-counts added to every pair as (wins, losses, draws, chickens); an unseen pair is a coin flip.
+PRIOR = (1, 1, 0, 0)
+
+
+def leaderboard_score(elimination_round):
+	# Mirrors the scoring in web/leaderboard.py.
+	return max(0, elimination_round * 3 + 10)
+
+
+def outcome_matrix(counts, prior=PRIOR):
+	'''
+	Build `{(a, b): (win, loss, draw, chicken)}` probabilities from `(p1, p2, p1_wins, p2_wins, draws, chickens)` rows.
+
+	Seat order does not change the rules, so both orderings of a pair are pooled.
+	'''
+	totals = defaultdict(lambda: [0, 0, 0, 0])
+	for p1, p2, p1_wins, p2_wins, draws, chickens in counts:
+		for key, outcome in [
+			((p1, p2), (p1_wins, p2_wins, draws, chickens)),
+			((p2, p1), (p2_wins, p1_wins, draws, chickens)),
+		]:
+			for i, count in enumerate(outcome):
+				totals[key][i] += count or 0
+
+	matrix = {}
+	for key, outcome in totals.items():
+		outcome = [count + pseudo for count, pseudo in zip(outcome, prior)]
+		total = sum(outcome)
+		matrix[key] = tuple(count / total for count in outcome)
+
+	return matrix
+
+
+def pair_probabilities(matrix, a, b, prior=PRIOR):
+	'''
+	Return `(a advances, b advances, both eliminated)` for a pairing, splitting draws evenly as `run_pairing` does.
+	'''
+	win, loss, draw, chicken = matrix.get((a, b)) or [x / sum(prior) for x in prior]
+	return win + draw / 2, loss + draw / 2, chicken
+
+
+def bracket_distribution(layout, matrix):
+	'''
+	Solve one bracket exactly.
+
+	Returns `{player: {elimination_round: probability}}` using the `elimination_round` numbering of
+	`save_tournament_result`: 0 for the winner, -1 for the losing finalist and so on.
+	'''
+	total_rounds = (len(layout) - 1).bit_length()
+	eliminations = defaultdict(lambda: defaultdict(float))
+
+	# Each slot holds a distribution over who occupies it; None is an empty slot (a bye or a double chicken).
+	slots = [{player: 1.0} for player in layout]
+
+	for t_round in range(total_rounds):
+		elimination_round = t_round - total_rounds
+		next_slots = []
+		for i in range(0, len(slots), 2):
+			winners = defaultdict(float)
+			for a, p_a in slots[i].items():
+				for b, p_b in slots[i + 1].items():
+					p = p_a * p_b
+					if a is None or b is None:
+						winners[b if a is None else a] += p
+						continue
+
+					a_wins, b_wins, chicken = pair_probabilities(matrix, a, b)
+					winners[a] += p * a_wins
+					winners[b] += p * b_wins
+					winners[None] += p * chicken
+					eliminations[a][elimination_round] += p * (b_wins + chicken)
+					eliminations[b][elimination_round] += p * (a_wins + chicken)
+
+			next_slots.append(winners)
+		slots = next_slots
+
+	for player, p in slots[0].items():
+		if player is not None:
+			eliminations[player][0] += p
+
+	return eliminations
+
+
+def forecast(players, matrix, samples=1000):
+	'''
+	Average `bracket_distribution` over `samples` random seedings from `Engine.allocate_tournament`.
+	'''
+	totals = defaultdict(lambda: defaultdict(float))
+	for _ in range(samples):
+		layout = Engine.allocate_tournament(list(players))
+		for player, rounds in bracket_distribution(layout, matrix).items():
+			for elimination_round, p in rounds.items():
+				totals[player][elimination_round] += p / samples
+
+	return totals
+
+
+def expected_score(rounds):
+	return sum(p * leaderboard_score(elimination_round) for elimination_round, p in rounds.items())
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--gen', type=int, help='generation to use results from (default: latest)')
+	parser.add_argument('--samples', type=int, default=1000, help='number of random seedings to average over')
+	parser.add_argument('--players', help='comma separated field (default: every bot in bots/)')
+	args = parser.parse_args()
+
+	gen, rounds = latest_engine_params()
+	if args.gen is not None:
+		gen = args.gen
+
+	if args.players:
+		players = args.players.split(',')
+	else:
+		players = list(Engine(None, gen, rounds).get_players())
+
+	matrix = outcome_matrix([
+		(player, opponent, wins, losses, draws, chickens)
+		for player, opponent, _games, wins, losses, draws, _fouls, chickens, _for, _against in head_to_head(gen)
+		if player < opponent
+	])
+	results = forecast(players, matrix, args.samples)
+
+	total_rounds = (len(players) - 1).bit_length()
+	print('%-16s %8s  %s' % ('player', 'score', '  '.join('%6d' % r for r in range(-total_rounds, 1))))
+	for player in sorted(players, key=lambda x: expected_score(results[x]), reverse=True):
+		print('%-16s %8.2f  %s' % (
+			player,
+			expected_score(results[player]),
+			'  '.join('%6.3f' % results[player][r] for r in range(-total_rounds, 1)),
+		))
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.WARNING)
+	main()
@@ -0,0 +1,120 @@
+'''
+Write compressed copies of the site next to the originals, for nginx's `gzip_static` (and `brotli_static`, where nginx
+has the brotli module) to serve without compressing anything per request.
+
+Every log, stylesheet and script under `www/` gets a `.gz` sibling, and a `.br` one if the `brotli` package is
+installed. HTML pages are left alone, since nginx passes them to webapp.py, which compresses its own. Runs are
+incremental: a sibling carries its original's modification time, so only new or changed files are compressed again,
+and siblings whose original is gone are removed. Logs of tournaments that are still running are left until they're
+finished.
+'''
+import argparse
+import gzip
+import logging
+import os
+
+import db
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+LOGGER = logging.getLogger(__name__)
+
+SITE_DIR = 'www'
+# Served by nginx from disk; `.html` is proxied to webapp.py.
+SUFFIXES = ('.txt', '.css', '.js')
+
+
+def encoders():
+	yield '.gz', lambda data, mtime: gzip.compress(data, 9, mtime=mtime)
+	if brotli is not None:
+		yield '.br', lambda data, _mtime: brotli.compress(data, quality=11)
+
+
+def is_finished(path, unfinished):
+	'''
+	Logs are appended to while their tournament runs, which holds a checkpoint until it's done; everything else is
+	written in one go.
+	'''
+	name, ext = os.path.splitext(os.path.basename(path))
+	return ext != '.txt' or name not in unfinished
+
+
+def compress_file(path, stat):
+	'''
+	Bring `path`'s compressed siblings up to date; returns how many were written.
+	'''
+	written = 0
+	data = None
+	for suffix, encode in encoders():
+		target = path + suffix
+		try:
+			if os.stat(target).st_mtime_ns == stat.st_mtime_ns:
+				continue
+		except FileNotFoundError:
+			pass
+
+		if data is None:
+			with open(path, 'rb') as f:
+				data = f.read()
+
+		tmp = target + '.tmp'
+		with open(tmp, 'wb') as f:
+			f.write(encode(data, int(stat.st_mtime)))
+		os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+		os.replace(tmp, target)
+		written += 1
+	return written
+
+
+def compress_site(path=SITE_DIR, unfinished=None):
+	'''
+	Returns `(written, removed)` counts of compressed files.
+	'''
+	unfinished = set(db.unfinished_tournaments()) if unfinished is None else unfinished
+	suffixes = [suffix for suffix, _encode in encoders()]
+
+	written = removed = 0
+	for root, _dirs, files in os.walk(path):
+		for name in files:
+			full = os.path.join(root, name)
+			base, ext = os.path.splitext(full)
+			if ext in ('.gz', '.br'):
+				if ext not in suffixes or os.path.splitext(base)[1] not in SUFFIXES or not os.path.exists(base):
+					LOGGER.info('removing %s', full)
+					os.unlink(full)
+					removed += 1
+				continue
+
+			if ext not in SUFFIXES:
+				continue
+
+			stat = os.stat(full)
+			if is_finished(full, unfinished):
+				written += compress_file(full, stat)
+				continue
+
+			# Changing under us: rather than let nginx serve an out of date copy, serve the original until it's done.
+			for suffix in suffixes:
+				if os.path.exists(full + suffix):
+					os.unlink(full + suffix)
+					removed += 1
+
+	return written, removed
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('path', nargs='?', default=SITE_DIR)
+	args = parser.parse_args()
+
+	written, removed = compress_site(args.path)
+	LOGGER.info('compressed %d files, removed %d stale ones', written, removed)
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	db.setupdb()
+	main()
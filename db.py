@@ -1,7 +1,14 @@
+import json
 import sqlite3
+import time
 
 DB_FILE = 'hack.db'
 
+# Several arena workers can write at once, so wait rather than fail on a locked database.
+BUSY_TIMEOUT = 30
+
+MAX_JOB_ATTEMPTS = 3
+
 SCHEMA = [
 '''
 create table if not exists aliases (
@@ -58,17 +65,196 @@ create table if not exists tournament_results (
 	cr_date timestamp default current_timestamp
 );
 ''',
+'''
+create table if not exists head_to_head (
+	gen integer not null,
+	player text not null,
+	opponent text not null,
+	games integer not null default 0,
+	wins integer not null default 0,
+	losses integer not null default 0,
+	draws integer not null default 0,
+	fouls integer not null default 0,
+	chickens integer not null default 0,
+	score_for real not null default 0,
+	score_against real not null default 0,
+	primary key (gen, player, opponent)
+);
+''',
+'''
+create table if not exists jobs (
+	id integer primary key,
+	kind text not null,
+	payload text not null,
+	status text not null default 'pending',
+	worker text,
+	lease_expires real,
+	attempts integer not null default 0,
+	error text,
+	cr_date timestamp default current_timestamp,
+	done_date timestamp
+);
+''',
+'create index if not exists jobs_status on jobs (status, id);',
+'''
+create table if not exists tournament_checkpoints (
+	tournament_id text primary key,
+	gen integer not null,
+	rounds integer not null,
+	state text not null,
+	cr_date timestamp default current_timestamp,
+	updated timestamp default current_timestamp
+);
+''',
+'''
+create table if not exists tournament_pairings (
+	tournament_id text not null,
+	round integer not null,
+	pairing integer not null,
+	winner text,
+	primary key (tournament_id, round, pairing)
+);
+''',
+'''
+create table if not exists pairing_series (
+	id integer primary key,
+	tournament_id text not null,
+	gen integer not null,
+	p1 text not null,
+	p2 text not null,
+	games integer not null,
+	p1_wins integer not null,
+	p2_wins integer not null,
+	draws integer not null,
+	chickens integer not null,
+	winner text,
+	cr_date timestamp default current_timestamp
+);
+''',
+'''
+create table if not exists worker_jitter (
+	id integer primary key,
+	worker text not null,
+	cores text,
+	median real not null,
+	p99 real not null,
+	max real not null,
+	cr_date timestamp default current_timestamp
+);
+''',
+'''
+create table if not exists bot_versions (
+	player text primary key,
+	source_hash text not null,
+	since timestamp not null
+);
+''',
+'''
+create table if not exists league_results (
+	id integer primary key,
+	gen integer not null,
+	p1 text not null,
+	p1_hash text not null,
+	p2 text not null,
+	p2_hash text not null,
+	winner integer not null,
+	cr_date timestamp default current_timestamp
+);
+''',
+'create index if not exists league_results_hashes on league_results (gen, p1_hash, p2_hash);',
+]
+
+# Columns added after their table was first created: `(table, column, definition)`.
+COLUMNS = [
+	('pairing_results', 'p1_peak_mem', 'integer'),
+	('pairing_results', 'p2_peak_mem', 'integer'),
+	('pairing_results', 'foul_reason', 'text'),
 ]
 
+# One row per seat, so both bots see the pairing from their own side.
+HEAD_TO_HEAD_UPSERT = '''
+insert into head_to_head
+(gen, player, opponent, games, wins, losses, draws, fouls, chickens, score_for, score_against)
+values (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+on conflict (gen, player, opponent) do update set
+	games = games + excluded.games,
+	wins = wins + excluded.wins,
+	losses = losses + excluded.losses,
+	draws = draws + excluded.draws,
+	fouls = fouls + excluded.fouls,
+	chickens = chickens + excluded.chickens,
+	score_for = score_for + excluded.score_for,
+	score_against = score_against + excluded.score_against
+'''
+
+HEAD_TO_HEAD_REBUILD = '''
+insert into head_to_head
+(gen, player, opponent, games, wins, losses, draws, fouls, chickens, score_for, score_against)
+select
+	gen,
+	player,
+	opponent,
+	count(*),
+	sum(score_for > score_against and outcome != 'chicken'),
+	sum(score_for < score_against and outcome != 'chicken'),
+	sum(score_for = score_against and outcome != 'chicken'),
+	sum(score_for < score_against and outcome = 'foul'),
+	sum(outcome = 'chicken'),
+	sum(score_for),
+	sum(score_against)
+from (
+	select gen, p1 as player, p2 as opponent, p1_score as score_for, p2_score as score_against, outcome from pairing_results
+	union all
+	select gen, p2, p1, p2_score, p1_score, outcome from pairing_results
+)
+where outcome != 'load failed'
+group by 1, 2, 3
+'''
+
+
+def head_to_head_params(gen, player, score_for, opponent, score_against, outcome):
+	chicken = outcome == 'chicken'
+	return (
+		gen,
+		player,
+		opponent,
+		not chicken and score_for > score_against,
+		not chicken and score_for < score_against,
+		not chicken and score_for == score_against,
+		outcome == 'foul' and score_for < score_against,
+		chicken,
+		score_for,
+		score_against,
+	)
+
 
 def setupdb():
-	conn = sqlite3.connect(DB_FILE)
+	# One write transaction, so workers and engines starting together take turns: only the one that creates the head to
+	# head rollup backfills it.
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT, isolation_level=None)
 	cur = conn.cursor()
-	for statement in SCHEMA:
-		cur.execute(statement)
+	cur.execute('begin immediate')
+	try:
+		cur.execute("select exists (select 1 from sqlite_master where type = 'table' and name = 'head_to_head')")
+		(has_head_to_head, ) = cur.fetchone()
 
-	conn.commit()
-	conn.close()
+		for statement in SCHEMA:
+			cur.execute(statement)
+
+		for table, column, definition in COLUMNS:
+			cur.execute('select name from pragma_table_info(?)', (table, ))
+			if column not in {name for (name, ) in cur.fetchall()}:
+				cur.execute('alter table %s add column %s %s' % (table, column, definition))
+
+		if not has_head_to_head:
+			cur.execute(HEAD_TO_HEAD_REBUILD)
+
+		cur.execute('commit')
+	except:
+		cur.execute('rollback')
+		raise
+	finally:
+		conn.close()
 
 
 def latest_engine_params():
@@ -84,13 +270,43 @@ def latest_engine_params():
 	return params or (0, 50)
 
 
-def save_pairing_result(tournament_id, gen, p1_bot_name, p1_score, p2_bot_name, p2_score, outcome):
-	conn = sqlite3.connect(DB_FILE)
+class LeaseLost(Exception):
+	pass
+
+
+def check_lease(cur, lease):
+	'''
+	Start the write transaction on `cur` and make sure the worker still holds `lease`, a `(job_id, worker)`, so a worker
+	whose lease expired can't record a result the worker that reclaimed the job will record too. No lease, no check.
+	'''
+	if lease is None:
+		return
+	job_id, worker = lease
+	cur.execute('begin immediate')
+	cur.execute("select 1 from jobs where id = ? and worker = ? and status = 'leased'", (job_id, worker))
+	if cur.fetchone() is None:
+		cur.execute('rollback')
+		raise LeaseLost('lost the lease on job %d' % (job_id, ))
+
+
+def save_pairing_result(tournament_id, gen, p1_bot_name, p1_score, p2_bot_name, p2_score, outcome, peak_mem=(None, None), foul_reason=None, lease=None):
+	'''
+	`peak_mem` is each player's peak memory in bytes, where it was measured. `lease` is as for `check_lease`.
+	'''
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
 	cur = conn.cursor()
+	check_lease(cur, lease)
+	insert_pairing_result(cur, tournament_id, gen, p1_bot_name, p1_score, p2_bot_name, p2_score, outcome, peak_mem, foul_reason)
+
+	conn.commit()
+	conn.close()
+
+
+def insert_pairing_result(cur, tournament_id, gen, p1_bot_name, p1_score, p2_bot_name, p2_score, outcome, peak_mem=(None, None), foul_reason=None):
 	cur.execute('''
 	insert into pairing_results
-	(tournament_id, gen, p1, p1_score, p2, p2_score, outcome)
-	values (?, ?, ?, ?, ?, ?, ?)''', (
+	(tournament_id, gen, p1, p1_score, p2, p2_score, outcome, p1_peak_mem, p2_peak_mem, foul_reason)
+	values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (
 		tournament_id,
 		gen,
 		p1_bot_name,
@@ -98,14 +314,279 @@ def save_pairing_result(tournament_id, gen, p1_bot_name, p1_score, p2_bot_name,
 		p2_bot_name,
 		p2_score,
 		outcome,
+		peak_mem[0],
+		peak_mem[1],
+		foul_reason,
+	))
+	# A player that couldn't be loaded didn't play a game, and neither did its opponent.
+	if outcome != 'load failed':
+		cur.executemany(HEAD_TO_HEAD_UPSERT, [
+			head_to_head_params(gen, p1_bot_name, p1_score, p2_bot_name, p2_score, outcome),
+			head_to_head_params(gen, p2_bot_name, p2_score, p1_bot_name, p1_score, outcome),
+		])
+
+def head_to_head(gen):
+	conn = sqlite3.connect(DB_FILE)
+	cur = conn.cursor()
+	cur.execute('''
+	select player, opponent, games, wins, losses, draws, fouls, chickens, score_for, score_against
+	from head_to_head
+	where gen = ?''', (gen, ))
+
+	rows = cur.fetchall()
+
+	conn.commit()
+	conn.close()
+
+	return rows
+
+def save_worker_jitter(worker, cores, median, p99, maximum):
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	cur.execute('''
+	insert into worker_jitter (worker, cores, median, p99, max)
+	values (?, ?, ?, ?, ?)''', (worker, ','.join(map(str, cores)) if cores else None, median, p99, maximum))
+
+	conn.commit()
+	conn.close()
+
+
+def bot_versions():
+	'''
+	`{player: (source_hash, since)}`; `since` is when that source was first seen, or '' if it predates tracking.
+	'''
+	conn = sqlite3.connect(DB_FILE)
+	cur = conn.cursor()
+	cur.execute('select player, source_hash, since from bot_versions')
+
+	versions = {player: (source_hash, since) for player, source_hash, since in cur.fetchall()}
+
+	conn.commit()
+	conn.close()
+
+	return versions
+
+
+def save_bot_version(player, source_hash, since=None):
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	cur.execute('''
+	insert into bot_versions (player, source_hash, since)
+	values (?, ?, coalesce(?, current_timestamp))
+	on conflict (player) do update set
+		source_hash = excluded.source_hash,
+		since = excluded.since
+	where source_hash != excluded.source_hash''', (player, source_hash, since))
+
+	conn.commit()
+	conn.close()
+
+
+def pair_outcomes(gen):
+	'''
+	Win counts per pair, split by whether the games were played against both bots' current versions.
+
+	Returns `(p1, p2, current, games, p1_wins, p2_wins)` rows with p1 < p2; chickens and draws are neither player's win.
+	The totals come from the `head_to_head` rollup, which covers every game. Which of them were current is read from
+	`archive.connect_history`, so games moved into the archives still count, except ones older than the archives it can
+	attach, which count as not current.
+	'''
+	import archive
+
+	months = archive.partitions()
+	# `connect_history` attaches at most MAX_ATTACHED - 1 months, so read from the oldest of the latest that many.
+	first_month = months[max(0, len(months) - (archive.MAX_ATTACHED - 1))] if months else None
+	conn = archive.connect_history(first_month)
+	cur = conn.cursor()
+	cur.execute('''
+	select player, opponent, games, wins, losses
+	from head_to_head
+	where gen = ? and player < opponent''', (gen, ))
+	totals = cur.fetchall()
+
+	cur.execute('''
+	select
+		min(r.p1, r.p2),
+		max(r.p1, r.p2),
+		count(*),
+		sum(r.outcome != 'chicken' and case when r.p1 < r.p2 then r.p1_score > r.p2_score else r.p2_score > r.p1_score end),
+		sum(r.outcome != 'chicken' and case when r.p1 < r.p2 then r.p2_score > r.p1_score else r.p1_score > r.p2_score end)
+	from all_pairing_results r
+	left join bot_versions v1 on v1.player = r.p1
+	left join bot_versions v2 on v2.player = r.p2
+	where r.gen = ? and r.outcome != 'load failed' and r.cr_date >= max(coalesce(v1.since, ''), coalesce(v2.since, ''))
+	group by 1, 2''', (gen, ))
+	current = {(p1, p2): (games, p1_wins, p2_wins) for p1, p2, games, p1_wins, p2_wins in cur.fetchall()}
+
+	conn.close()
+
+	rows = []
+	for p1, p2, games, p1_wins, p2_wins in totals:
+		current_games, current_p1_wins, current_p2_wins = current.get((p1, p2), (0, 0, 0))
+		if current_games:
+			rows.append((p1, p2, 1, current_games, current_p1_wins, current_p2_wins))
+		if games > current_games:
+			rows.append((p1, p2, 0, games - current_games, p1_wins - current_p1_wins, p2_wins - current_p2_wins))
+
+	return rows
+
+
+def save_league_result(gen, p1_bot_name, p1_hash, p2_bot_name, p2_hash, winner):
+	'''
+	`winner` is 1 or 2, or 0 for a draw or chicken.
+	'''
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	cur.execute(
+		'insert into league_results (gen, p1, p1_hash, p2, p2_hash, winner) values (?, ?, ?, ?, ?, ?)',
+		(gen, p1_bot_name, p1_hash, p2_bot_name, p2_hash, winner),
+	)
+
+	conn.commit()
+	conn.close()
+
+
+def league_outcomes(gen):
+	'''
+	Returns `(p1_hash, p2_hash, games, p1_wins, p2_wins)` rows, by the versions that played rather than their names.
+	'''
+	conn = sqlite3.connect(DB_FILE)
+	cur = conn.cursor()
+	cur.execute('''
+	select p1_hash, p2_hash, count(*), sum(winner = 1), sum(winner = 2)
+	from league_results
+	where gen = ?
+	group by 1, 2''', (gen, ))
+
+	rows = cur.fetchall()
+
+	conn.commit()
+	conn.close()
+
+	return rows
+
+
+def save_checkpoint(tournament_id, gen, rounds, state, lease=None):
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	check_lease(cur, lease)
+	cur.execute('''
+	insert into tournament_checkpoints
+	(tournament_id, gen, rounds, state)
+	values (?, ?, ?, ?)
+	on conflict (tournament_id) do update set
+		state = excluded.state,
+		updated = current_timestamp''', (
+		tournament_id,
+		gen,
+		rounds,
+		json.dumps(state),
 	))
 
 	conn.commit()
 	conn.close()
 
-def save_tournament_result(tournament_id, rankings):
+
+def load_checkpoint(tournament_id):
+	conn = sqlite3.connect(DB_FILE)
+	cur = conn.cursor()
+	cur.execute('select gen, rounds, state from tournament_checkpoints where tournament_id = ?', (tournament_id, ))
+
+	row = cur.fetchone()
+	if row is None:
+		conn.close()
+		return None
+
+	gen, rounds, state = row
+	state = json.loads(state)
+
+	# The checkpoint is saved as each round starts; how far the round got is in `tournament_pairings`.
+	cur.execute(
+		'select winner from tournament_pairings where tournament_id = ? and round = ? order by pairing',
+		(tournament_id, len(state['player_last_rounds'])),
+	)
+	state['next_players'] = [winner for (winner, ) in cur.fetchall()]
+
+	conn.commit()
+	conn.close()
+
+	return gen, rounds, state
+
+
+def unfinished_tournaments():
 	conn = sqlite3.connect(DB_FILE)
 	cur = conn.cursor()
+	cur.execute('select tournament_id from tournament_checkpoints order by cr_date')
+
+	tournament_ids = [tournament_id for (tournament_id, ) in cur]
+
+	conn.commit()
+	conn.close()
+
+	return tournament_ids
+
+
+def save_pairing_series(tournament_id, gen, p1_bot_name, p2_bot_name, games, wins, draws, chickens, winner, lease=None):
+	'''
+	Summary of a best-of-N pairing; the games themselves are in `pairing_results`. `winner` is None if nobody went
+	through.
+	'''
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	check_lease(cur, lease)
+	insert_pairing_series(cur, tournament_id, gen, p1_bot_name, p2_bot_name, games, wins, draws, chickens, winner)
+
+	conn.commit()
+	conn.close()
+
+
+def insert_pairing_series(cur, tournament_id, gen, p1_bot_name, p2_bot_name, games, wins, draws, chickens, winner):
+	cur.execute('''
+	insert into pairing_series
+	(tournament_id, gen, p1, p2, games, p1_wins, p2_wins, draws, chickens, winner)
+	values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (
+		tournament_id,
+		gen,
+		p1_bot_name,
+		p2_bot_name,
+		games,
+		wins[0],
+		wins[1],
+		draws,
+		chickens,
+		winner,
+	))
+
+
+def save_pairing(tournament_id, t_round, pairing, winner, results=(), series=(), lease=None):
+	'''
+	Record that `winner` (None if nobody) went through from pairing `pairing` of round `t_round`, along with the
+	pairing's games and series, as argument tuples for `save_pairing_result` and `save_pairing_series` less the
+	tournament id. One transaction, so a resumed tournament never replays a pairing whose results were saved.
+	'''
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	check_lease(cur, lease)
+	for result in results:
+		insert_pairing_result(cur, tournament_id, *result)
+	for summary in series:
+		insert_pairing_series(cur, tournament_id, *summary)
+	cur.execute(
+		'insert into tournament_pairings (tournament_id, round, pairing, winner) values (?, ?, ?, ?)',
+		(tournament_id, t_round, pairing, winner),
+	)
+
+	conn.commit()
+	conn.close()
+
+
+def save_tournament_result(tournament_id, rankings, lease=None):
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	check_lease(cur, lease)
+	# The tournament is finished, so its checkpoint goes in the same transaction as the results.
+	cur.execute('delete from tournament_checkpoints where tournament_id = ?', (tournament_id, ))
+	cur.execute('delete from tournament_pairings where tournament_id = ?', (tournament_id, ))
 	for t_round, player_list in enumerate(rankings):
 		elimination_round = t_round - len(rankings) + 1
 		for player_name in player_list:
@@ -125,5 +606,109 @@ def save_tournament_result(tournament_id, rankings):
 	conn.commit()
 	conn.close()
 
+def enqueue_job(kind, payload):
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	cur.execute('insert into jobs (kind, payload) values (?, ?)', (kind, json.dumps(payload)))
+	job_id = cur.lastrowid
+
+	conn.commit()
+	conn.close()
+
+	return job_id
+
+
+def claim_job(worker, lease_seconds):
+	'''
+	Atomically lease the oldest pending job, or one whose lease has expired, to `worker`.
+
+	Returns `(job_id, kind, payload)` or None if there is nothing to do. Jobs that have already been leased
+	`MAX_JOB_ATTEMPTS` times are marked failed instead of being handed out again.
+	'''
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT, isolation_level=None)
+	cur = conn.cursor()
+	try:
+		cur.execute('begin immediate')
+		while True:
+			now = time.time()
+			cur.execute('''
+			select id, kind, payload, attempts
+			from jobs
+			where status = 'pending' or (status = 'leased' and lease_expires < ?)
+			order by id
+			limit 1''', (now, ))
+
+			row = cur.fetchone()
+			if row is None:
+				job = None
+				break
+
+			job_id, kind, payload, attempts = row
+			if attempts >= MAX_JOB_ATTEMPTS:
+				cur.execute(
+					"update jobs set status = 'failed', worker = null, lease_expires = null where id = ?",
+					(job_id, ),
+				)
+				continue
+
+			cur.execute(
+				"update jobs set status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 where id = ?",
+				(worker, now + lease_seconds, job_id),
+			)
+			job = (job_id, kind, json.loads(payload))
+			break
+
+		cur.execute('commit')
+
+	except:
+		cur.execute('rollback')
+		raise
+
+	finally:
+		conn.close()
+
+	return job
+
+
+def renew_lease(job_id, worker, lease_seconds):
+	return _update_leased_job(
+		'update jobs set lease_expires = ? where id = ? and worker = ? and status = \'leased\'',
+		(time.time() + lease_seconds, job_id, worker),
+	)
+
+
+def complete_job(job_id, worker):
+	return _update_leased_job(
+		'''
+			update jobs set status = 'done', lease_expires = null, done_date = current_timestamp
+			where id = ? and worker = ? and status = 'leased'
+		''',
+		(job_id, worker),
+	)
+
+
+def fail_job(job_id, worker, error):
+	return _update_leased_job(
+		'''
+			update jobs set status = 'pending', worker = null, lease_expires = null, error = ?
+			where id = ? and worker = ? and status = 'leased'
+		''',
+		(error, job_id, worker),
+	)
+
+
+def _update_leased_job(statement, params):
+	# Returns False if the lease was lost, e.g. it expired and another worker reclaimed the job.
+	conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+	cur = conn.cursor()
+	cur.execute(statement, params)
+	updated = cur.rowcount == 1
+
+	conn.commit()
+	conn.close()
+
+	return updated
+
+
 if __name__ == '__main__':
 	setupdb()
@@ -0,0 +1,227 @@
+'''
+Deck selection for the generations with a pool.
+
+Decks are count vectors over `bots.sim.CARDS`. Two decks are scored against each other by the expected final score
+margin when both players play uniformly at random, with both players dying counted as `DEATH_PENALTY` and the special
+card cost included. Without Take every card is played, so the cards meet in a uniformly random matching and the
+expectation has a closed form; with Take the decks change mid game and the value is found by a search over count
+vectors, memoized across deck pairs.
+
+A symmetric equilibrium over the candidate decks is then found by fictitious play, and the resulting mixed strategies
+are written to `bots/decks.json`, where `bots.base.choose_deck` picks them up at setup.
+'''
+import argparse
+import functools
+import json
+import logging
+import math
+
+from bots import sim
+from bots.base import DECK_TABLE
+from game import GameGen2, GameGen3
+
+LOGGER = logging.getLogger(__name__)
+
+DEATH_PENALTY = 10
+
+GAME_CLASSES = {
+	2: GameGen2,
+	3: GameGen3,
+}
+
+SPECIALS = (sim.C, sim.L, sim.T)
+
+
+def card_cost(deck):
+	special = sum(deck[i] for i in SPECIALS)
+	return special * (special - 1) / 4
+
+
+def candidate_decks(gen, rounds, max_specials=3):
+	'''
+	Every count vector `BaseGame.setup` would accept, with at most `max_specials` special cards.
+	'''
+	pool = sim.counts(GAME_CLASSES[gen](['p1', 'p2'], rounds).pool)
+	cards = [i for i, count in enumerate(pool) if count]
+
+	def fill(i, left, deck):
+		if i == len(cards):
+			if not left:
+				yield tuple(deck)
+			return
+		card = cards[i]
+		for count in range(min(left, pool[card]) + 1):
+			deck[card] = count
+			if sum(deck[j] for j in SPECIALS) <= max_specials:
+				yield from fill(i + 1, left - count, deck)
+		deck[card] = 0
+
+	decks = list(fill(0, rounds, [0] * len(sim.CARDS)))
+	if gen == 3:
+		# It's legal to pick a hand entirely composed of Chicken, regardless of what is in the pool.
+		decks.append(sim.counts(['C'] * rounds))
+	return decks
+
+
+def _comb(n, k):
+	return math.comb(n, k) if 0 <= k <= n else 0
+
+
+def _survival(n, a_chickens, b_chickens):
+	# P(no Chicken meets Chicken) in a uniformly random matching of n cards.
+	return _comb(n - b_chickens, a_chickens) / _comb(n, a_chickens)
+
+
+def matching_value(a, b):
+	'''
+	`(E[margin if nobody dies], P(death))` for decks without Take, where every card is played once.
+	'''
+	n = sum(a)
+	margin = 0.0
+	for i, a_count in enumerate(a):
+		if not a_count:
+			continue
+		for j, b_count in enumerate(b):
+			payoff = sim.PAYOFFS[i][j]
+			if not b_count or payoff is None:
+				continue
+			survival = _survival(n - 1, a[sim.C] - (i == sim.C), b[sim.C] - (j == sim.C))
+			margin += a_count * b_count / n * (payoff[0] - payoff[1]) * survival
+
+	return margin, 1 - _survival(n, a[sim.C], b[sim.C])
+
+
+@functools.lru_cache(maxsize=None)
+def search_value(a, b, rounds):
+	'''
+	`(E[margin from here if nobody dies], P(death))` with `rounds` left to play, for any decks.
+	'''
+	if not rounds:
+		return 0.0, 0.0
+
+	a_size, b_size = sum(a), sum(b)
+	margin = death = 0.0
+	for i, a_count in enumerate(a):
+		if not a_count:
+			continue
+		for j, b_count in enumerate(b):
+			if not b_count:
+				continue
+			p = a_count * b_count / (a_size * b_size)
+			payoff = sim.PAYOFFS[i][j]
+			if payoff is None:
+				death += p
+				continue
+
+			for q, next_a, next_b in _transitions(a, b, i, j):
+				next_margin, next_death = search_value(next_a, next_b, rounds - 1)
+				margin += p * q * ((payoff[0] - payoff[1]) * (1 - next_death) + next_margin)
+				death += p * q * next_death
+
+	return margin, death
+
+
+def _transitions(a, b, i, j):
+	# Mirrors the card movements in `sim.step`, with each possible steal weighted by its probability.
+	decks = [list(a), list(b)]
+	decks[0][i] -= 1
+	decks[1][j] -= 1
+	outcomes = [(1.0, decks)]
+
+	if sim.C not in (i, j):
+		for thief, card, victim_card in [(0, i, j), (1, j, i)]:
+			if card != sim.T:
+				continue
+			stolen = []
+			for p, decks in outcomes:
+				victim = list(decks[1 - thief])
+				if victim_card != sim.T:
+					victim[victim_card] += 1
+				size = sum(victim)
+				if not size:
+					stolen.append((p, [victim if k == 1 - thief else decks[k] for k in range(2)]))
+					continue
+				for k, count in enumerate(victim):
+					if not count:
+						continue
+					new = [list(decks[0]), list(decks[1])]
+					new[1 - thief] = list(victim)
+					new[1 - thief][k] -= 1
+					new[thief][k] += 1
+					stolen.append((p * count / size, new))
+			outcomes = stolen
+
+	return [(p, tuple(decks[0]), tuple(decks[1])) for p, decks in outcomes]
+
+
+def deck_utility(a, b, rounds):
+	if a[sim.T] or b[sim.T]:
+		margin, death = search_value(a, b, rounds)
+	else:
+		margin, death = matching_value(a, b)
+
+	# Card costs come off the score at setup, so they only count if nobody dies.
+	margin += (card_cost(b) - card_cost(a)) * (1 - death)
+	return margin - DEATH_PENALTY * death
+
+
+def fictitious_play(decks, rounds, iterations=200):
+	'''
+	Approximate a symmetric equilibrium: repeatedly best-respond to the average of the previous best responses.
+
+	Only the utility columns for decks that have been played are ever computed.
+	'''
+	columns = {}
+	played = {}
+
+	def column(b):
+		if b not in columns:
+			columns[b] = [deck_utility(a, b, rounds) for a in decks]
+		return columns[b]
+
+	best = max(range(len(decks)), key=lambda x: sum(decks[x][:3]))
+	for iteration in range(1, iterations + 1):
+		played[best] = played.get(best, 0) + 1
+		values = [0.0] * len(decks)
+		for b, count in played.items():
+			for a, value in enumerate(column(decks[b])):
+				values[a] += value * count / iteration
+		best = max(range(len(decks)), key=values.__getitem__)
+
+	LOGGER.info('%d decks, %d columns, best response %r scores %.3f', len(decks), len(columns), decks[best], values[best])
+	return {decks[x]: count / iterations for x, count in played.items()}
+
+
+def deck_string(deck):
+	return ''.join(card * count for card, count in zip(sim.CARDS, deck))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--gen', type=int, nargs='+', default=[2, 3])
+	parser.add_argument('--rounds', type=int, nargs='+', default=[5, 7, 11, 13, 17])
+	parser.add_argument('--iterations', type=int, default=200)
+	parser.add_argument('--max-specials', type=int, default=3)
+	parser.add_argument('--output', default=DECK_TABLE)
+	args = parser.parse_args()
+
+	try:
+		with open(args.output) as f:
+			table = json.load(f)
+	except FileNotFoundError:
+		table = {}
+
+	for gen in args.gen:
+		for rounds in args.rounds:
+			decks = candidate_decks(gen, rounds, args.max_specials)
+			strategy = fictitious_play(decks, rounds, args.iterations)
+			table['%d:%d' % (gen, rounds)] = {deck_string(deck): round(p, 4) for deck, p in strategy.items()}
+			LOGGER.info('gen=%d rounds=%d: %r', gen, rounds, table['%d:%d' % (gen, rounds)])
+
+	with open(args.output, 'w') as f:
+		json.dump(table, f, indent='\t', sort_keys=True)
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	main()
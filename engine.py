@@ -1,3 +1,4 @@
+import argparse
 import importlib
 import json
 import logging
@@ -9,56 +10,223 @@ import sqlite3
 import subprocess
 import sys
 import threading
+import time
+import tracemalloc
 import queue
 
+from concurrent.futures import ThreadPoolExecutor
+
+import snapshots
 from game import GameGen0, GameGen1, GameGen2, GameGen3
 from game import EverybodyDiesException, P1FoulException, P2FoulException
 from db import setupdb, latest_engine_params, save_pairing_result, save_tournament_result
+from db import save_checkpoint, load_checkpoint, unfinished_tournaments, save_pairing_series, save_pairing
 
 LOGGER = logging.getLogger(__name__)
 
+# Each move may use this much of the bot's own CPU time...
 TIMEOUT = 0.1
+# ...within this much wall-clock time, for bots that block or sleep without using any.
+WALL_TIMEOUT = 1.0
+
+# Foul reason for a player that goes over its memory cap.
+MEMORY_FOUL = 'exceeded memory cap'
+
+# A best-of-N series stops as soon as a sequential probability ratio test can call it: "p1 wins SERIES_P of the
+# decisive games" against "p2 does", each with error rate SERIES_ALPHA. With these values that's a lead of 4 wins.
+SERIES_P = 0.7
+SERIES_ALPHA = 0.05
+
+
+# Bot factories, by prefix: `<prefix>:<variant>` is the player `variant(variant)` of the module, which also lists its
+# variants with `names(count)`. See bots/_synthetic.
+FACTORIES = {
+	'synthetic': 'bots._synthetic',
+}
+
+
+class BudgetExceeded(Exception):
+	pass
+
+
+def charged_wait(attempt, timeouts, cpu_time, start=None, budget=TIMEOUT, ceiling=WALL_TIMEOUT):
+	'''
+	Call `attempt(timeout)` until it returns, retrying when it raises one of `timeouts`, and charge the wait to the
+	player: only the CPU time `cpu_time()` reports counts against `budget`, so time spent waiting for the GIL, the other
+	player or the engine is free. `ceiling` bounds the wall-clock time. Both are counted from `start`, a
+	`(perf_counter(), cpu_time())` pair, or from now. `cpu_time()` returns None once the player is gone.
+	Raises BudgetExceeded.
+	'''
+	wall_start, cpu_start = start or (time.perf_counter(), cpu_time())
+	cpu = cpu_time()
+	# A player that has exited since `start` will never answer, so it has nothing left to wait for.
+	used = 0 if cpu_start is None else budget if cpu is None else cpu - cpu_start
+	while True:
+		# A player can't use more CPU time than the wall-clock time that passes, so wait out what's left of its budget.
+		remaining = min(budget - used, ceiling - (time.perf_counter() - wall_start))
+		if remaining <= 0:
+			raise BudgetExceeded()
+
+		try:
+			return attempt(remaining)
+		except timeouts:
+			pass
+
+		cpu = cpu_time()
+		used = budget if cpu is None or cpu_start is None else cpu - cpu_start
 
 
 class PlayerThread(threading.Thread):
-	def __init__(self, player_num, player_module):
+	def __init__(self, player_num, player_module, memory_cap=None):
 		self.player_in_queue = queue.Queue(maxsize=1)
 		self.player_out_queue = queue.Queue(maxsize=1)
 		self.player_module = player_module
 		self.player = player_module.Player(self.player_in_queue, self.player_out_queue)
 		self.player_num = player_num
 		self.exception_class = [P1FoulException, P2FoulException][player_num - 1]
+		self.latencies = []
+		self.cpu_times = []
+		self.clock = None
+		# When the player was last sent a message, so a move is charged from when it could start thinking.
+		self.mark = None
+
+		# Threads share a heap. While tracemalloc is tracing, the engine runs one player at a time (see `MatchSetup`), and
+		# whatever is allocated during a player's turn, in its own code or anything it calls, is put down to it.
+		self.memory_cap = memory_cap
+		self.peak_mem = None
+		self.retained = 0
+		self.turn_start = None
+
 		super().__init__(daemon=True)
 
+	def start(self):
+		super().start()
+		self.clock = time.pthread_getcpuclockid(self.ident)
+
 	def run(self):
 		self.player.run()
 
+	def cpu_time(self):
+		try:
+			return time.clock_gettime(self.clock)
+		except (OSError, TypeError):
+			# Not started, or already exited.
+			return None
+
 	def join(self):
-		super().join(timeout=TIMEOUT)
-		if self.is_alive():
+		def joined(timeout):
+			super(PlayerThread, self).join(timeout=timeout)
+			if self.is_alive():
+				raise TimeoutError()
+
+		try:
+			charged_wait(joined, TimeoutError, self.cpu_time)
+		except BudgetExceeded:
 			raise self.exception_class('timed out on exit')
+		self.end_turn()
 
 	def send(self, obj):
+		self.begin_turn()
 		try:
 			LOGGER.debug('sending %r to %d', obj, self.player_num)
-			return self.player_in_queue.put(obj, timeout=TIMEOUT)
+			charged_wait(lambda timeout: self.player_in_queue.put(obj, timeout=timeout), queue.Full, self.cpu_time)
+			self.mark = (time.perf_counter(), self.cpu_time())
 
-		except queue.Full:
+		except BudgetExceeded:
 			raise self.exception_class('timed out on write')
 
+	def restart_wall_clock(self):
+		# A header sent in the background by `Engine.prepare_match` could have gone out long before the match started.
+		if self.mark is not None:
+			self.mark = (time.perf_counter(), self.mark[1])
+
 	def receive(self):
+		start = self.mark or (time.perf_counter(), self.cpu_time())
+		self.mark = None
 		try:
-			obj = self.player_out_queue.get(timeout=TIMEOUT)
+			obj = charged_wait(lambda timeout: self.player_out_queue.get(timeout=timeout), queue.Empty, self.cpu_time, start)
 			LOGGER.debug('recv. %r from %d', obj, self.player_num)
+			self.end_turn()
 			return obj
 
-		except queue.Empty:
+		except BudgetExceeded:
 			raise self.exception_class('timed out on read')
 
+		finally:
+			self.latencies.append(time.perf_counter() - start[0])
+			cpu = self.cpu_time()
+			if cpu is not None and start[1] is not None:
+				self.cpu_times.append(cpu - start[1])
+
+	def begin_turn(self):
+		# A turn runs from the first message sent to the player until its reply; sending more doesn't start another.
+		if self.turn_start is None and tracemalloc.is_tracing():
+			self.turn_start = tracemalloc.get_traced_memory()[0]
+			tracemalloc.reset_peak()
+
+	def end_turn(self):
+		'''
+		Charge the player with the turn's peak on top of what it has kept from earlier turns.
+		'''
+		if self.turn_start is None:
+			return
+		current, peak = tracemalloc.get_traced_memory()
+		self.peak_mem = max(self.peak_mem or 0, self.retained + peak - self.turn_start)
+		# Freeing what the engine allocated, like the messages, can take it below zero.
+		self.retained = max(0, self.retained + current - self.turn_start)
+		self.turn_start = None
+		if self.memory_cap is not None and self.peak_mem > self.memory_cap:
+			raise self.exception_class(MEMORY_FOUL)
+
+	def pin(self, cores):
+		os.sched_setaffinity(self.native_id, cores)
+
+	def close(self):
+		# Daemon thread; nothing to clean up.
+		pass
+
 	def __str__(self):
 		return "%s(%s, %s)" % (self.__class__.__name__, self.player_num, self.player_module)
 
 
+def series_leader(wins, p=SERIES_P, alpha=SERIES_ALPHA):
+	'''
+	1 or 2 once the SPRT has decided between the players with `wins` decisive games each, otherwise None.
+	'''
+	llr = (wins[0] - wins[1]) * math.log(p / (1 - p))
+	bound = math.log((1 - alpha) / alpha)
+	if llr >= bound:
+		return 1
+	if llr <= -bound:
+		return 2
+	return None
+
+
+def foul_reason(e):
+	# Game rule fouls carry their reason on the AssertionError they were raised from.
+	return str(e) or str(e.__cause__ or '') or e.__class__.__name__
+
+
+class MatchSetup:
+	'''
+	Players for a pairing that have been loaded, started and sent the game header, ready for `Engine.run_match`.
+
+	If a player could not be loaded, `fouled` is its index and the match is settled without being played: its opponent goes
+	through, and the pairing is recorded with the outcome 'load failed'.
+
+	With `serial` set the players take turns instead of thinking at the same time, so their memory can be told apart;
+	the game header hasn't been sent yet, and `run_match` sends it to each player in turn.
+	'''
+
+	def __init__(self, player_names, game=None, players=(), fouled=None, error=None, serial=False):
+		self.player_names = list(player_names)
+		self.game = game
+		self.players = list(players)
+		self.fouled = fouled
+		self.error = error
+		self.serial = serial
+
+
 class Engine:
 	game_classes = [
 		GameGen0,
@@ -67,8 +235,8 @@ class Engine:
 		GameGen3,
 	]
 
-	def __init__(self, tournament_id, gen, rounds):
-		LOGGER.info('Game params: gen=%r, rounds=%r', gen, rounds)
+	def __init__(self, tournament_id, gen, rounds, zygote=None, best_of=1, cores=None, memory_cap=None, spectators=None, factories=None, lease=None):
+		LOGGER.info('Game params: gen=%r, rounds=%r, best_of=%r', gen, rounds, best_of)
 
 		self.tournament_id = tournament_id
 		self.players = []
@@ -76,6 +244,32 @@ class Engine:
 		self.gen = gen
 		self.rounds = rounds
 
+		# With a zygote.Zygote each player runs in its own forked process instead of a thread.
+		self.zygote = zygote
+
+		# Pairings play up to this many games, see `run_series`.
+		self.best_of = best_of
+
+		# Cores for this engine's matches, from `affinity.plan_slots`; each player is pinned to one of them as its match
+		# starts. The engine itself stays on whatever the caller was pinned to.
+		self.cores = cores
+
+		# Bytes a player may use before it fouls. Thread mode only measures memory while tracemalloc is tracing.
+		self.memory_cap = memory_cap
+
+		# A spectator.Broadcast to publish each match's events to.
+		self.spectators = spectators
+
+		# How many players to enter from each of `FACTORIES`, e.g. `{'synthetic': 1000}`.
+		self.factories = factories or {}
+
+		# The job lease a worker is running this under, `(job_id, worker)`: results are only saved while it's held.
+		self.lease = lease
+
+		# While `run` plays a pairing, its games and series wait here, as `([game], [series])`, to be saved along with
+		# where the pairing's winner goes in the bracket; see `db.save_pairing`.
+		self.pending = None
+
 	def get_players(self):
 		module_re = re.compile('^[a-z0-9][a-z0-9_]+$')
 		with os.scandir('bots') as it:
@@ -89,6 +283,14 @@ class Engine:
 				LOGGER.info("adding %s", entry.name)
 				yield entry.name
 
+		yield from self.factory_players()
+
+	def factory_players(self):
+		for prefix, count in sorted(self.factories.items()):
+			LOGGER.info("adding %d %s players", count, prefix)
+			for name in importlib.import_module(FACTORIES[prefix]).names(count):
+				yield '%s:%s' % (prefix, name)
+
 	@staticmethod
 	def allocate_tournament(active_players):
 		random.shuffle(active_players)
@@ -102,7 +304,7 @@ class Engine:
 				i = 1
 		return players
 
-	def run_pairing(self, player_names):
+	def run_pairing(self, player_names, setup=None):
 		if player_names[0] is None:
 			LOGGER.info("Bye for %s", player_names[1])
 			return player_names[1]
@@ -111,7 +313,10 @@ class Engine:
 			return player_names[0]
 		else:
 			LOGGER.info("Pairing %s against %s", *player_names)
-			winner = self.run_match(player_names)
+			if self.best_of > 1:
+				winner = self.run_series(player_names, setup)
+			else:
+				winner = self.run_match(player_names, setup)
 			if winner > 0:
 				winning_player = player_names[winner - 1]
 				LOGGER.info("Round winner: %s", winning_player)
@@ -124,42 +329,187 @@ class Engine:
 				LOGGER.info("Both players lose")
 				return None
 
+	def run_series(self, player_names, setup=None):
+		'''
+		Play up to `best_of` games, swapping seats each game, until `series_leader` calls it. Returns the same as
+		`run_match`, for the series: the player with more wins if the test never decided, 0 if they're level, and -1 if
+		every game was a chicken.
+		'''
+		wins = [0, 0]
+		draws = chickens = 0
+		leader = None
+
+		games = 0
+		while games < self.best_of and leader is None:
+			if games % 2 == 0:
+				winner = self.run_match(player_names, setup)
+			else:
+				winner = self.run_match(player_names[::-1])
+				winner = 3 - winner if winner > 0 else winner
+			setup = None
+			games += 1
+
+			if winner > 0:
+				wins[winner - 1] += 1
+			elif winner == 0:
+				draws += 1
+			else:
+				chickens += 1
+
+			leader = series_leader(wins)
+
+		if leader is not None:
+			winner = leader
+		elif wins[0] != wins[1]:
+			winner = 1 if wins[0] > wins[1] else 2
+		elif chickens == games:
+			winner = -1
+		else:
+			winner = 0
+
+		LOGGER.info('Series %s %d-%d %s after %d games', player_names[0], wins[0], wins[1], player_names[1], games)
+		self.record_series_result(player_names, games, wins, draws, chickens, winner)
+		return winner
+
+	def record_series_result(self, player_names, games, wins, draws, chickens, winner):
+		series = (
+			self.gen,
+			player_names[0],
+			player_names[1],
+			games,
+			wins,
+			draws,
+			chickens,
+			player_names[winner - 1] if winner > 0 else None,
+		)
+		if self.pending is not None:
+			self.pending[1].append(series)
+		else:
+			save_pairing_series(self.tournament_id, *series, lease=self.lease)
+
+	@staticmethod
+	def is_bye(player_names):
+		return None in player_names
+
+	def run_pairings(self, pairings):
+		'''
+		Run a round's pairings in order, yielding each winner.
+
+		While one match is running, the next real pairing's players are set up in the background so the round runs back
+		to back.
+		'''
+		matches = [i for i, player_names in enumerate(pairings) if not self.is_bye(player_names)]
+		setups = {}
+
+		if self.serial():
+			# Setting players up alongside a match would put what they allocate down to the players in it.
+			matches = []
+
+		upcoming = iter(matches)
+		with ThreadPoolExecutor(max_workers=1) as executor:
+			def prepare_next():
+				j = next(upcoming, None)
+				if j is not None:
+					setups[j] = executor.submit(self.prepare_match, pairings[j])
+
+			prepare_next()
+			for i, player_names in enumerate(pairings):
+				setup = None
+				if i in setups:
+					setup = setups.pop(i).result()
+					prepare_next()
+
+				yield self.run_pairing(player_names, setup)
+
+	def save_checkpoint(self, state):
+		save_checkpoint(self.tournament_id, self.gen, self.rounds, state, lease=self.lease)
+
+	def save_pairing(self, t_round, pairing, winner):
+		results, series = self.pending
+		self.pending = ([], [])
+		save_pairing(self.tournament_id, t_round, pairing, winner, results, series, lease=self.lease)
+
 	def run(self):
-		players = self.allocate_tournament(list(self.get_players()))
-		LOGGER.info("Pairings: %s", players)
-		player_last_rounds = []
-		while len(players) > 1:
-			players_gone = []
-			LOGGER.info("NEW ROUND; players=%s", players)
+		checkpoint = load_checkpoint(self.tournament_id)
+		if checkpoint is None:
+			players = self.allocate_tournament(list(self.get_players()))
+			LOGGER.info("Pairings: %s", players)
+			state = {
+				'players': players,
+				'player_last_rounds': [],
+				'best_of': self.best_of,
+			}
+			self.save_checkpoint(state)
 			next_players = []
-			assert abs(math.log2(len(players)) % 1) < 0.00001, players
-			for i in range(len(players) // 2):
-				paired_players = players[i*2:i*2+2]
-				winning_player = self.run_pairing(paired_players)
-				for player in paired_players:
-					if player is not None and player != winning_player:
-						players_gone.append(player)
-				next_players.append(winning_player)
-			LOGGER.info("Eliminated players this round: %s", players_gone)
-			player_last_rounds.append(players_gone)
-			players = next_players
+		else:
+			self.gen, self.rounds, state = checkpoint
+			self.best_of = state.get('best_of', 1)
+			next_players = state.pop('next_players')
+			LOGGER.info('Resuming tournament %s: gen=%r, rounds=%r, state=%r', self.tournament_id, self.gen, self.rounds, state)
+
+		players = state['players']
+		player_last_rounds = state['player_last_rounds']
+		self.pending = ([], [])
+		try:
+			while len(players) > 1:
+				t_round = len(player_last_rounds)
+				if not next_players:
+					LOGGER.info("NEW ROUND; players=%s", players)
+				assert abs(math.log2(len(players)) % 1) < 0.00001, players
+				pairings = [players[i*2:i*2+2] for i in range(len(players) // 2)]
+				players_gone = [
+					player
+					for paired_players, winning_player in zip(pairings, next_players)
+					for player in paired_players
+					if player is not None and player != winning_player
+				]
+
+				done = len(next_players)
+				for idx, (paired_players, winning_player) in enumerate(zip(pairings[done:], self.run_pairings(pairings[done:])), done):
+					for player in paired_players:
+						if player is not None and player != winning_player:
+							players_gone.append(player)
+					next_players.append(winning_player)
+					self.save_pairing(t_round, idx, winning_player)
+				LOGGER.info("Eliminated players this round: %s", players_gone)
+				player_last_rounds.append(players_gone)
+				players = next_players
+				next_players = []
+				self.save_checkpoint({
+					'players': players,
+					'player_last_rounds': player_last_rounds,
+					'best_of': self.best_of,
+				})
+		finally:
+			self.pending = None
+
 		if players == [None]:
 			# Last round chicken fix.
 			players = []
 		player_last_rounds.append(players)
-		save_tournament_result(self.tournament_id, player_last_rounds)
+		save_tournament_result(self.tournament_id, player_last_rounds, lease=self.lease)
 
 		LOGGER.info("Tournament winner: %s", players)
 
 	@staticmethod
-	def make_player(player_num, player_name):
-		module = importlib.import_module('bots.' + player_name)
-		return PlayerThread(player_num, module)
-
-	def run_match(self, player_names):
-		assert len(player_names) == 2
-		LOGGER.info('p1: %s, p2: %s', *player_names)
-
+	def load_module(player_name):
+		if '@' in player_name:
+			return snapshots.load_bot(player_name)
+		if ':' in player_name:
+			prefix, name = player_name.split(':', 1)
+			return importlib.import_module(FACTORIES[prefix]).variant(name)
+		return importlib.import_module('bots.' + player_name)
+
+	def make_player(self, player_num, player_name):
+		if self.zygote is not None:
+			return self.zygote.spawn(player_num, player_name, self.memory_cap)
+		return PlayerThread(player_num, self.load_module(player_name), self.memory_cap)
+
+	def serial(self):
+		# Thread mode measures memory by what's allocated while a player runs, so it only runs one at a time.
+		return self.zygote is None and tracemalloc.is_tracing()
+
+	def prepare_match(self, player_names):
 		players = []
 		for idx, player_name in enumerate(player_names):
 			try:
@@ -168,34 +518,145 @@ class Engine:
 				players.append(player)
 			except:
 				logging.exception('Player %s could not be loaded. FOUL.', player_name)
-				return 2 - idx
+				for player in players:
+					player.close()
+				return MatchSetup(player_names, fouled=idx)
 
-		try:
-			game = self.game_classes[self.gen](player_names, self.rounds)
+		game = self.game_classes[self.gen](player_names, self.rounds)
+		if self.serial():
+			return MatchSetup(player_names, game, players, serial=True)
 
+		try:
 			for player in players:
 				player.send(game.game_header())
 
+		except (P1FoulException, P2FoulException) as e:
+			return MatchSetup(player_names, game, players, error=e)
+
+		return MatchSetup(player_names, game, players)
+
+	def pin_players(self, players):
+		'''
+		Give each player one of the engine's cores. Done as the match starts, not in `prepare_match`: that runs while the
+		previous match is still using the cores.
+		'''
+		if not self.cores:
+			return
+		for idx, player in enumerate(players):
+			try:
+				player.pin({self.cores[idx % len(self.cores)]})
+			except OSError:
+				# The bot isn't at fault, so it plays unpinned.
+				LOGGER.warning('could not pin %s', player, exc_info=True)
+
+	def record_pairing_result(self, player_names, scores, outcome, foul=None, peak_mem=(None, None)):
+		'''
+		Store a finished match. `foul` is `(player_idx, reason)` when the outcome is a foul, `peak_mem` each player's peak
+		memory in bytes where it was measured.
+		'''
+		result = (
+			self.gen,
+			player_names[0],
+			scores[0],
+			player_names[1],
+			scores[1],
+			outcome,
+			peak_mem,
+			foul[1] if foul else None,
+		)
+		if self.pending is not None:
+			self.pending[0].append(result)
+		else:
+			save_pairing_result(self.tournament_id, *result, lease=self.lease)
+
+	def publish(self, kind, player_names, **data):
+		if self.spectators is not None:
+			data['match'] = '%s: %s v %s' % (self.tournament_id, *player_names)
+			self.spectators.publish(kind, data)
+
+	def publish_end(self, player_names, scores, outcome, foul=None):
+		self.publish(
+			'end',
+			player_names,
+			scores=scores,
+			outcome=outcome,
+			foul='%s %s' % (player_names[foul[0]], foul[1]) if foul else None,
+		)
+
+	def run_match(self, player_names, setup=None):
+		assert len(player_names) == 2
+		LOGGER.info('p1: %s, p2: %s', *player_names)
+		self.publish('start', player_names, gen=self.gen, rounds=self.rounds)
+
+		if setup is None:
+			setup = self.prepare_match(player_names)
+
+		if setup.fouled is not None:
+			# Nothing was played, so there are no scores, and it isn't a game for either player's record.
+			foul = (setup.fouled, 'load failed')
+			self.record_pairing_result(player_names, [0, 0], 'load failed', foul)
+			self.publish_end(player_names, [0, 0], 'load failed', foul)
+			return 2 - setup.fouled
+
+		game = setup.game
+		players = setup.players
+		self.pin_players(players)
+		for player in players:
+			# The wall-clock ceiling on the setup reply runs from now; CPU time still counts from the header.
+			player.restart_wall_clock()
+
+		foul = None
+
+		try:
+			if setup.error is not None:
+				raise setup.error
+
 			for idx, player in enumerate(players):
+				if setup.serial:
+					player.send(game.game_header())
 				game.setup(idx, player.receive())
 				LOGGER.info('%s ready', player_names[idx])
 
+			# Serial players get their footer at the start of their next turn rather than as the round ends.
+			footers = [None, None]
 			for i in range(self.rounds):
-				for player, round_header in zip(players, game.round_headers()):
-					player.send(round_header)
+				round_headers = game.round_headers()
+				if not setup.serial:
+					for player, round_header in zip(players, round_headers):
+						player.send(round_header)
 
 				hands = []
-				for player in players:
+				for player, footer, round_header in zip(players, footers, round_headers):
+					if setup.serial:
+						if footer is not None:
+							player.send(footer)
+						player.send(round_header)
 					hands.append(player.receive().get('hand', None))
 
 				LOGGER.info('p1_hand=%r, p2_hand=%r', *hands)
 
 				responses = game.apply(hands)
 
-				for idx, response in enumerate(responses):
-					players[idx].send(response)
-
-			for idx, player in enumerate(players):
+				if self.spectators is not None:
+					self.publish(
+						'round',
+						player_names,
+						round=game.current_round - 1,
+						hands=hands,
+						scores=list(game.scores),
+						looks=[response.get('look') for response in responses],
+						took=[response.get('took') for response in responses],
+					)
+
+				if setup.serial:
+					footers = responses
+				else:
+					for idx, response in enumerate(responses):
+						players[idx].send(response)
+
+			for player, footer in zip(players, footers):
+				if footer is not None:
+					player.send(footer)
 				player.join()
 
 			outcome = 'win'
@@ -204,15 +665,21 @@ class Engine:
 			LOGGER.exception('EVERYBODY DIES.')
 			outcome = 'chicken'
 
-		except P1FoulException:
+		except P1FoulException as e:
 			LOGGER.exception('%s fouled' % (player_names[0], ))
 			game.end_in_favour_of(1)
 			outcome = 'foul'
+			foul = (0, foul_reason(e))
 
-		except P2FoulException:
+		except P2FoulException as e:
 			LOGGER.exception('%s fouled' % (player_names[1], ))
 			game.end_in_favour_of(0)
 			outcome = 'foul'
+			foul = (1, foul_reason(e))
+
+		finally:
+			for player in players:
+				player.close()
 
 		scores = game.final_scores()
 		LOGGER.info('p1_score=%r, p2_score=%r', *scores)
@@ -220,7 +687,10 @@ class Engine:
 		if outcome == 'win' and scores[0] == scores[1]:
 			outcome = 'draw'
 
-		save_pairing_result(self.tournament_id, self.gen, player_names[0], scores[0], player_names[1], scores[1], outcome)
+		peak_mem = tuple(player.peak_mem for player in players)
+		LOGGER.info('p1_peak_mem=%r, p2_peak_mem=%r', *peak_mem)
+		self.record_pairing_result(player_names, scores, outcome, foul, peak_mem)
+		self.publish_end(player_names, scores, outcome, foul)
 
 		if outcome == 'chicken':
 			return -1
@@ -234,11 +704,58 @@ class Engine:
 
 
 def main():
-	tournament_id = sys.argv[1]
+	parser = argparse.ArgumentParser()
+	parser.add_argument('tournament_id', nargs='?', help='tournament to run, resumed if it was interrupted')
+	parser.add_argument('--unfinished', action='store_true', help='list interrupted tournaments and exit')
+	parser.add_argument('--processes', action='store_true', help='run each player in a process forked from a zygote')
+	parser.add_argument('--best-of', type=int, default=1, help='play pairings as a series of up to this many games')
+	parser.add_argument('--memory-cap', type=float, help='foul players that use more than this many MB')
+	parser.add_argument('--trace-memory', action='store_true', help='measure memory in thread mode (players take turns, and bots slow down)')
+	parser.add_argument('--spectate', type=int, metavar='PORT', help='stream matches live to browsers on this port')
+	parser.add_argument('--synthetic', type=int, default=0, help='enter this many synthetic players too, for scale testing')
+	args = parser.parse_args()
+
+	if args.unfinished:
+		for tournament_id in unfinished_tournaments():
+			print(tournament_id)
+		return
+
+	if args.tournament_id is None:
+		parser.error('tournament_id is required')
+
 	gen, rounds = latest_engine_params()
 
-	engine = Engine(tournament_id, gen, rounds)
-	engine.run()
+	memory_cap = int(args.memory_cap * 2 ** 20) if args.memory_cap else None
+
+	spectators = None
+	if args.spectate:
+		import spectator
+		spectators = spectator.Broadcast()
+		spectator.serve(spectators, args.spectate)
+
+	zygote = None
+	if args.processes:
+		from zygote import Zygote
+		zygote = Zygote(TIMEOUT)
+		zygote.start()
+	elif memory_cap or args.trace_memory:
+		tracemalloc.start()
+
+	try:
+		engine = Engine(
+			args.tournament_id,
+			gen,
+			rounds,
+			zygote,
+			args.best_of,
+			memory_cap=memory_cap,
+			spectators=spectators,
+			factories={'synthetic': args.synthetic} if args.synthetic else None,
+		)
+		engine.run()
+	finally:
+		if zygote is not None:
+			zygote.stop()
 
 
 if __name__ == '__main__':
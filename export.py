@@ -0,0 +1,253 @@
+'''
+Export match history as memory-mappable columns, so analysis never has to touch (or copy) the live `hack.db`.
+
+Every run appends the `pairing_results` and `tournament_results` rows added since the last one, found by the highest
+id already exported, as a new chunk: one flat file of native machine values per column. Names, tournament ids,
+outcomes and foul reasons are stored as indexes into dictionaries kept in `manifest.json`. Missing values are NaN in
+the float columns, such as the scores (card costs make them fractional), and -1 in the rest, where it's never a real
+value. Dictionaries only ever grow, so earlier chunks stay valid.
+
+	from export import Export
+	history = Export.load()
+	results = history['pairing_results']
+	wins = collections.Counter(p1 for p1, a, b in zip(results['p1'], results['p1_score'], results['p2_score']) if a > b)
+	print({history.decode('players', code): count for code, count in wins.items()})
+
+Run it before `archive.py archive`: rows archived before they were exported aren't picked up.
+'''
+import argparse
+import array
+import bisect
+import collections.abc
+import itertools
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import sys
+
+import db
+
+LOGGER = logging.getLogger(__name__)
+
+EXPORT_DIR = 'export'
+CHUNK_ROWS = 100000
+
+# `{table: [(column, SQL expression, array typecode, dictionary or None)]}`. `id` comes first, for the watermark.
+TABLES = {
+	'pairing_results': [
+		('id', 'id', 'q', None),
+		('tournament_id', 'tournament_id', 'i', 'tournaments'),
+		('gen', 'gen', 'i', None),
+		('p1', 'p1', 'i', 'players'),
+		('p1_score', 'p1_score', 'd', None),
+		('p2', 'p2', 'i', 'players'),
+		('p2_score', 'p2_score', 'd', None),
+		('outcome', 'outcome', 'i', 'outcomes'),
+		('foul_reason', 'foul_reason', 'i', 'foul_reasons'),
+		('p1_peak_mem', 'p1_peak_mem', 'q', None),
+		('p2_peak_mem', 'p2_peak_mem', 'q', None),
+		('cr_date', "cast(strftime('%s', cr_date) as integer)", 'q', None),
+	],
+	'tournament_results': [
+		('id', 'id', 'q', None),
+		('tournament_id', 'tournament_id', 'i', 'tournaments'),
+		('player', 'player', 'i', 'players'),
+		('elimination_round', 'elimination_round', 'i', None),
+		('cr_date', "cast(strftime('%s', cr_date) as integer)", 'q', None),
+	],
+}
+
+MISSING = -1
+MISSING_FLOAT = math.nan
+
+
+def empty_manifest():
+	return {
+		'byteorder': sys.byteorder,
+		'dictionaries': {},
+		'tables': {table: {'watermark': 0, 'chunks': []} for table in TABLES},
+	}
+
+
+def read_manifest(path):
+	try:
+		with open(os.path.join(path, 'manifest.json')) as f:
+			return json.load(f)
+	except FileNotFoundError:
+		return empty_manifest()
+
+
+def write_manifest(path, manifest):
+	tmp = os.path.join(path, 'manifest.json.tmp')
+	with open(tmp, 'w') as f:
+		json.dump(manifest, f, indent='\t')
+	os.replace(tmp, os.path.join(path, 'manifest.json'))
+
+
+class Encoder:
+	'''
+	Append-only string dictionaries, as stored in the manifest.
+	'''
+
+	def __init__(self, dictionaries):
+		self.dictionaries = dictionaries
+		self.codes = {name: {value: code for code, value in enumerate(values)} for name, values in dictionaries.items()}
+
+	def encode(self, name, value):
+		if value is None:
+			return MISSING
+		codes = self.codes.setdefault(name, {})
+		if value not in codes:
+			codes[value] = len(codes)
+			self.dictionaries.setdefault(name, []).append(value)
+		return codes[value]
+
+
+def export_chunk(path, table, rows, encoder):
+	'''
+	Write `rows` of `table` as one chunk; returns its manifest entry.
+	'''
+	name = '%s-%d-%d' % (table, rows[0][0], rows[-1][0])
+	target = os.path.join(path, table, name)
+	tmp = target + '.tmp'
+	for leftover in (tmp, target):
+		# From a run that died before updating the manifest.
+		shutil.rmtree(leftover, ignore_errors=True)
+	os.makedirs(tmp)
+
+	for idx, (column, _expression, typecode, dictionary) in enumerate(TABLES[table]):
+		if dictionary is None:
+			missing = MISSING_FLOAT if typecode == 'd' else MISSING
+			values = array.array(typecode, (missing if row[idx] is None else row[idx] for row in rows))
+		else:
+			values = array.array(typecode, (encoder.encode(dictionary, row[idx]) for row in rows))
+		with open(os.path.join(tmp, column + '.bin'), 'wb') as f:
+			values.tofile(f)
+
+	os.rename(tmp, target)
+	return {'name': name, 'rows': len(rows), 'first_id': rows[0][0], 'last_id': rows[-1][0]}
+
+
+def export(path=EXPORT_DIR, chunk_rows=CHUNK_ROWS):
+	'''
+	Append everything newer than the watermarks. Returns `{table: rows exported}`.
+	'''
+	os.makedirs(path, exist_ok=True)
+	manifest = read_manifest(path)
+	if manifest['byteorder'] != sys.byteorder:
+		raise ValueError('%s was exported on a %s endian machine' % (path, manifest['byteorder']))
+	encoder = Encoder(manifest['dictionaries'])
+
+	conn = sqlite3.connect('file:%s?mode=ro' % (db.DB_FILE, ), uri=True, timeout=db.BUSY_TIMEOUT)
+	cur = conn.cursor()
+
+	exported = {}
+	for table, spec in TABLES.items():
+		state = manifest['tables'].setdefault(table, {'watermark': 0, 'chunks': []})
+		exported[table] = 0
+		while True:
+			cur.execute('select %s from %s where id > ? order by id limit ?' % (
+				', '.join(expression for _column, expression, _typecode, _dictionary in spec),
+				table,
+			), (state['watermark'], chunk_rows))
+			rows = cur.fetchall()
+			if not rows:
+				break
+
+			chunk = export_chunk(path, table, rows, encoder)
+			state['chunks'].append(chunk)
+			state['watermark'] = chunk['last_id']
+			# The chunk is only part of the export once the manifest says so.
+			write_manifest(path, manifest)
+			exported[table] += len(rows)
+			LOGGER.info('exported %s', chunk['name'])
+
+	conn.close()
+	return exported
+
+
+class Column(collections.abc.Sequence):
+	'''
+	One column across every chunk, without copying them out of the page cache.
+	'''
+
+	def __init__(self, chunks):
+		self.chunks = chunks
+		self.offsets = list(itertools.accumulate(len(chunk) for chunk in chunks))
+
+	def __len__(self):
+		return self.offsets[-1] if self.offsets else 0
+
+	def __getitem__(self, idx):
+		if isinstance(idx, slice):
+			return [self[i] for i in range(*idx.indices(len(self)))]
+		if idx < 0:
+			idx += len(self)
+		if not 0 <= idx < len(self):
+			raise IndexError(idx)
+		chunk = bisect.bisect_right(self.offsets, idx)
+		return self.chunks[chunk][idx - (self.offsets[chunk - 1] if chunk else 0)]
+
+	def __iter__(self):
+		return itertools.chain.from_iterable(self.chunks)
+
+
+class Export:
+	def __init__(self, path, manifest):
+		self.path = path
+		self.manifest = manifest
+		self.maps = []
+
+	@classmethod
+	def load(cls, path=EXPORT_DIR):
+		manifest = read_manifest(path)
+		if manifest['byteorder'] != sys.byteorder:
+			raise ValueError('%s was exported on a %s endian machine' % (path, manifest['byteorder']))
+		return cls(path, manifest)
+
+	def __getitem__(self, table):
+		'''
+		`{column: Column}` for `table`.
+		'''
+		chunks = self.manifest['tables'][table]['chunks']
+		return {
+			column: Column([self.map(table, chunk['name'], column, typecode) for chunk in chunks])
+			for column, _expression, typecode, _dictionary in TABLES[table]
+		}
+
+	def map(self, table, chunk, column, typecode):
+		with open(os.path.join(self.path, table, chunk, column + '.bin'), 'rb') as f:
+			mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		self.maps.append(mapped)
+		return memoryview(mapped).cast(typecode)
+
+	def decode(self, dictionary, code):
+		return None if code == MISSING else self.manifest['dictionaries'][dictionary][code]
+
+	def code(self, dictionary, value):
+		'''
+		The code of `value`, to filter on without decoding every row; None if it never occurs.
+		'''
+		try:
+			return self.manifest['dictionaries'].get(dictionary, []).index(value)
+		except ValueError:
+			return None
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--path', default=EXPORT_DIR)
+	parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+	args = parser.parse_args()
+
+	for table, rows in export(args.path, args.chunk_rows).items():
+		print('%s: %d rows exported' % (table, rows))
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	main()
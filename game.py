@@ -51,12 +51,16 @@ class BaseGame():
 
 	LOOK_SIZE = 3
 
+	# Protocol 2 sends the deck once and then only what changed each round, see `round_headers` and `apply`.
+	PROTOCOLS = (1, 2)
+
 	def __init__(self, players, rounds):
 		assert len(players) == 2
 
 		self.players = players
 		self.decks = [[]] * len(players)
 		self.scores = [0] * len(players)
+		self.protocols = [1] * len(players)
 
 		self.current_round = 1
 		self.total_rounds = rounds
@@ -71,12 +75,17 @@ class BaseGame():
 			'rounds': self.total_rounds,
 			'pool': list(self.pool) or None,
 			'players': list(self.players),
+			# Without a pool the deck is fixed by the generation, and the same for both players.
+			'deck': None if self.pool else list(self.decks[0]),
 		})
 
 	def setup(self, player_idx, obj):
 		try:
 			assert obj['ready'], 'not ready'
 
+			protocol = obj.get('protocol', 1)
+			assert protocol in self.PROTOCOLS, 'unknown protocol: %r' % (protocol, )
+			self.protocols[player_idx] = protocol
 
 			if 'deck' in obj:
 				assert self.pool, 'no pool'
@@ -112,13 +121,24 @@ class BaseGame():
 			raise GameException('game is over')
 
 		return [
-			{
+			self.round_header(player_idx)
+			for player_idx in range(len(self.players))
+		]
+
+	def round_header(self, player_idx):
+		if self.protocols[player_idx] == 1:
+			return {
 				'idx': player_idx,
 				'round': self.current_round,
 				'deck': list(self.decks[player_idx]),
 			}
-			for player_idx in range(len(self.players))
-		]
+
+		# The player already knows its deck; the first round tells it the scores after card costs.
+		return filter_nones({
+			'idx': player_idx,
+			'round': self.current_round,
+			'scores': list(self.scores) if self.current_round == 1 else None,
+		})
 
 	def look(self, player_idx):
 		deck = self.decks[player_idx]
@@ -201,16 +221,32 @@ class BaseGame():
 
 			took.append(stolen_card)
 
-		return [
-			filter_nones({
+		responses = []
+		for player_idx in range(len(self.players)):
+			look = self.look(1 - player_idx) if looks[player_idx] and not any(chickens) else None
+
+			if self.protocols[player_idx] == 1:
+				responses.append(filter_nones({
+					'idx': player_idx,
+					'hands': list(hands),
+					'scores': list(self.scores),
+					'look': look,
+					'took': took[player_idx],
+				}))
+				continue
+
+			robbed = thieves[1 - player_idx] and not any(chickens)
+			responses.append(filter_nones({
 				'idx': player_idx,
-				'hands': list(hands),
-				'scores': list(self.scores),
-				'look': self.look(1 - player_idx) if looks[player_idx] and not any(chickens) else None,
+				'played': cards[1 - player_idx],
+				'payoffs': list(payoffs),
+				'look': look,
 				'took': took[player_idx],
-			})
-			for player_idx in range(len(self.players))
-		]
+				'returned': cards[player_idx] if robbed and not thieves[player_idx] else None,
+				'lost': took[1 - player_idx],
+			}))
+
+		return responses
 
 	def end_in_favour_of(self, player_idx):
 		self.current_round = self.total_rounds + 1
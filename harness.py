@@ -0,0 +1,185 @@
+'''
+Test a bot locally against the field before pushing it.
+
+Runs seeded matches between one bot directory and every bot in bots/ (or a chosen subset) across a process pool, and
+reports win rates, fouls by reason and how much of the move budget the bot uses. Nothing is written to hack.db unless
+--save is given, and games against past versions (`--against team4@dump2`) never are.
+'''
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import db
+from engine import Engine, TIMEOUT
+
+LOGGER = logging.getLogger(__name__)
+
+
+def load_bot(path):
+	'''
+	Import a bot directory as `bots.<name>`, so it can live outside bots/ and still use `from .. import base`.
+	'''
+	path = os.path.abspath(path)
+	name = os.path.basename(path.rstrip(os.sep))
+	module_name = 'bots.' + name
+	if os.path.dirname(path) == os.path.abspath('bots'):
+		return name
+
+	spec = importlib.util.spec_from_file_location(
+		module_name,
+		os.path.join(path, '__init__.py'),
+		submodule_search_locations=[path],
+	)
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[module_name] = module
+	spec.loader.exec_module(module)
+	return name
+
+
+class HarnessEngine(Engine):
+	def __init__(self, tournament_id, gen, rounds, save=False):
+		super().__init__(tournament_id, gen, rounds)
+		self.save = save
+		self.results = []
+
+	def record_pairing_result(self, player_names, scores, outcome, foul=None, peak_mem=(None, None)):
+		self.results.append((list(scores), outcome, foul))
+		if self.save and not any('@' in player_name for player_name in player_names):
+			super().record_pairing_result(player_names, scores, outcome, foul, peak_mem)
+
+
+def run_one(bot_path, opponent, seat, seed, gen, rounds, save, tournament_id):
+	name = load_bot(bot_path)
+	player_names = [name, opponent] if seat == 0 else [opponent, name]
+
+	random.seed(seed)
+	engine = HarnessEngine(tournament_id, gen, rounds, save)
+	setup = engine.prepare_match(player_names)
+	winner = engine.run_match(player_names, setup)
+
+	[(scores, outcome, foul)] = engine.results
+	player = setup.players[seat] if len(setup.players) == 2 else None
+	latencies = player.latencies if player else []
+	cpu_times = player.cpu_times if player else []
+
+	if winner == seat + 1:
+		result = 'win'
+	elif winner == 2 - seat:
+		result = 'loss'
+	elif winner == 0:
+		result = 'draw'
+	else:
+		result = 'chicken'
+
+	return {
+		'opponent': opponent,
+		'result': result,
+		'outcome': outcome,
+		'fouled': foul is not None and foul[0] == seat,
+		'opponent_fouled': foul is not None and foul[0] != seat,
+		'reason': foul[1] if foul else None,
+		# Setup is timed from the header being sent, which can be early, so only moves count.
+		'latencies': latencies[1:],
+		'cpu_times': cpu_times[1:],
+	}
+
+
+def report(results):
+	by_opponent = defaultdict(list)
+	for result in results:
+		by_opponent[result['opponent']].append(result)
+
+	print('%-16s %6s %5s %5s %5s %5s %8s' % ('opponent', 'played', 'win', 'draw', 'loss', 'chkn', 'win rate'))
+	for opponent, games in sorted(by_opponent.items()):
+		counts = Counter(game['result'] for game in games)
+		print('%-16s %6d %5d %5d %5d %5d %7.1f%%' % (
+			opponent,
+			len(games),
+			counts['win'],
+			counts['draw'],
+			counts['loss'],
+			counts['chicken'],
+			100 * counts['win'] / len(games),
+		))
+
+	fouls = Counter(result['reason'] for result in results if result['fouled'])
+	opponent_fouls = Counter(result['reason'] for result in results if result['opponent_fouled'])
+	print()
+	print('fouls: %d' % sum(fouls.values()))
+	for reason, count in fouls.most_common():
+		print('  %4d  %s' % (count, reason))
+	print('opponent fouls: %d' % sum(opponent_fouls.values()))
+	for reason, count in opponent_fouls.most_common():
+		print('  %4d  %s' % (count, reason))
+
+	latencies = sorted(latency for result in results for latency in result['latencies'])
+	cpu_times = sorted(cpu_time for result in results for cpu_time in result['cpu_times'])
+	if latencies:
+		print()
+		print('move latency over %d moves:' % (len(latencies), ))
+		print_percentiles(latencies)
+	if cpu_times:
+		# The budget is charged in CPU time; see engine.charged_wait.
+		print('move CPU time, budget %.0fms:' % (TIMEOUT * 1000, ))
+		print_percentiles(cpu_times)
+		print('  %d moves over half the budget' % sum(cpu_time > TIMEOUT / 2 for cpu_time in cpu_times))
+
+
+def print_percentiles(times):
+	print('  median %.2fms, p99 %.2fms, max %.2fms' % (
+		statistics.median(times) * 1000,
+		times[min(len(times) - 1, int(len(times) * 0.99))] * 1000,
+		times[-1] * 1000,
+	))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('bot', help='bot directory, in bots/ or anywhere else')
+	parser.add_argument('--against', help='comma separated opponents (default: every bot in bots/)')
+	parser.add_argument('--matches', type=int, default=10, help='matches per opponent, alternating seats')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--gen', type=int)
+	parser.add_argument('--rounds', type=int)
+	parser.add_argument('--jobs', type=int, default=os.cpu_count())
+	parser.add_argument('--save', action='store_true', help='record the matches in hack.db')
+	args = parser.parse_args()
+
+	gen, rounds = db.latest_engine_params() if os.path.exists(db.DB_FILE) else (0, 50)
+	gen = gen if args.gen is None else args.gen
+	rounds = rounds if args.rounds is None else args.rounds
+
+	name = os.path.basename(os.path.abspath(args.bot).rstrip(os.sep))
+	if args.against:
+		opponents = args.against.split(',')
+	else:
+		opponents = sorted(x for x in Engine(None, gen, rounds).get_players() if x != name)
+
+	tournament_id = 'harness-%d' % (time.time(), )
+	if args.save:
+		db.setupdb()
+
+	tasks = [
+		(args.bot, opponent, i % 2, args.seed + i, gen, rounds, args.save, tournament_id)
+		for opponent in opponents
+		for i in range(args.matches)
+	]
+
+	with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+		results = list(executor.map(run_one, *zip(*tasks)))
+
+	print('%s: gen=%d, rounds=%d, %d matches' % (name, gen, rounds, len(results)))
+	report(results)
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.CRITICAL)
+	main()
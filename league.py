@@ -0,0 +1,133 @@
+'''
+Does the new code beat the old? Play the current bots against past versions from the snapshot store.
+
+Past versions are entered as `<bot>@<snapshot>` (see `snapshots.py`) and imported straight from the snapshot, so nothing
+is unpacked into `bots/`. Only current-versus-past pairs are played, picked by the same rule as `scheduler.py`: the
+pair whose result is least settled goes next.
+
+Results are kept in `league_results` by the source hash of both versions rather than by name. A bot that hasn't changed
+picks up where it left off, one that changed starts over (and gets its old results back if it's reverted), and a past
+version identical to the current one is never played against it. Matches aren't written to `pairing_results`, so the
+leaderboards only ever show the real bots.
+'''
+import argparse
+import logging
+import time
+
+from collections import defaultdict
+
+import snapshots
+from db import setupdb, latest_engine_params, league_outcomes, save_league_result
+from engine import Engine, TIMEOUT
+from scheduler import Scheduler, bot_source_hash
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LeagueEngine(Engine):
+	def __init__(self, tournament_id, gen, rounds, zygote=None, versions=()):
+		super().__init__(tournament_id, gen, rounds, zygote)
+		# Past versions to play against, as `<bot>@<snapshot>`; see `snapshots.load_bot`. Only the league enters them,
+		# so they never reach the leaderboards.
+		self.versions = list(versions)
+
+	def get_players(self):
+		yield from super().get_players()
+		for player_name in self.versions:
+			LOGGER.info("adding %s", player_name)
+			yield player_name
+
+	def record_pairing_result(self, player_names, scores, outcome, foul=None, peak_mem=(None, None)):
+		# The league keeps its own results, see `League.add`.
+		pass
+
+
+class League(Scheduler):
+	def __init__(self, engine):
+		super().__init__(engine)
+		self.hashes = {}
+		# `{(hash a, hash b): [a's wins, b's wins]}` with hash a < hash b; draws and chickens add half to each.
+		self.outcomes = defaultdict(lambda: [0.0, 0.0])
+
+	def load(self):
+		for p1_hash, p2_hash, games, p1_wins, p2_wins in league_outcomes(self.engine.gen):
+			self.add_outcome(p1_hash, p2_hash, p1_wins, p2_wins, games - p1_wins - p2_wins)
+
+	def add_outcome(self, p1_hash, p2_hash, p1_wins, p2_wins, draws=0):
+		key = tuple(sorted((p1_hash, p2_hash)))
+		wins = [p1_wins, p2_wins] if key[0] == p1_hash else [p2_wins, p1_wins]
+		outcome = self.outcomes[key]
+		outcome[0] += wins[0] + draws / 2
+		outcome[1] += wins[1] + draws / 2
+
+	def refresh(self):
+		'''
+		Pick up added, removed and changed bots, and line each pair up with the results of the versions now playing.
+		'''
+		self.players = sorted(self.engine.get_players())
+		self.hashes = {player: bot_source_hash(player) for player in self.players}
+
+		self.stats.clear()
+		for a, b in self.pairs():
+			key = tuple(sorted((self.hashes[a], self.hashes[b])))
+			wins = self.outcomes.get(key, [0.0, 0.0])
+			self.stats[a, b] = list(wins) if key[0] == self.hashes[a] else list(reversed(wins))
+
+	def pairs(self):
+		return [
+			(a, b) for a, b in super().pairs()
+			if ('@' in a) != ('@' in b) and self.hashes[a] != self.hashes[b]
+		]
+
+	def add(self, p1, p2, p1_wins, p2_wins, draws=0):
+		super().add(p1, p2, p1_wins, p2_wins, draws)
+		self.add_outcome(self.hashes[p1], self.hashes[p2], p1_wins, p2_wins, draws)
+		save_league_result(self.engine.gen, p1, self.hashes[p1], p2, self.hashes[p2], 1 if p1_wins else 2 if p2_wins else 0)
+
+	def table(self):
+		'''
+		`(current bot, past version, games, current bot's wins, past version's wins)` for every pair, draws counting half.
+		'''
+		rows = []
+		for a, b in self.pairs():
+			wins = self.stats[a, b]
+			if '@' in a:
+				a, b, wins = b, a, wins[::-1]
+			rows.append((a, b, sum(wins), wins[0], wins[1]))
+		return sorted(rows)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('versions', help='comma separated past versions, as bot@snapshot or a whole snapshot')
+	parser.add_argument('--matches', type=int, default=200, help='stop after this many matches')
+	parser.add_argument('--refresh', type=float, default=60, help='seconds between checks for changed bots')
+	parser.add_argument('--report', type=int, default=100, help='log the ranking every this many matches')
+	parser.add_argument('--processes', action='store_true', help='run each player in a process forked from a zygote')
+	args = parser.parse_args()
+
+	gen, rounds = latest_engine_params()
+
+	zygote = None
+	if args.processes:
+		from zygote import Zygote
+		zygote = Zygote(TIMEOUT)
+		zygote.start()
+
+	try:
+		engine = LeagueEngine('league-%d' % (time.time(), ), gen, rounds, zygote, versions=snapshots.expand_versions(args.versions))
+		league = League(engine)
+		league.run(args.matches, args.refresh, args.report)
+	finally:
+		if zygote is not None:
+			zygote.stop()
+
+	print('%-20s %-24s %6s %6s %6s' % ('bot', 'past version', 'games', 'wins', 'losses'))
+	for current, past, games, wins, losses in league.table():
+		print('%-20s %-24s %6g %6g %6g' % (current, past, games, wins, losses))
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	setupdb()
+	main()
@@ -0,0 +1,250 @@
+'''
+Macro benchmark for the engine: record real matches, then replay them with scripted players.
+
+`record` plays seeded matches between the bots in bots/ and stores everything each bot sent (its setup and every hand)
+as one JSON object per line. `run` feeds those recordings back through `Engine.run_match`, with scripted players that
+answer instantly, so the time measured is the engine, the queue protocol, `game.py` and the writes to a scratch
+`hack.db` -- on the shape of real matches rather than a microbenchmark's.
+
+Look and Take are random, so a replay can drift from its recording; a scripted player whose recorded card is no
+longer in its deck plays the first card it has instead. Replays are seeded, so every run plays the same games.
+'''
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import statistics
+import tempfile
+import time
+
+from collections import defaultdict
+
+import db
+from bots import base
+from engine import Engine, PlayerThread
+
+LOGGER = logging.getLogger(__name__)
+
+# A scripted player gives up after this long without hearing from the engine, e.g. when a Chicken ended the game.
+IDLE_TIMEOUT = 1.0
+
+
+class RecordingPlayer(PlayerThread):
+	def __init__(self, player_num, player_module):
+		super().__init__(player_num, player_module)
+		self.script = []
+
+	def receive(self):
+		obj = super().receive()
+		self.script.append(obj)
+		return obj
+
+
+class RecordingEngine(Engine):
+	def __init__(self, tournament_id, gen, rounds):
+		super().__init__(tournament_id, gen, rounds)
+		self.fouled = False
+
+	def make_player(self, player_num, player_name):
+		return RecordingPlayer(player_num, self.load_module(player_name))
+
+	def record_pairing_result(self, player_names, scores, outcome, foul=None, peak_mem=(None, None)):
+		self.fouled = outcome == 'foul'
+
+
+class ScriptedPlayer(base.Player):
+	'''
+	Plays back a recording, speaking whichever protocol the recorded bot did.
+	'''
+
+	def __init__(self, script, player_in_queue, player_out_queue):
+		super().__init__(player_in_queue, player_out_queue)
+		self.script = script
+		self.PROTOCOL = script[0].get('protocol', 1)
+
+	def receive(self):
+		obj = self.player_in_queue.get(timeout=IDLE_TIMEOUT)
+		if self.protocol == 2:
+			self.expand(obj)
+		return obj
+
+	def run(self):
+		try:
+			game_header = self.receive()
+			self.observe(game_header)
+			self.send(self.script[0])
+
+			for i in range(game_header['rounds']):
+				round_header = self.receive()
+				message = self.script[i + 1] if i + 1 < len(self.script) else {}
+				if message.get('hand') not in round_header['deck']:
+					message = {'hand': round_header['deck'][0]}
+				self.send(message)
+				self.receive()
+
+		except queue.Empty:
+			pass
+
+	def observe(self, obj):
+		# Only keep what `expand` needs; the opponent model isn't part of what's being measured.
+		if 'deck' in obj:
+			self.deck = list(obj['deck'])
+
+
+class Script:
+	'''
+	Stands in for a bot module: `PlayerThread` only needs its `Player`.
+	'''
+
+	def __init__(self, name, messages):
+		self.name = name
+		self.messages = messages
+
+	def Player(self, player_in_queue, player_out_queue):
+		return ScriptedPlayer(self.messages, player_in_queue, player_out_queue)
+
+	def __str__(self):
+		return 'Script(%s)' % (self.name, )
+
+
+class ReplayEngine(Engine):
+	def __init__(self, tournament_id, gen, rounds, save=True):
+		super().__init__(tournament_id, gen, rounds)
+		self.save = save
+		self.scripts = {}
+
+	def make_player(self, player_num, player_name):
+		return PlayerThread(player_num, self.scripts[player_num - 1])
+
+	def record_pairing_result(self, player_names, scores, outcome, foul=None, peak_mem=(None, None)):
+		if self.save:
+			super().record_pairing_result(player_names, scores, outcome, foul, peak_mem)
+
+
+def record(output, matches, gens, rounds, players, seed):
+	rng = random.Random(seed)
+	recorded = 0
+
+	with open(output, 'a') as f:
+		for i in range(matches):
+			gen = rng.choice(gens)
+			match_rounds = rng.choice(rounds)
+			player_names = rng.sample(players, 2)
+			match_seed = rng.randrange(2 ** 32)
+
+			random.seed(match_seed)
+			engine = RecordingEngine('replay-record', gen, match_rounds)
+			setup = engine.prepare_match(player_names)
+			engine.run_match(player_names, setup)
+
+			if engine.fouled:
+				# A foul usually means a timeout, which a scripted player can't reproduce.
+				LOGGER.info('not recording %r, it ended in a foul', player_names)
+				continue
+
+			f.write(json.dumps({
+				'gen': gen,
+				'rounds': match_rounds,
+				'players': player_names,
+				'seed': match_seed,
+				'scripts': [player.script for player in setup.players],
+			}) + '\n')
+			recorded += 1
+
+	return recorded
+
+
+def load_recordings(path):
+	with open(path) as f:
+		return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(recordings, save=True):
+	'''
+	Play every recording once; returns `(seconds, rounds played)` per recording.
+	'''
+	timings = []
+	for recording in recordings:
+		random.seed(recording['seed'])
+		engine = ReplayEngine('replay', recording['gen'], recording['rounds'], save)
+		engine.scripts = [Script(name, script) for name, script in zip(recording['players'], recording['scripts'])]
+
+		start = time.perf_counter()
+		setup = engine.prepare_match(recording['players'])
+		engine.run_match(recording['players'], setup)
+		elapsed = time.perf_counter() - start
+
+		timings.append((elapsed, setup.game.current_round - 1))
+
+	return timings
+
+
+def report(recordings, timings):
+	total = sum(elapsed for elapsed, _rounds in timings)
+	rounds = sum(rounds for _elapsed, rounds in timings)
+	print('%d matches, %d rounds in %.3fs: %.1f matches/s, %.0f rounds/s' % (
+		len(timings),
+		rounds,
+		total,
+		len(timings) / total,
+		rounds / total,
+	))
+
+	by_gen = defaultdict(list)
+	for recording, timing in zip(recordings, timings):
+		by_gen[recording['gen']].append(timing)
+
+	print('%-4s %7s %10s %12s %12s' % ('gen', 'matches', 'matches/s', 'median ms', 'ms/round'))
+	for gen, gen_timings in sorted(by_gen.items()):
+		elapsed = [x for x, _rounds in gen_timings]
+		gen_rounds = sum(rounds for _elapsed, rounds in gen_timings)
+		print('%-4d %7d %10.1f %12.2f %12.3f' % (
+			gen,
+			len(gen_timings),
+			len(gen_timings) / sum(elapsed),
+			statistics.median(elapsed) * 1000,
+			sum(elapsed) * 1000 / max(gen_rounds, 1),
+		))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--recordings', default='replays.jsonl')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	record_parser = subparsers.add_parser('record', help='record matches between the bots in bots/')
+	record_parser.add_argument('--matches', type=int, default=100)
+	record_parser.add_argument('--gen', type=int, nargs='+', default=list(range(len(Engine.game_classes))))
+	record_parser.add_argument('--rounds', type=int, nargs='+', default=[6, 15, 51], help='gen 1 needs a multiple of 3')
+	record_parser.add_argument('--players', help='comma separated bots (default: every bot in bots/)')
+	record_parser.add_argument('--seed', type=int, default=0)
+
+	run_parser = subparsers.add_parser('run', help='replay the recordings and report throughput')
+	run_parser.add_argument('--repeat', type=int, default=1, help='replay every recording this many times')
+	run_parser.add_argument('--db', help='database to write results to (default: a scratch one)')
+	run_parser.add_argument('--no-db', action='store_true', help="don't write results at all")
+
+	args = parser.parse_args()
+
+	if args.command == 'record':
+		players = args.players.split(',') if args.players else sorted(Engine(None, 0, 0).get_players())
+		recorded = record(args.recordings, args.matches, args.gen, args.rounds, players, args.seed)
+		print('recorded %d of %d matches to %s' % (recorded, args.matches, args.recordings))
+
+	elif args.command == 'run':
+		recordings = load_recordings(args.recordings) * args.repeat
+
+		with tempfile.TemporaryDirectory() as tmp:
+			db.DB_FILE = args.db or os.path.join(tmp, 'hack.db')
+			if not args.no_db:
+				db.setupdb()
+			timings = replay(recordings, save=not args.no_db)
+
+		report(recordings, timings)
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.CRITICAL)
+	main()
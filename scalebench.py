@@ -0,0 +1,111 @@
+'''
+Scale benchmark for the engine: run knockout tournaments between thousands of synthetic players (see
+bots/_synthetic) and report how wall time, peak memory and database size grow with the number of entrants.
+
+Every size runs in a process of its own with a scratch `hack.db`, so peak memory and the database are that size's
+alone. Synthetic players answer instantly, so what grows is the engine's own cost: pairings, checkpoints and the rows
+written per match. Use `replay.py` for the cost of single matches.
+'''
+import argparse
+import json
+import logging
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import db
+from engine import Engine
+
+SIZES = [64, 256, 1024, 4096]
+TABLES = ['pairing_results', 'tournament_results', 'tournament_checkpoints']
+
+
+class ScaleEngine(Engine):
+	def get_players(self):
+		# Only the synthetic field, not whatever is in bots/.
+		return self.factory_players()
+
+
+def measure(entrants, gen=0, rounds=6):
+	'''
+	Run one tournament of `entrants` synthetic players against the current `db.DB_FILE`. The peak memory is the whole
+	process's, so it only means something in a fresh one.
+	'''
+	engine = ScaleEngine('scale-%d' % (entrants, ), gen, rounds, factories={'synthetic': entrants})
+
+	start = time.perf_counter()
+	engine.run()
+	elapsed = time.perf_counter() - start
+
+	conn = sqlite3.connect(db.DB_FILE)
+	rows = {table: conn.execute('select count(*) from %s' % (table, )).fetchone()[0] for table in TABLES}
+	conn.close()
+
+	return {
+		'entrants': entrants,
+		'matches': entrants - 1,
+		'seconds': elapsed,
+		# Kilobytes on Linux.
+		'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+		'db_bytes': os.path.getsize(db.DB_FILE),
+		'rows': rows,
+	}
+
+
+def measure_in_child(entrants, gen, rounds):
+	result = subprocess.run(
+		[sys.executable, __file__, '--gen', str(gen), '--rounds', str(rounds), 'one', str(entrants)],
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	return json.loads(result.stdout)
+
+
+def report(results):
+	print('%8s %8s %9s %10s %9s %9s %11s' % ('entrants', 'matches', 'seconds', 'matches/s', 'peak MB', 'DB KB', 'bytes/match'))
+	for result in results:
+		print('%8d %8d %9.2f %10.1f %9.1f %9.0f %11.0f' % (
+			result['entrants'],
+			result['matches'],
+			result['seconds'],
+			result['matches'] / result['seconds'],
+			result['peak_kb'] / 1024,
+			result['db_bytes'] / 1024,
+			result['db_bytes'] / result['matches'],
+		))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--gen', type=int, default=0)
+	parser.add_argument('--rounds', type=int, default=6, help='gen 1 needs a multiple of 3')
+	subparsers = parser.add_subparsers(dest='command')
+
+	run_parser = subparsers.add_parser('run', help='measure every size (the default)')
+	run_parser.add_argument('--sizes', default=','.join(str(x) for x in SIZES), help='comma separated numbers of entrants')
+
+	# What `run` starts for each size.
+	one_parser = subparsers.add_parser('one')
+	one_parser.add_argument('entrants', type=int)
+
+	args = parser.parse_args()
+
+	if args.command == 'one':
+		with tempfile.TemporaryDirectory() as tmp:
+			db.DB_FILE = os.path.join(tmp, 'hack.db')
+			db.setupdb()
+			print(json.dumps(measure(args.entrants, args.gen, args.rounds)))
+
+	else:
+		sizes = getattr(args, 'sizes', None) or ','.join(str(x) for x in SIZES)
+		report([measure_in_child(int(entrants), args.gen, args.rounds) for entrants in sizes.split(',')])
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.CRITICAL)
+	main()
@@ -0,0 +1,198 @@
+'''
+Run matches continuously where they tell us the most, instead of replaying whole brackets.
+
+Each pair of bots has a Beta posterior on how often the first beats the second, from every game played, archived ones
+included (draws and chickens count half to each). The next match goes to the pair whose posterior variance one more
+game is expected to shrink the most: that favours pairs with few games and close pairs over settled ones. When a bot's
+source changes, its earlier games are down-weighted by `STALE_WEIGHT`, so the pairs involving it become uncertain again
+and get played.
+'''
+import argparse
+import hashlib
+import itertools
+import logging
+import os
+import random
+import time
+
+from collections import defaultdict
+
+import snapshots
+from db import setupdb, latest_engine_params, bot_versions, save_bot_version, pair_outcomes
+from engine import Engine, TIMEOUT
+
+LOGGER = logging.getLogger(__name__)
+
+# How much a game counts once either bot has changed since it was played.
+STALE_WEIGHT = 0.25
+
+
+def bot_source_hash(player_name, path='bots'):
+	if '@' in player_name:
+		return snapshots.bot_source_hash(player_name)
+
+	digest = hashlib.sha1()
+	for root, dirs, files in os.walk(os.path.join(path, player_name)):
+		dirs[:] = sorted(x for x in dirs if x != '__pycache__')
+		for name in sorted(files):
+			digest.update(os.path.relpath(os.path.join(root, name), path).encode())
+			with open(os.path.join(root, name), 'rb') as f:
+				digest.update(f.read())
+	return digest.hexdigest()
+
+
+def beta_variance(a, b):
+	return a * b / ((a + b) ** 2 * (a + b + 1))
+
+
+def information_gain(wins, losses):
+	'''
+	Expected drop in the variance of a Beta(wins + 1, losses + 1) posterior from one more game.
+	'''
+	a, b = wins + 1, losses + 1
+	p = a / (a + b)
+	return beta_variance(a, b) - p * beta_variance(a + 1, b) - (1 - p) * beta_variance(a, b + 1)
+
+
+class Scheduler:
+	def __init__(self, engine):
+		self.engine = engine
+		# `{(a, b): [a's wins, b's wins]}` with a < b; draws and chickens add half to each.
+		self.stats = defaultdict(lambda: [0.0, 0.0])
+		self.versions = {}
+		self.players = []
+		self.played = defaultdict(int)
+
+	def load(self):
+		self.versions = bot_versions()
+		for p1, p2, current, games, p1_wins, p2_wins in pair_outcomes(self.engine.gen):
+			weight = 1 if current else STALE_WEIGHT
+			self.add(p1, p2, p1_wins * weight, p2_wins * weight, (games - p1_wins - p2_wins) * weight)
+
+	def add(self, p1, p2, p1_wins, p2_wins, draws=0):
+		key = tuple(sorted((p1, p2)))
+		wins = [p1_wins, p2_wins] if key[0] == p1 else [p2_wins, p1_wins]
+		stats = self.stats[key]
+		stats[0] += wins[0] + draws / 2
+		stats[1] += wins[1] + draws / 2
+
+	def refresh(self):
+		'''
+		Pick up added, removed and changed bots. A changed bot's games so far become stale.
+		'''
+		self.players = sorted(self.engine.get_players())
+		for player in self.players:
+			source_hash = bot_source_hash(player)
+			known = self.versions.get(player)
+			if known is not None and known[0] == source_hash:
+				continue
+
+			if known is None:
+				# First time we've seen it, so there's no telling which games were against this version.
+				save_bot_version(player, source_hash, '')
+			else:
+				LOGGER.info('%s changed, discounting its results', player)
+				save_bot_version(player, source_hash)
+				for key, stats in self.stats.items():
+					if player in key:
+						stats[0] *= STALE_WEIGHT
+						stats[1] *= STALE_WEIGHT
+			self.versions[player] = (source_hash, None)
+
+	def pairs(self):
+		'''
+		Every pair that could be scheduled, each as a sorted tuple.
+		'''
+		return list(itertools.combinations(self.players, 2))
+
+	def next_pair(self):
+		pairs = self.pairs()
+		random.shuffle(pairs)
+		return max(pairs, key=lambda pair: information_gain(*self.stats[pair]), default=None)
+
+	def play(self, pair):
+		# Alternate seats between plays of the same pair.
+		player_names = list(pair) if self.played[pair] % 2 == 0 else list(pair[::-1])
+		self.played[pair] += 1
+
+		setup = self.engine.prepare_match(player_names)
+		winner = self.engine.run_match(player_names, setup)
+		if setup.fouled is not None:
+			# Settled without a game, so it isn't one for either bot; `db.pair_outcomes` leaves it out too.
+			return
+		if winner > 0:
+			self.add(player_names[0], player_names[1], winner == 1, winner == 2)
+		else:
+			self.add(player_names[0], player_names[1], 0, 0, 1)
+
+	def ranking(self):
+		'''
+		Players by their mean posterior chance of beating the rest of the field.
+		'''
+		chances = defaultdict(list)
+		for pair in self.pairs():
+			wins, losses = self.stats[pair]
+			chances[pair[0]].append((wins + 1) / (wins + losses + 2))
+			chances[pair[1]].append((losses + 1) / (wins + losses + 2))
+		scores = {player: sum(chances[player]) / len(chances[player]) if chances[player] else 0.5 for player in self.players}
+		return sorted(scores.items(), key=lambda x: -x[1])
+
+	def run(self, matches=None, refresh=60, report=100):
+		self.load()
+		last_refresh = None
+		played = 0
+		while matches is None or played < matches:
+			if last_refresh is None or time.monotonic() - last_refresh >= refresh:
+				self.refresh()
+				last_refresh = time.monotonic()
+
+			pair = self.next_pair()
+			if pair is None:
+				LOGGER.warning('need at least two bots')
+				return
+
+			LOGGER.info('scheduling %s vs %s, gain %.5f', pair[0], pair[1], information_gain(*self.stats[pair]))
+			self.play(pair)
+			played += 1
+
+			if played % report == 0:
+				LOGGER.info('ranking after %d matches: %s', played, ', '.join(
+					'%s %.3f' % (player, score) for player, score in self.ranking()
+				))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--matches', type=int, help='stop after this many matches (default: run forever)')
+	parser.add_argument('--refresh', type=float, default=60, help='seconds between checks for changed bots')
+	parser.add_argument('--report', type=int, default=100, help='log the ranking every this many matches')
+	parser.add_argument('--processes', action='store_true', help='run each player in a process forked from a zygote')
+	parser.add_argument('--spectate', type=int, metavar='PORT', help='stream matches live to browsers on this port')
+	args = parser.parse_args()
+
+	gen, rounds = latest_engine_params()
+
+	spectators = None
+	if args.spectate:
+		import spectator
+		spectators = spectator.Broadcast()
+		spectator.serve(spectators, args.spectate)
+
+	zygote = None
+	if args.processes:
+		from zygote import Zygote
+		zygote = Zygote(TIMEOUT)
+		zygote.start()
+
+	try:
+		engine = Engine('schedule-%d' % (time.time(), ), gen, rounds, zygote, spectators=spectators)
+		Scheduler(engine).run(args.matches, args.refresh, args.report)
+	finally:
+		if zygote is not None:
+			zygote.stop()
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	setupdb()
+	main()
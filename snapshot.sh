@@ -7,5 +7,5 @@ if [ -z "$name" ]; then
 	exit 1
 fi
 
-rsync -r --exclude=__pycache__ --exclude=.git -v bots/ "$name/"
-zip -mr www/"$name".zip "$name/"
+# Only files that changed since the last snapshot are stored; webapp.py serves it as /$name.zip.
+python3 snapshots.py take "$name"
@@ -0,0 +1,325 @@
+'''
+Snapshots of the bot sources, stored once per distinct file.
+
+`take` hashes every file under `bots/` and copies only the ones the store hasn't seen into
+`snapshots/objects/<sha256>`, then writes `snapshots/manifests/<name>.json`: each file's path, hash and mode, plus the
+git revision of every bot that is its own repository (the team checkouts the arena pulls). A snapshot of an unchanged
+tree costs one manifest, so `arena.sh` takes one for every tournament.
+
+`zip` streams a snapshot out of the store as a zip with everything under `<name>/`, the same layout `snapshot.sh` used
+to build; `webapp.py` serves `/<name>.zip` the same way, so dumps no longer need copying into `www/`.
+'''
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import re
+import stat
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+import zipimport
+
+LOGGER = logging.getLogger(__name__)
+
+BOTS_DIR = 'bots'
+STORE_DIR = 'snapshots'
+EXCLUDE = ('__pycache__', '.git')
+
+BLOCK_SIZE = 65536
+
+
+def object_path(digest, store=None):
+	return os.path.join(store or STORE_DIR, 'objects', digest[:2], digest[2:])
+
+
+def manifest_path(name, store=None):
+	return os.path.join(store or STORE_DIR, 'manifests', name + '.json')
+
+
+def store_file(path, store=None):
+	'''
+	Hash `path` and add it to the store unless it's there already. Returns `(digest, added)`.
+	'''
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+			digest.update(block)
+	digest = digest.hexdigest()
+
+	target = object_path(digest, store)
+	if os.path.exists(target):
+		return digest, False
+
+	os.makedirs(os.path.dirname(target), exist_ok=True)
+	tmp = '%s.%d.tmp' % (target, os.getpid())
+	with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+		for block in iter(lambda: src.read(BLOCK_SIZE), b''):
+			dst.write(block)
+	os.replace(tmp, target)
+	return digest, True
+
+
+def revisions(path=BOTS_DIR):
+	'''
+	`{bot: git revision}` for every bot that is a checkout of its own repository.
+	'''
+	found = {}
+	for entry in sorted(os.listdir(path)):
+		if os.path.exists(os.path.join(path, entry, '.git')):
+			result = subprocess.run(['git', '-C', os.path.join(path, entry), 'rev-parse', 'HEAD'], capture_output=True, text=True)
+			if result.returncode == 0:
+				found[entry] = result.stdout.strip()
+	return found
+
+
+def take(name, path=BOTS_DIR, store=None):
+	'''
+	Snapshot `path` as `name`. Returns the manifest and how many files were new to the store.
+	'''
+	files = {}
+	added = 0
+	for root, dirs, names in os.walk(path):
+		dirs[:] = sorted(x for x in dirs if x not in EXCLUDE)
+		for filename in sorted(names):
+			full = os.path.join(root, filename)
+			digest, new = store_file(full, store)
+			files[os.path.relpath(full, path)] = [digest, stat.S_IMODE(os.stat(full).st_mode)]
+			added += new
+
+	manifest = {
+		'name': name,
+		'created': time.time(),
+		'revisions': revisions(path),
+		'files': files,
+	}
+	os.makedirs(os.path.dirname(manifest_path(name, store)), exist_ok=True)
+	tmp = manifest_path(name, store) + '.tmp'
+	with open(tmp, 'w') as f:
+		json.dump(manifest, f, indent='\t', sort_keys=True)
+	os.replace(tmp, manifest_path(name, store))
+
+	LOGGER.info('snapshot %s: %d files, %d new', name, len(files), added)
+	return manifest, added
+
+
+def load(name, store=None):
+	with open(manifest_path(name, store)) as f:
+		return json.load(f)
+
+
+def names(store=None):
+	try:
+		return sorted(x[:-len('.json')] for x in os.listdir(os.path.join(store or STORE_DIR, 'manifests')) if x.endswith('.json'))
+	except FileNotFoundError:
+		return []
+
+
+def write_zip(name, out, store=None, prefix=None):
+	'''
+	Write snapshot `name` to the file object `out` as a zip, a block at a time; `out` needn't be seekable. Everything
+	goes under `prefix/`, by default the snapshot's name.
+	'''
+	manifest = load(name, store)
+	date_time = time.localtime(manifest['created'])[:6]
+	with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+		for relpath, (digest, mode) in sorted(manifest['files'].items()):
+			info = zipfile.ZipInfo('%s/%s' % (prefix or name, relpath), date_time)
+			info.compress_type = zipfile.ZIP_DEFLATED
+			info.external_attr = (stat.S_IFREG | mode) << 16
+			with open(object_path(digest, store), 'rb') as src, zf.open(info, 'w') as dst:
+				for block in iter(lambda: src.read(BLOCK_SIZE), b''):
+					dst.write(block)
+
+
+def ingest_zip(path, name=None, store=None):
+	'''
+	Add a dump made by the old `snapshot.sh` (everything under `<name>/`) to the store as snapshot `name`.
+	'''
+	name = name or os.path.splitext(os.path.basename(path))[0]
+	files = {}
+	added = 0
+	latest = (1980, 1, 1, 0, 0, 0)
+	with zipfile.ZipFile(path) as zf:
+		for info in zf.infolist():
+			latest = max(latest, info.date_time)
+			if info.is_dir():
+				continue
+			relpath = info.filename.split('/', 1)[1]
+			if any(part in EXCLUDE for part in relpath.split('/')):
+				continue
+			data = zf.read(info)
+			digest = hashlib.sha256(data).hexdigest()
+			target = object_path(digest, store)
+			if not os.path.exists(target):
+				os.makedirs(os.path.dirname(target), exist_ok=True)
+				with open(target + '.tmp', 'wb') as f:
+					f.write(data)
+				os.replace(target + '.tmp', target)
+				added += 1
+			files[relpath] = [digest, stat.S_IMODE(info.external_attr >> 16) or 0o644]
+
+	manifest = {
+		'name': name,
+		'created': time.mktime(latest + (0, 0, -1)),
+		'revisions': {},
+		'files': files,
+	}
+	os.makedirs(os.path.dirname(manifest_path(name, store)), exist_ok=True)
+	with open(manifest_path(name, store), 'w') as f:
+		json.dump(manifest, f, indent='\t', sort_keys=True)
+
+	LOGGER.info('snapshot %s from %s: %d files, %d new', name, path, len(files), added)
+	return manifest, added
+
+
+# Past versions of bots, named `<bot>@<snapshot>`, are imported straight from a zip of their snapshot. Each snapshot
+# is its own package, so `from .. import base` in a past bot gets the base.py it was written against.
+_import_lock = threading.Lock()
+
+
+def split_name(player_name):
+	'''
+	`'team4@dump2'` is `('team4', 'dump2')`; a current bot's snapshot is None.
+	'''
+	bot, _, snapshot = player_name.partition('@')
+	return bot, snapshot or None
+
+
+def package_name(snapshot):
+	return 'snapshot_' + re.sub(r'\W', '_', snapshot)
+
+
+def import_path(snapshot, store=None):
+	'''
+	A zip of the snapshot with its bots under `package_name(snapshot)/`, built from the store the first time.
+	'''
+	path = os.path.join(store or STORE_DIR, 'zips', snapshot + '.zip')
+	if not os.path.exists(path):
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		tmp = '%s.%d.tmp' % (path, os.getpid())
+		with open(tmp, 'wb') as f:
+			write_zip(snapshot, f, store, package_name(snapshot))
+		os.replace(tmp, path)
+	return path
+
+
+def load_bot(player_name, store=None):
+	bot, snapshot = split_name(player_name)
+	package = package_name(snapshot)
+	with _import_lock:
+		if package not in sys.modules:
+			spec = zipimport.zipimporter(import_path(snapshot, store)).find_spec(package)
+			if spec is None:
+				raise ImportError('snapshot %s has no bots package' % (snapshot, ))
+			module = importlib.util.module_from_spec(spec)
+			sys.modules[package] = module
+			try:
+				spec.loader.exec_module(module)
+			except:
+				del sys.modules[package]
+				raise
+		return importlib.import_module('%s.%s' % (package, bot))
+
+
+def bots_in(snapshot, store=None):
+	'''
+	The bots in a snapshot, as version qualified names.
+	'''
+	files = load(snapshot, store)['files']
+	return sorted({
+		'%s@%s' % (relpath.split('/')[0], snapshot)
+		for relpath in files
+		# Like `Engine.get_players`, leave out packages such as bots/_synthetic that aren't bots themselves.
+		if relpath.endswith('/__init__.py') and relpath.count('/') == 1 and not relpath.startswith('_')
+	})
+
+
+def expand_versions(spec, store=None):
+	'''
+	Version qualified names from a comma separated `spec`, where a bare snapshot name means every bot in it.
+	'''
+	versions = []
+	for item in (spec or '').split(','):
+		if '@' in item:
+			versions.append(item)
+		elif item:
+			versions.extend(bots_in(item, store))
+	return versions
+
+
+def walk_order(relpath):
+	# The order os.walk visits files in, when it's given sorted directories: a directory's files, then its subdirectories.
+	*dirs, name = relpath.split('/')
+	return tuple((1, x) for x in dirs) + ((0, name), )
+
+
+def bot_source_hash(player_name, store=None):
+	'''
+	Same as `scheduler.bot_source_hash`, for a bot in a snapshot: a past version that is identical to the current one
+	has the same hash.
+	'''
+	bot, snapshot = split_name(player_name)
+	digest = hashlib.sha1()
+	files = load(snapshot, store)['files']
+	for relpath in sorted((x for x in files if x.startswith(bot + '/')), key=walk_order):
+		digest.update(relpath.encode())
+		with open(object_path(files[relpath][0], store), 'rb') as f:
+			digest.update(f.read())
+	return digest.hexdigest()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--store', default=STORE_DIR)
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	take_parser = subparsers.add_parser('take', help='snapshot the bots')
+	take_parser.add_argument('name')
+	take_parser.add_argument('--path', default=BOTS_DIR)
+
+	zip_parser = subparsers.add_parser('zip', help='write a snapshot out as a zip')
+	zip_parser.add_argument('name')
+	zip_parser.add_argument('output', nargs='?', help='zip file to write (default: stdout)')
+
+	subparsers.add_parser('list', help='list snapshots')
+
+	import_parser = subparsers.add_parser('import', help='add a zip made by the old snapshot.sh')
+	import_parser.add_argument('zip')
+	import_parser.add_argument('--name', help='snapshot name (default: the zip file name)')
+
+	args = parser.parse_args()
+
+	if args.command == 'take':
+		take(args.name, args.path, args.store)
+
+	elif args.command == 'zip':
+		if args.output is None:
+			write_zip(args.name, sys.stdout.buffer, args.store)
+		else:
+			with open(args.output + '.tmp', 'wb') as f:
+				write_zip(args.name, f, args.store)
+			os.replace(args.output + '.tmp', args.output)
+
+	elif args.command == 'import':
+		ingest_zip(args.zip, args.name, args.store)
+
+	elif args.command == 'list':
+		for name in names(args.store):
+			manifest = load(name, args.store)
+			print('%s\t%s\t%d files\t%s' % (
+				name,
+				time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(manifest['created'])),
+				len(manifest['files']),
+				' '.join('%s@%s' % (bot, revision[:8]) for bot, revision in sorted(manifest['revisions'].items())),
+			))
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	main()
@@ -0,0 +1,158 @@
+'''
+Watch matches live: the engine publishes round events into a `Broadcast`, and a small HTTP server streams them to
+browsers as Server-Sent Events.
+
+The broadcast is a fixed size ring of recent events. Publishing appends to it and never waits on a reader, so a slow
+spectator can't hold up `run_match`; one that falls more than `BUFFER_SIZE` events behind skips ahead and is told how
+many it missed. Browsers reconnect on their own, resuming from the last event they saw while it's still in the ring.
+'''
+import itertools
+import json
+import logging
+import threading
+
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOGGER = logging.getLogger(__name__)
+
+# Events kept for readers that fall behind or reconnect.
+BUFFER_SIZE = 4096
+# Seconds between comments sent to idle streams, so proxies don't close them.
+KEEPALIVE = 15
+
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>GAMHACK 2020 - live</title>
+<link rel="stylesheet" href="/style.css">
+</head>
+<body>
+<h1>Live matches</h1>
+<pre id="log"></pre>
+<script>
+const log = document.getElementById('log');
+const events = new EventSource('/events');
+function show(line) {
+	log.textContent = line + '\\n' + log.textContent.slice(0, 100000);
+}
+events.addEventListener('start', e => {
+	const d = JSON.parse(e.data);
+	show(`${d.match}: gen ${d.gen}, ${d.rounds} rounds`);
+});
+events.addEventListener('round', e => {
+	const d = JSON.parse(e.data);
+	show(`${d.match}: round ${d.round} ${d.hands.join(' v ')}, scores ${d.scores.join('-')}`
+		+ (d.looks.some(x => x) ? `, looked ${JSON.stringify(d.looks)}` : '')
+		+ (d.took.some(x => x) ? `, took ${JSON.stringify(d.took)}` : ''));
+});
+events.addEventListener('end', e => {
+	const d = JSON.parse(e.data);
+	show(`${d.match}: ${d.outcome} ${d.scores.join('-')}` + (d.foul ? ` (${d.foul})` : ''));
+});
+events.addEventListener('skipped', e => show(`... missed ${e.data} events`));
+</script>
+</body>
+</html>
+'''
+
+
+class Broadcast:
+	'''
+	Ring buffer of `(seq, frame)`, where `seq` counts up from 1 and `frame` is the event encoded for the wire.
+	'''
+
+	def __init__(self, size=BUFFER_SIZE):
+		self.events = deque(maxlen=size)
+		self.seq = 0
+		self.condition = threading.Condition()
+
+	def publish(self, kind, data):
+		frame = 'event: %s\ndata: %s\n' % (kind, json.dumps(data))
+		with self.condition:
+			self.seq += 1
+			self.events.append((self.seq, ('id: %d\n' % (self.seq, ) + frame + '\n').encode()))
+			self.condition.notify_all()
+
+	def read(self, after, timeout=None):
+		'''
+		Events after `after`, waiting up to `timeout` for there to be any. Returns `(events, missed)`, where `missed` is
+		how many had already dropped out of the ring.
+		'''
+		with self.condition:
+			self.condition.wait_for(lambda: self.seq > after, timeout)
+			if not self.events or self.seq <= after:
+				return [], 0
+			first = self.events[0][0]
+			# Sequence numbers are contiguous, so the position in the ring follows from them.
+			events = list(itertools.islice(self.events, max(0, after + 1 - first), None))
+		return events, max(0, first - after - 1)
+
+
+class SpectatorHandler(BaseHTTPRequestHandler):
+	broadcast = None
+	# A client that stops reading for this long is dropped instead of holding a thread.
+	timeout = 60
+
+	def do_GET(self):
+		if self.path == '/':
+			self.send_page()
+		elif self.path == '/events':
+			self.send_events()
+		else:
+			self.send_error(404)
+
+	def send_page(self):
+		body = PAGE.encode()
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/html; charset=utf-8')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def send_events(self):
+		try:
+			after = int(self.headers.get('Last-Event-ID'))
+		except (TypeError, ValueError):
+			# New spectators start with what happens next.
+			after = self.broadcast.seq
+		after = min(after, self.broadcast.seq)
+
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/event-stream')
+		self.send_header('Cache-Control', 'no-cache')
+		self.send_header('X-Accel-Buffering', 'no')
+		self.end_headers()
+
+		try:
+			while True:
+				events, missed = self.broadcast.read(after, KEEPALIVE)
+				if missed:
+					LOGGER.info('%s fell behind, skipping %d events', self.address_string(), missed)
+					self.wfile.write(('event: skipped\ndata: %d\n\n' % (missed, )).encode())
+				if not events:
+					self.wfile.write(b': keepalive\n\n')
+				for seq, frame in events:
+					self.wfile.write(frame)
+					after = seq
+				self.wfile.flush()
+		except OSError:
+			# Went away, or stopped reading.
+			pass
+
+	def log_message(self, format, *args):
+		LOGGER.debug('%s - ' + format, self.address_string(), *args)
+
+
+def serve(broadcast, port=8081, host='localhost'):
+	'''
+	Stream `broadcast` from a background thread; returns the server, for `shutdown()`.
+	'''
+	handler = type('Handler', (SpectatorHandler, ), {'broadcast': broadcast})
+	server = ThreadingHTTPServer((host, port), handler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, name='spectator', daemon=True).start()
+	LOGGER.info('spectators on http://%s:%d/', host, server.server_address[1])
+	return server
+
@@ -0,0 +1,24 @@
+import os
+
+import affinity
+
+
+def test_plan_slots_leaves_a_reserve():
+	assert affinity.plan_slots(range(8)) == [(1, 2), (3, 4), (5, 6)]
+	assert affinity.plan_slots(range(8), reserve=2, per_match=3) == [(2, 3, 4), (5, 6, 7)]
+
+
+def test_plan_slots_on_a_small_box_runs_unpinned():
+	assert affinity.plan_slots([0]) == [None]
+	assert affinity.plan_slots([0, 1]) == [None]
+
+
+def test_reserved_cores_are_the_ones_left_out():
+	assert affinity.reserved_cores(range(8)) == (0, )
+	assert affinity.reserved_cores(range(8), reserve=2) == (0, 1)
+	assert affinity.reserved_cores([0, 1]) is None
+
+
+def test_jitter_is_measured():
+	median, p99, maximum = affinity.measure_jitter(samples=10)
+	assert 0 <= median <= p99 <= maximum
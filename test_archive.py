@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import archive
+import db
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+def backdate(days, table, where='1'):
+	conn = sqlite3.connect(db.DB_FILE)
+	conn.execute("update %s set cr_date = datetime('now', ?) where %s" % (table, where), ('-%d days' % (days, ), ))
+	conn.commit()
+	conn.close()
+
+
+def test_old_results_move_to_the_archive(hack_db):
+	db.save_pairing_result('old', 0, 'a', 1, 'b', 0, 'win', (10, 20), None)
+	db.save_tournament_result('old', [['a'], ['b']])
+	db.save_pairing_result('official', 0, 'a', 0, 'b', 1, 'win')
+	db.save_tournament_result('official', [['b'], ['a']])
+	db.save_tournament_result('newest', [['a', 'b']])
+	backdate(90, 'pairing_results')
+	backdate(90, 'tournament_results')
+	db.save_pairing_result('new', 0, 'b', 1, 'a', 1, 'draw')
+
+	conn = sqlite3.connect(hack_db)
+	conn.execute("insert into official (tournament_id) values ('official')")
+	conn.commit()
+	head_to_head = conn.execute('select * from head_to_head order by 1, 2, 3').fetchall()
+	conn.close()
+
+	moved = archive.archive(days=30)
+	# The last 'newest' row stays behind, though it's just as old.
+	assert moved == {'pairing_results': 1, 'pairing_series': 0, 'tournament_results': 3}
+	assert len(archive.partitions()) == 1
+
+	conn = sqlite3.connect(hack_db)
+	assert conn.execute('select tournament_id from pairing_results order by id').fetchall() == [('official', ), ('new', )]
+	assert conn.execute('select * from head_to_head order by 1, 2, 3').fetchall() == head_to_head
+	conn.close()
+
+	conn = archive.connect_history()
+	rows = conn.execute('select tournament_id, p1_peak_mem from all_pairing_results order by tournament_id').fetchall()
+	assert rows == [('new', None), ('official', None), ('old', 10)]
+	assert conn.execute('select count(*) from all_tournament_results').fetchone() == (6, )
+	conn.close()
+
+	assert archive.archive(days=30) == dict.fromkeys(archive.ARCHIVED_TABLES, 0)
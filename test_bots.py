@@ -0,0 +1,164 @@
+import queue
+import random
+
+from collections import Counter
+
+import pytest
+
+from bots import montebot, sim
+from bots.base import DeckEstimate, OpponentModel, Player
+from game import GameGen0, GameGen3, EverybodyDiesException
+
+
+def play(game, models, rounds, pick):
+	for _ in range(rounds):
+		headers = game.round_headers()
+		for model, header in zip(models, headers):
+			model.round_header(header)
+
+		for idx, model in enumerate(models):
+			assert model.own.counts + Counter() == Counter(game.decks[idx])
+
+			estimate = model.deck
+			actual = Counter(game.decks[1 - idx])
+			assert estimate.size == sum(actual.values())
+			for card in set(actual) | set(estimate.possible):
+				assert estimate.known[card] <= actual[card] <= estimate.possible[card]
+
+		hands = [pick(header['deck']) for header in headers]
+		try:
+			footers = game.apply(hands)
+		except EverybodyDiesException:
+			return
+
+		for model, footer in zip(models, footers):
+			model.round_footer(footer)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_opponent_model_tracks_gen3_decks(seed):
+	random.seed(seed)
+	rounds = 9
+	game = GameGen3(['p1', 'p2'], rounds)
+	header = game.game_header()
+	models = [OpponentModel(header), OpponentModel(header)]
+
+	for idx in range(2):
+		deck = random.sample(header['pool'], rounds)
+		if idx and 'C' in deck and 'C' in game.decks[0]:
+			deck.remove('C')
+			deck.append('R')
+		game.setup(idx, {'ready': True, 'deck': deck})
+
+	play(game, models, rounds, random.choice)
+
+
+def test_opponent_model_knows_gen0_decks():
+	game = GameGen0(['p1', 'p2'], 5)
+	models = [OpponentModel(game.game_header()), OpponentModel(game.game_header())]
+
+	play(game, models, 5, min)
+
+	assert models[0].pool.counts == Counter({'R': 5, 'S': 5, 'P': 0})
+	assert models[0].history.predict() == Counter({'P': 4})
+	assert models[0].deck.probabilities() == {'P': 0.0, 'R': 0.5, 'S': 0.5}
+
+
+class DeltaPlayer(Player):
+	PROTOCOL = 2
+
+
+def deliver(player, obj):
+	player.player_in_queue.put(obj)
+	return player.receive()
+
+
+@pytest.mark.parametrize('game_class', [GameGen0, GameGen3])
+@pytest.mark.parametrize('seed', range(10))
+def test_protocol_2_expands_to_protocol_1(game_class, seed):
+	rng = random.Random(seed)
+	rounds = 9
+	games = [game_class(['p1', 'p2'], rounds), game_class(['p1', 'p2'], rounds)]
+	players = [DeltaPlayer(queue.Queue(), queue.Queue()), DeltaPlayer(queue.Queue(), queue.Queue())]
+
+	for idx, player in enumerate(players):
+		header = deliver(player, games[1].game_header())
+		setup = {'ready': True}
+		if 'pool' in header:
+			setup['deck'] = rng.sample(header['pool'], rounds)
+		games[0].setup(idx, setup)
+		player.send(setup)
+		games[1].setup(idx, player.player_out_queue.get())
+
+	assert games[1].protocols == [2, 2]
+
+	for i in range(rounds):
+		headers = games[0].round_headers()
+		for player, header, delta in zip(players, headers, games[1].round_headers()):
+			assert 'deck' not in delta
+			assert deliver(player, delta)['deck'] == header['deck']
+
+		hands = [rng.choice(header['deck']) for header in headers]
+		for player, hand in zip(players, hands):
+			player.send({'hand': hand})
+			player.player_out_queue.get()
+
+		try:
+			random.seed(i)
+			footers = games[0].apply(hands)
+		except EverybodyDiesException:
+			return
+		random.seed(i)
+		deltas = games[1].apply(hands)
+
+		for player, footer, delta in zip(players, footers, deltas):
+			expanded = deliver(player, delta)
+			assert {key: expanded[key] for key in footer} == footer
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_sim_step_follows_game_rules(seed):
+	random.seed(seed)
+	rounds = 9
+	game = GameGen3(['p1', 'p2'], rounds)
+	game.decks = [random.sample(game.pool, rounds), random.sample(game.pool, rounds)]
+	state = sim.State.new(game.decks, rounds)
+
+	while not state.over:
+		hands = [random.choice(game.decks[0]), random.choice(game.decks[1])]
+		state, took = sim.step(state, hands)
+
+		try:
+			footers = game.apply(hands)
+		except EverybodyDiesException:
+			assert state.dead
+			assert list(state.scores) == game.final_scores()
+			return
+
+		assert list(state.scores) == game.scores
+		assert [card is None for card in took] == ['took' not in footer for footer in footers]
+		assert [sum(deck) for deck in state.decks] == [len(deck) for deck in game.decks]
+
+		# Take steals at random, so carry on from the real game's decks.
+		state = state._replace(decks=tuple(sim.counts(deck) for deck in game.decks))
+
+
+def test_rollout_finishes_the_game():
+	state = sim.State.new([list('RRPPSSTLC'), list('RRPPSSTLT')], 9)
+	for _ in range(200):
+		final = sim.rollout(state)
+		assert final.over
+		assert final.dead or final.round == 10
+		assert all(count >= 0 for deck in final.decks for count in deck)
+
+
+@pytest.mark.parametrize('size', [2, 5, 8])
+def test_montebot_samples_a_deck_for_every_remaining_round(size):
+	player = montebot.Player(queue.Queue(), queue.Queue())
+	player.model = OpponentModel({'players': ['a', 'b'], 'rounds': 5, 'pool': list('RRPSSCLT')})
+	player.model.deck = DeckEstimate(list('RRPSSCLT'), size)
+
+	for _ in range(50):
+		theirs = player.opponent_deck_sampler(5)()
+		assert len(theirs) == 5
+		assert sim.rollout(sim.State.new([list('RPSRP'), theirs], 5)).over
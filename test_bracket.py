@@ -0,0 +1,73 @@
+import random
+
+from collections import Counter
+
+import pytest
+
+import engine
+from bracket import bracket_distribution, forecast, outcome_matrix
+
+
+MATRIX = outcome_matrix([
+	('a', 'b', 8, 1, 1, 0),
+	('a', 'c', 2, 6, 0, 2),
+	('b', 'c', 3, 3, 4, 0),
+], prior=(0, 0, 0, 0))
+
+
+class MatrixEngine(engine.Engine):
+	def __init__(self, players):
+		super().__init__('forecast', 0, 1)
+		self.field = players
+
+	def get_players(self):
+		return list(self.field)
+
+	def prepare_match(self, player_names):
+		return None
+
+	def run_match(self, player_names, setup=None):
+		win, loss, draw, _chicken = MATRIX[tuple(player_names)]
+		x = random.random()
+		if x < win:
+			return 1
+		if x < win + loss:
+			return 2
+		if x < win + loss + draw:
+			return 0
+		return -1
+
+
+def test_outcome_matrix_pools_orderings():
+	matrix = outcome_matrix([('a', 'b', 3, 1, 0, 0), ('b', 'a', 1, 1, 2, 0)], prior=(0, 0, 0, 0))
+	assert matrix[('a', 'b')] == (4 / 8, 2 / 8, 2 / 8, 0)
+	assert matrix[('b', 'a')] == (2 / 8, 4 / 8, 2 / 8, 0)
+
+
+def test_bracket_distribution_sums_to_one():
+	result = bracket_distribution(['a', 'b', 'c', None], MATRIX)
+	for player in 'abc':
+		assert sum(result[player].values()) == pytest.approx(1)
+
+
+def test_forecast_matches_simulated_tournaments(monkeypatch):
+	eliminations = Counter()
+
+	def save_tournament_result(tournament_id, rankings, lease=None):
+		for t_round, player_list in enumerate(rankings):
+			for player in player_list:
+				eliminations[player, t_round - len(rankings) + 1] += 1
+
+	monkeypatch.setattr(engine, 'save_tournament_result', save_tournament_result)
+	monkeypatch.setattr(engine, 'load_checkpoint', lambda tournament_id: None)
+	monkeypatch.setattr(engine, 'save_checkpoint', lambda *args, **kwargs: None)
+	monkeypatch.setattr(engine, 'save_pairing', lambda *args, **kwargs: None)
+
+	random.seed(1)
+	runs = 4000
+	for _ in range(runs):
+		MatrixEngine(['a', 'b', 'c']).run()
+
+	predicted = forecast(['a', 'b', 'c'], MATRIX, samples=200)
+	for (player, elimination_round), count in eliminations.items():
+		assert predicted[player][elimination_round] == pytest.approx(count / runs, abs=0.03)
@@ -0,0 +1,43 @@
+import gzip
+import os
+import time
+
+import compress
+
+
+def test_compresses_new_and_changed_files_only(tmp_path):
+	(tmp_path / 'logs').mkdir()
+	style = tmp_path / 'style.css'
+	style.write_text('body {}\n' * 100)
+	log = tmp_path / 'logs' / '1600000000.txt'
+	log.write_text('round 1\n' * 100)
+	running = tmp_path / 'logs' / '1600000100.txt'
+	running.write_text('round 1\n')
+	(tmp_path / 'index.html').write_text('<html>' * 100)
+	(tmp_path / 'index.html.gz').write_bytes(b'proxied')
+	(tmp_path / 'logo.png').write_bytes(b'png')
+	(tmp_path / 'gone.css.gz').write_bytes(b'stale')
+
+	suffixes = len(list(compress.encoders()))
+
+	assert compress.compress_site(str(tmp_path), {'1600000100'}) == (2 * suffixes, 2)
+	assert gzip.decompress((tmp_path / 'style.css.gz').read_bytes()) == style.read_bytes()
+	assert not (tmp_path / 'logs' / '1600000100.txt.gz').exists()
+	assert not (tmp_path / 'index.html.gz').exists()
+	assert not (tmp_path / 'logo.png.gz').exists()
+	assert not (tmp_path / 'gone.css.gz').exists()
+
+	# Compressed as soon as its tournament is done, however recently it was written.
+	assert compress.compress_site(str(tmp_path), set()) == (suffixes, 0)
+	assert gzip.decompress((tmp_path / 'logs' / '1600000100.txt.gz').read_bytes()) == b'round 1\n'
+	assert compress.compress_site(str(tmp_path), set()) == (0, 0)
+
+	style.write_text('body {}')
+	later = time.time() + 1
+	os.utime(style, (later, later))
+	assert compress.compress_site(str(tmp_path), set()) == (suffixes, 0)
+	assert gzip.decompress((tmp_path / 'style.css.gz').read_bytes()) == b'body {}'
+
+	log.write_text('round 1\nround 2\n')
+	assert compress.compress_site(str(tmp_path), {'1600000000'}) == (0, suffixes)
+	assert not (tmp_path / 'logs' / '1600000000.txt.gz').exists()
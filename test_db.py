@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+PAIRINGS = [
+	('t1', 3, 'a', 2, 'b', 1, 'win'),
+	('t1', 3, 'b', 1, 'a', 1, 'draw'),
+	('t1', 3, 'a', -1, 'b', 1, 'foul'),
+	('t1', 3, 'a', -1, 'b', -1, 'chicken'),
+	('t1', 3, 'a', 0.5, 'c', 3, 'win'),
+	('t2', 2, 'a', 3, 'b', 0, 'win'),
+]
+
+
+def test_head_to_head_is_maintained_incrementally(hack_db):
+	for pairing in PAIRINGS:
+		db.save_pairing_result(*pairing)
+
+	assert sorted(db.head_to_head(3)) == [
+		('a', 'b', 4, 1, 1, 1, 1, 1, 1.0, 2.0),
+		('a', 'c', 1, 0, 1, 0, 0, 0, 0.5, 3.0),
+		('b', 'a', 4, 1, 1, 1, 0, 1, 2.0, 1.0),
+		('c', 'a', 1, 1, 0, 0, 0, 0, 3.0, 0.5),
+	]
+
+	conn = sqlite3.connect(hack_db)
+	incremental = sorted(conn.execute('select * from head_to_head'))
+	conn.execute('delete from head_to_head')
+	conn.execute(db.HEAD_TO_HEAD_REBUILD)
+	assert sorted(conn.execute('select * from head_to_head')) == incremental
+	conn.close()
+
+
+
+def test_head_to_head_is_backfilled_once(hack_db):
+	for pairing in PAIRINGS:
+		db.save_pairing_result(*pairing)
+	conn = sqlite3.connect(hack_db)
+	expected = sorted(conn.execute('select * from head_to_head'))
+	conn.execute('drop table head_to_head')
+	conn.close()
+
+	threads = [threading.Thread(target=db.setupdb) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	conn = sqlite3.connect(hack_db)
+	assert sorted(conn.execute('select * from head_to_head')) == expected
+	conn.close()
+
+
+def test_jobs_are_claimed_once(hack_db):
+	first = db.enqueue_job('pairing', {'players': ['a', 'b']})
+	second = db.enqueue_job('tournament', {'tournament_id': 't1'})
+
+	assert db.claim_job('w1', 60) == (first, 'pairing', {'players': ['a', 'b']})
+	assert db.claim_job('w2', 60) == (second, 'tournament', {'tournament_id': 't1'})
+	assert db.claim_job('w3', 60) is None
+
+	assert not db.complete_job(first, 'w2')
+	assert db.complete_job(first, 'w1')
+	assert not db.renew_lease(first, 'w1', 60)
+
+
+def test_expired_leases_are_reclaimed(hack_db, monkeypatch):
+	job_id = db.enqueue_job('pairing', {})
+	assert db.claim_job('w1', -1) is not None
+
+	# w1 crashed; the job goes to w2 and w1 can no longer report it
+	assert db.claim_job('w2', 60) == (job_id, 'pairing', {})
+	assert not db.complete_job(job_id, 'w1')
+	assert db.complete_job(job_id, 'w2')
+
+
+
+def test_results_are_only_saved_under_a_held_lease(hack_db):
+	job_id = db.enqueue_job('pairing', {})
+	db.claim_job('w1', -1)
+	db.save_pairing_result('t1', 0, 'a', 1, 'b', 0, 'win', lease=(job_id, 'w1'))
+
+	# w1's lease expired and w2 reclaimed the job; w1 finishing late must not count twice
+	db.claim_job('w2', 60)
+	with pytest.raises(db.LeaseLost):
+		db.save_pairing_result('t1', 0, 'a', 1, 'b', 0, 'win', lease=(job_id, 'w1'))
+	db.save_pairing_result('t1', 0, 'a', 1, 'b', 0, 'win', lease=(job_id, 'w2'))
+
+	conn = sqlite3.connect(hack_db)
+	assert conn.execute('select count(*) from pairing_results').fetchone() == (2, )
+	assert conn.execute('select games from head_to_head where player = ?', ('a', )).fetchone() == (2, )
+	conn.close()
+
+def test_failing_jobs_give_up(hack_db):
+	job_id = db.enqueue_job('pairing', {})
+	for attempt in range(db.MAX_JOB_ATTEMPTS):
+		assert db.claim_job('w1', 60)[0] == job_id
+		assert db.fail_job(job_id, 'w1', 'boom')
+
+	assert db.claim_job('w1', 60) is None
+
+	conn = sqlite3.connect(hack_db)
+	assert conn.execute('select status, error from jobs').fetchall() == [('failed', 'boom')]
+	conn.close()
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import deckopt
+from bots import sim
+from bots.base import choose_deck
+
+
+@pytest.mark.parametrize('a, b', [
+	('RRPPS', 'RPSSS'),
+	('RRPSC', 'RPSSC'),
+	('RPSLC', 'CCCCC'),
+	('RRRLL', 'PPSCC'),
+])
+def test_search_agrees_with_matching(a, b):
+	a, b = sim.counts(a), sim.counts(b)
+	assert deckopt.search_value(a, b, 5) == pytest.approx(deckopt.matching_value(a, b))
+
+
+def test_search_agrees_with_rollouts():
+	random.seed(1)
+	a, b = sim.counts('RRPPSSTL'), sim.counts('RPPSSCTT')
+	margin, death = deckopt.search_value(a, b, 8)
+
+	runs = 20000
+	total = deaths = 0
+	for _ in range(runs):
+		state = sim.rollout(sim.State(((a, b)), (0, 0), 1, 8, False))
+		deaths += state.dead
+		total += state.scores[0] - state.scores[1] if not state.dead else 0
+
+	assert death == pytest.approx(deaths / runs, abs=0.02)
+	assert margin == pytest.approx(total / runs, abs=0.05)
+
+
+def test_candidate_decks_are_legal():
+	decks = deckopt.candidate_decks(3, 7)
+	assert sim.counts('CCCCCCC') in decks
+	for deck in decks:
+		assert sum(deck) == 7
+		assert deck == sim.counts('CCCCCCC') or all(count <= 4 for count in deck[:3])
+
+
+def test_choose_deck_uses_table():
+	deck = choose_deck({'gen': 3, 'rounds': 13})
+	assert len(deck) == 13
+	assert choose_deck({'gen': 3, 'rounds': 1000}) is None
@@ -0,0 +1,376 @@
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import tracemalloc
+import types
+
+import pytest
+
+import db
+from bots import base
+from engine import WALL_TIMEOUT, Engine, PlayerThread
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+def pairing_rows(db_file):
+	conn = sqlite3.connect(db_file)
+	rows = conn.execute('select p1, p1_score, p2, p2_score, outcome from pairing_results order by id').fetchall()
+	conn.close()
+	return rows
+
+
+def test_prepare_match_sends_header(hack_db):
+	engine = Engine('t1', 0, 3)
+	setup = engine.prepare_match(['alphabot', 'ralphabot'])
+
+	assert setup.fouled is None
+	assert len(setup.players) == 2
+	assert setup.players[0].player_in_queue.full()
+
+	assert engine.run_match(['alphabot', 'ralphabot'], setup) in (0, 1, 2)
+	assert len(pairing_rows(hack_db)) == 1
+
+
+def test_prepared_match_can_wait_for_the_one_before(hack_db):
+	engine = Engine('t1', 0, 3)
+	setup = engine.prepare_match(['alphabot', 'ralphabot'])
+	# The match before it overruns the wall-clock ceiling.
+	time.sleep(WALL_TIMEOUT + 0.1)
+
+	assert engine.run_match(['alphabot', 'ralphabot'], setup) in (0, 1, 2)
+	assert pairing_rows(hack_db)[0][4] != 'foul'
+
+
+def test_unloadable_player_is_settled_without_a_game(hack_db):
+	engine = Engine('t1', 0, 3)
+	setup = engine.prepare_match(['alphabot', 'nosuchbot'])
+
+	assert setup.fouled == 1
+	assert engine.run_match(['alphabot', 'nosuchbot'], setup) == 1
+	assert pairing_rows(hack_db) == [('alphabot', 0, 'nosuchbot', 0, 'load failed')]
+	assert db.head_to_head(0) == []
+
+
+def test_run_pairings_skips_byes(hack_db, monkeypatch):
+	engine = Engine('t1', 0, 3)
+	prepared = []
+	prepare_match = engine.prepare_match
+
+	def spy(player_names):
+		prepared.append(list(player_names))
+		return prepare_match(player_names)
+
+	monkeypatch.setattr(engine, 'prepare_match', spy)
+
+	pairings = [['alphabot', None], ['midbot', 'ralphabot'], [None, 'nosuchbot'], ['nosuchbot', 'scatterbot']]
+	winners = list(engine.run_pairings(pairings))
+
+	assert winners[0] == 'alphabot'
+	assert winners[1] in ('midbot', 'ralphabot')
+	assert winners[2] == 'nosuchbot'
+	assert winners[3] == 'scatterbot'
+	assert prepared == [['midbot', 'ralphabot'], ['nosuchbot', 'scatterbot']]
+
+
+class CrashingEngine(Engine):
+	def __init__(self, tournament_id, crash_after=None):
+		super().__init__(tournament_id, 0, 3)
+		self.crash_after = crash_after
+		self.matches = []
+
+	def get_players(self):
+		return ['a', 'b', 'c', 'd', 'e']
+
+	def prepare_match(self, player_names):
+		return None
+
+	def run_match(self, player_names, setup=None):
+		self.record_pairing_result(player_names, [1, 0], 'win')
+		if len(self.matches) == self.crash_after:
+			# After the game is recorded, before the bracket moves on.
+			raise KeyboardInterrupt()
+		self.matches.append(list(player_names))
+		return 1
+
+
+def test_interrupted_tournament_resumes(hack_db):
+	engine = CrashingEngine('t1', crash_after=2)
+	with pytest.raises(KeyboardInterrupt):
+		engine.run()
+
+	assert db.unfinished_tournaments() == ['t1']
+	_gen, _rounds, state = db.load_checkpoint('t1')
+	# five players: one match in the first round, then the first match of the second
+	assert len(state['player_last_rounds']) == 1
+	assert len(state['next_players']) == 1
+
+	resumed = CrashingEngine('t1')
+	resumed.run()
+
+	# the first two matches are not replayed
+	assert len(engine.matches) == 2
+	assert len(resumed.matches) == 2
+	assert engine.matches[0] not in resumed.matches
+	assert db.unfinished_tournaments() == []
+
+	conn = sqlite3.connect(hack_db)
+	results = conn.execute('select player, elimination_round from tournament_results').fetchall()
+	conn.close()
+	assert sorted(round for _player, round in results) == [-3, -2, -2, -1, 0]
+
+	# The game that was interrupted is only recorded once, when it's played again.
+	assert len(pairing_rows(hack_db)) == 4
+	assert sum(games for _player, _opponent, games, *_counts in db.head_to_head(0)) == 8
+
+
+def test_montebot_searches_within_the_time_limit(hack_db):
+	engine = Engine('t1', 3, 13)
+	engine.run_match(['montebot', 'scatterbot'])
+
+	[(_p1, _p1_score, _p2, _p2_score, outcome)] = pairing_rows(hack_db)
+	assert outcome != 'foul'
+
+
+def test_harness_does_not_write_unless_asked(hack_db):
+	import harness
+
+	result = harness.run_one('bots/alphabot', 'ralphabot', 1, 0, 0, 3, False, 'harness')
+	assert result['opponent'] == 'ralphabot'
+	assert result['result'] in ('win', 'loss', 'draw')
+	assert len(result['latencies']) == 3
+	assert pairing_rows(hack_db) == []
+
+	harness.run_one('bots/alphabot', 'nosuchbot', 0, 0, 0, 3, True, 'harness')
+	assert pairing_rows(hack_db) == [('alphabot', 0, 'nosuchbot', 0, 'load failed')]
+
+
+def test_zygote_players_run_in_child_processes(hack_db):
+	from engine import TIMEOUT
+	from zygote import Zygote, PlayerProcess
+
+	zygote = Zygote(TIMEOUT)
+	try:
+		engine = Engine('t1', 0, 3, zygote)
+		setup = engine.prepare_match(['alphabot', 'ralphabot'])
+		assert all(isinstance(player, PlayerProcess) for player in setup.players)
+		assert engine.run_match(['alphabot', 'ralphabot'], setup) in (0, 1, 2)
+
+		assert engine.run_match(['alphabot', 'nosuchbot']) == 1
+	finally:
+		zygote.stop()
+
+	rows = pairing_rows(hack_db)
+	assert rows[0][4] != 'foul'
+	assert rows[1] == ('alphabot', 0, 'nosuchbot', 0, 'load failed')
+
+
+def test_replay_plays_recorded_hands(hack_db, tmp_path):
+	import replay
+
+	recordings = str(tmp_path / 'replays.jsonl')
+	assert replay.record(recordings, 4, [0, 3], [6], ['alphabot', 'scatterbot'], 0) == 4
+
+	timings = replay.replay(replay.load_recordings(recordings))
+	assert len(timings) == 4
+	assert all(rounds <= 6 for _elapsed, rounds in timings)
+
+	rows = pairing_rows(hack_db)
+	assert len(rows) == 4
+	assert all(outcome != 'foul' for *_scores, outcome in rows)
+
+
+class SeriesEngine(Engine):
+	def __init__(self, winners, best_of):
+		super().__init__('t1', 0, 3, best_of=best_of)
+		self.winners = iter(winners)
+		self.seats = []
+
+	def run_match(self, player_names, setup=None):
+		self.seats.append(list(player_names))
+		winner = next(self.winners)
+		return player_names.index(winner) + 1 if winner else 0
+
+
+def series_rows(db_file):
+	conn = sqlite3.connect(db_file)
+	rows = conn.execute('select p1, p2, games, p1_wins, p2_wins, draws, winner from pairing_series order by id').fetchall()
+	conn.close()
+	return rows
+
+
+def test_series_stops_once_decided(hack_db):
+	engine = SeriesEngine(['b'] * 10, best_of=15)
+	assert engine.run_pairing(['a', 'b']) == 'b'
+	assert engine.seats == [['a', 'b'], ['b', 'a'], ['a', 'b'], ['b', 'a']]
+	assert series_rows(hack_db) == [('a', 'b', 4, 0, 4, 0, 'b')]
+
+
+def test_undecided_series_goes_to_the_most_wins(hack_db):
+	engine = SeriesEngine(['a', 'b', None, 'a', 'b', 'a', None], best_of=7)
+	assert engine.run_pairing(['a', 'b']) == 'a'
+	assert series_rows(hack_db) == [('a', 'b', 7, 3, 2, 2, 'a')]
+
+
+class SlowPlayer(base.Player):
+	BUSY = False
+
+	def run(self):
+		header = self.receive()
+		self.send({'ready': True})
+		for _ in range(header['rounds']):
+			round_header = self.receive()
+			start = time.perf_counter()
+			while time.perf_counter() - start < 0.15:
+				if not self.BUSY:
+					time.sleep(0.15)
+			self.send({'hand': round_header['deck'][0]})
+			self.receive()
+
+
+class BusyPlayer(SlowPlayer):
+	BUSY = True
+
+
+class ModuleEngine(Engine):
+	def __init__(self, modules):
+		super().__init__('t1', 0, 2)
+		self.modules = modules
+
+	def make_player(self, player_num, player_name):
+		return PlayerThread(player_num, self.modules[player_name], self.memory_cap)
+
+
+def test_timeouts_charge_cpu_time_only(hack_db):
+	engine = ModuleEngine({
+		'sleepy': types.SimpleNamespace(Player=SlowPlayer),
+		'busy': types.SimpleNamespace(Player=BusyPlayer),
+	})
+
+	engine.run_match(['sleepy', 'sleepy'])
+	engine.run_match(['sleepy', 'busy'])
+
+	assert [outcome for *_scores, outcome in pairing_rows(hack_db)] == ['draw', 'foul']
+
+
+def test_players_are_pinned_to_the_engine_cores_as_the_match_starts(hack_db, monkeypatch):
+	core = min(os.sched_getaffinity(0))
+	engine = Engine('t1', 0, 3, cores=(core, ))
+	setup = engine.prepare_match(['alphabot', 'ralphabot'])
+
+	# Prepared while another match may still be on the cores, so not pinned yet.
+	assert all(os.sched_getaffinity(player.native_id) == os.sched_getaffinity(0) for player in setup.players)
+
+	pinned = []
+	pin = PlayerThread.pin
+
+	def spy(player, cores):
+		pin(player, cores)
+		pinned.append(os.sched_getaffinity(player.native_id))
+
+	monkeypatch.setattr(PlayerThread, 'pin', spy)
+	assert engine.run_match(['alphabot', 'ralphabot'], setup) in (0, 1, 2)
+	assert pinned == [{core}, {core}]
+
+
+def test_failing_to_pin_is_not_a_foul(hack_db, monkeypatch):
+	def pin(player, cores):
+		raise OSError('no such core')
+
+	monkeypatch.setattr(PlayerThread, 'pin', pin)
+	engine = Engine('t1', 0, 3, cores=(10 ** 6, ))
+	assert engine.run_match(['alphabot', 'ralphabot']) in (0, 1, 2)
+	assert all(outcome != 'foul' for *_scores, outcome in pairing_rows(hack_db))
+
+
+class PoolPlayer(base.Player):
+	def run(self):
+		header = self.receive()
+		# Only gen 2 and up have a pool.
+		self.send({'ready': True, 'deck': header['pool']})
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_player_that_dies_before_replying_is_a_foul(hack_db):
+	engine = ModuleEngine({
+		'pool': types.SimpleNamespace(Player=PoolPlayer),
+		'alphabot': importlib.import_module('bots.alphabot'),
+	})
+	setup = engine.prepare_match(['pool', 'alphabot'])
+	threading.Thread.join(setup.players[0])
+	while setup.players[0].cpu_time() is not None:
+		# Its CPU clock goes a little after the thread does.
+		time.sleep(0.01)
+
+	assert engine.run_match(['pool', 'alphabot'], setup) == 2
+	conn = sqlite3.connect(hack_db)
+	assert conn.execute('select outcome, foul_reason from pairing_results').fetchall() == [('foul', 'timed out on read')]
+	conn.close()
+
+
+class HogPlayer(base.Player):
+	def run(self):
+		header = self.receive()
+		self.send({'ready': True})
+		hoard = []
+		for _ in range(header['rounds']):
+			round_header = self.receive()
+			# Allocated in the json module, not the bot's own code, and still the bot's.
+			hoard.append(json.loads('"%s"' % ('x' * 2 ** 20, )))
+			self.send({'hand': round_header['deck'][0]})
+			self.receive()
+
+
+def test_memory_cap_is_a_foul(hack_db):
+	hog = types.ModuleType('hog')
+	hog.Player = HogPlayer
+
+	engine = ModuleEngine({'hog': hog, 'alphabot': importlib.import_module('bots.alphabot')})
+	engine.memory_cap = 2 ** 21
+
+	tracemalloc.start()
+	try:
+		engine.run_match(['alphabot', 'hog'])
+	finally:
+		tracemalloc.stop()
+
+	conn = sqlite3.connect(hack_db)
+	[(p1_peak_mem, p2_peak_mem, outcome, reason)] = conn.execute(
+		'select p1_peak_mem, p2_peak_mem, outcome, foul_reason from pairing_results'
+	).fetchall()
+	conn.close()
+
+	assert (outcome, reason) == ('foul', 'exceeded memory cap')
+	assert p1_peak_mem < 2 ** 20 < p2_peak_mem
+
+
+def test_synthetic_field_plays_a_tournament(hack_db):
+	engine = Engine('t-synthetic', 0, 3, factories={'synthetic': 5})
+	engine.get_players = engine.factory_players
+	engine.run()
+
+	conn = sqlite3.connect(hack_db)
+	players = sorted(x for (x, ) in conn.execute('select player from tournament_results where tournament_id = ?', ('t-synthetic', )))
+	conn.close()
+	assert players == ['synthetic:%d' % (n, ) for n in range(5)]
+
+
+def test_synthetic_players_pick_a_deck_from_the_pool(hack_db):
+	engine = Engine('t1', 3, 7)
+	for n in range(0, 10, 2):
+		engine.run_match(['synthetic:%d' % (n, ), 'synthetic:%d' % (n + 1, )])
+
+	assert all(outcome != 'foul' for *_scores, outcome in pairing_rows(hack_db))
+
+
+def test_synthetic_variants_are_reproducible():
+	assert Engine.load_module('synthetic:7').params == Engine.load_module('synthetic:7').params
+	assert Engine.load_module('synthetic:7').params != Engine.load_module('synthetic:8').params
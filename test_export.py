@@ -0,0 +1,46 @@
+import pytest
+
+import db
+import export
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+def test_export_appends_new_rows(hack_db, tmp_path):
+	path = str(tmp_path / 'export')
+	db.save_pairing_result('t1', 0, 'a', 1, 'b', 0, 'win', (100, None), None)
+	db.save_pairing_result('t1', 0, 'b', 1, 'c', -1, 'foul', (None, None), 'timed out on read')
+	db.save_pairing_result('t1', 0, 'a', 0, 'c', 0, 'draw')
+	db.save_tournament_result('t1', [['b', 'c'], ['a']])
+
+	assert export.export(path, chunk_rows=2) == {'pairing_results': 3, 'tournament_results': 3}
+
+	db.save_pairing_result('t2', 3, 'd', 2.5, 'a', -0.5, 'win')
+	assert export.export(path) == {'pairing_results': 1, 'tournament_results': 0}
+	assert export.export(path) == {'pairing_results': 0, 'tournament_results': 0}
+
+	history = export.Export.load(path)
+	assert [chunk['rows'] for chunk in history.manifest['tables']['pairing_results']['chunks']] == [2, 1, 1]
+
+	results = history['pairing_results']
+	assert len(results['id']) == 4
+	assert list(results['id']) == [1, 2, 3, 4]
+	assert [history.decode('players', x) for x in results['p1']] == ['a', 'b', 'a', 'd']
+	assert [history.decode('outcomes', x) for x in results['outcome']] == ['win', 'foul', 'draw', 'win']
+	assert [history.decode('foul_reasons', x) for x in results['foul_reason']] == [None, 'timed out on read', None, None]
+	assert list(results['p1_peak_mem']) == [100, -1, -1, -1]
+	assert results['gen'][-1] == 3
+	assert results['p2_score'][1:3] == [-1, 0]
+	assert (results['p1_score'][-1], results['p2_score'][-1]) == (2.5, -0.5)
+
+	a = history.code('players', 'a')
+	assert sum(1 for p1, p2 in zip(results['p1'], results['p2']) if a in (p1, p2)) == 3
+	assert history.code('players', 'nobody') is None
+
+	tournaments = history['tournament_results']
+	assert [history.decode('players', x) for x in tournaments['player']] == ['b', 'c', 'a']
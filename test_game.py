@@ -226,3 +226,24 @@ def test_gen3_game_t():
 	p2_deck = ['P', 'S']
 	p2_deck.remove(p1_response['took'])
 	assert game.decks[1] == p2_deck
+
+
+def test_gen3_game_t_protocol_2():
+	game = GameGen3(['p1', 'p2'], 2)
+	game.setup(0, {'ready': True, 'deck': ['R', 'T'], 'protocol': 2})
+	game.setup(1, {'ready': True, 'deck': ['P', 'S']})
+
+	p1_header, p2_header = game.round_headers()
+	assert p1_header == {'idx': 0, 'round': 1, 'scores': [-0.0, 0]}
+	assert p2_header['deck'] == ['P', 'S']
+
+	p1_response, p2_response = game.apply(['T', 'S'])
+	assert p1_response['played'] == 'S'
+	assert p1_response['payoffs'] == [0, 1]
+	assert p1_response['took'] in ('P', 'S')
+	assert 'lost' not in p1_response
+
+	assert p2_response['hands'] == ['T', 'S']
+
+	with pytest.raises(P1FoulException):
+		GameGen3(['p1', 'p2'], 2).setup(0, {'ready': True, 'deck': ['R', 'T'], 'protocol': 3})
@@ -0,0 +1,115 @@
+import random
+import sqlite3
+
+from collections import Counter
+
+import pytest
+
+import archive
+import db
+import scheduler
+from engine import Engine, MatchSetup
+from scheduler import Scheduler, information_gain
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+# Chance that the first bot beats the second.
+STRENGTHS = {
+	('a', 'b'): 0.95,
+	('a', 'c'): 0.95,
+	('b', 'c'): 0.5,
+}
+
+
+class FieldEngine(Engine):
+	def __init__(self):
+		super().__init__('schedule', 0, 1)
+		self.pairs = Counter()
+
+	def get_players(self):
+		return ['a', 'b', 'c']
+
+	def prepare_match(self, player_names):
+		return MatchSetup(player_names)
+
+	def run_match(self, player_names, setup=None):
+		key = tuple(sorted(player_names))
+		self.pairs[key] += 1
+		first_wins = random.random() < STRENGTHS[key]
+		winner = 1 if first_wins == (key[0] == player_names[0]) else 2
+		self.record_pairing_result(player_names, [1, 0] if winner == 1 else [0, 1], 'win')
+		return winner
+
+
+def test_information_gain_favours_few_and_close_games():
+	assert information_gain(0, 0) > information_gain(5, 5) > information_gain(50, 50)
+	assert information_gain(5, 5) > information_gain(9, 1)
+
+
+def test_scheduler_spends_matches_on_close_pairs(hack_db):
+	random.seed(0)
+	engine = FieldEngine()
+	schedule = Scheduler(engine)
+	schedule.run(matches=200)
+
+	assert engine.pairs[('b', 'c')] > engine.pairs[('a', 'b')] + engine.pairs[('a', 'c')]
+	assert schedule.ranking()[0][0] == 'a'
+
+
+def test_changed_bot_results_go_stale(hack_db, monkeypatch):
+	random.seed(0)
+	engine = FieldEngine()
+	Scheduler(engine).run(matches=30)
+
+	schedule = Scheduler(engine)
+	schedule.load()
+	schedule.refresh()
+	before = {key: list(stats) for key, stats in schedule.stats.items()}
+
+	source_hash = scheduler.bot_source_hash
+	monkeypatch.setattr(scheduler, 'bot_source_hash', lambda player: 'new' if player == 'c' else source_hash(player))
+	schedule.refresh()
+
+	assert schedule.stats[('a', 'b')] == before[('a', 'b')]
+	assert schedule.stats[('b', 'c')] == [x * scheduler.STALE_WEIGHT for x in before[('b', 'c')]]
+	assert db.bot_versions()['c'][0] == 'new'
+
+
+def test_scheduler_keeps_archived_results(hack_db):
+	random.seed(0)
+	engine = FieldEngine()
+	Scheduler(engine).run(matches=30)
+
+	before = Scheduler(engine)
+	before.load()
+
+	conn = sqlite3.connect(hack_db)
+	conn.execute("update pairing_results set cr_date = datetime('now', '-60 days')")
+	conn.commit()
+	conn.close()
+	assert archive.archive(vacuum=False)['pairing_results'] == 29
+
+	after = Scheduler(engine)
+	after.load()
+	assert dict(after.stats) == dict(before.stats)
+
+
+def test_load_failures_are_not_counted(hack_db):
+	class BrokenEngine(Engine):
+		def get_players(self):
+			return ['alphabot', 'nosuchbot']
+
+	schedule = Scheduler(BrokenEngine('schedule', 0, 3))
+	schedule.refresh()
+	schedule.play(('alphabot', 'nosuchbot'))
+	assert schedule.stats[('alphabot', 'nosuchbot')] == [0.0, 0.0]
+
+	reloaded = Scheduler(schedule.engine)
+	reloaded.load()
+	assert dict(reloaded.stats) == {}
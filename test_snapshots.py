@@ -0,0 +1,130 @@
+import io
+import os
+import shutil
+import sqlite3
+import zipfile
+
+import pytest
+
+import db
+import league
+import scheduler
+import snapshots
+from engine import Engine
+
+
+class Unseekable(io.RawIOBase):
+	def __init__(self):
+		self.data = bytearray()
+
+	def writable(self):
+		return True
+
+	def write(self, b):
+		self.data += b
+		return len(b)
+
+
+def objects(store):
+	return sum(len(files) for _root, _dirs, files in os.walk(os.path.join(store, 'objects')))
+
+
+def test_snapshots_store_each_file_once(tmp_path):
+	bots = tmp_path / 'bots'
+	store = str(tmp_path / 'snapshots')
+	(bots / 'abot' / '__pycache__').mkdir(parents=True)
+	(bots / 'abot' / '__init__.py').write_text('A = 1\n')
+	(bots / 'abot' / '__pycache__' / 'x.pyc').write_bytes(b'junk')
+	(bots / 'bbot').mkdir()
+	(bots / 'bbot' / '__init__.py').write_text('A = 1\n')
+	(bots / 'bbot' / 'data.json').write_text('{}')
+
+	_manifest, added = snapshots.take('dump1', str(bots), store)
+	assert added == 2
+	assert objects(store) == 2
+
+	(bots / 'bbot' / 'data.json').write_text('{"x": 1}')
+	manifest, added = snapshots.take('dump2', str(bots), store)
+	assert added == 1
+	assert objects(store) == 3
+	assert sorted(manifest['files']) == ['abot/__init__.py', 'bbot/__init__.py', 'bbot/data.json']
+	assert snapshots.names(store) == ['dump1', 'dump2']
+
+	out = Unseekable()
+	snapshots.write_zip('dump1', out, store)
+	with zipfile.ZipFile(io.BytesIO(out.data)) as zf:
+		assert zf.namelist() == ['dump1/abot/__init__.py', 'dump1/bbot/__init__.py', 'dump1/bbot/data.json']
+		assert zf.read('dump1/bbot/data.json') == b'{}'
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+	monkeypatch.setattr(snapshots, 'STORE_DIR', str(tmp_path / 'snapshots'))
+	return snapshots.STORE_DIR
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+def test_past_versions_import_from_their_snapshot(store, hack_db):
+	snapshots.take('import-test', 'bots')
+
+	module = Engine.load_module('alphabot@import-test')
+	assert module.__name__ == 'snapshot_import_test.alphabot'
+	assert module.base.__name__ == 'snapshot_import_test.base'
+	assert '.zip' in module.__file__
+	assert snapshots.bot_source_hash('alphabot@import-test') == scheduler.bot_source_hash('alphabot')
+	assert 'montebot@import-test' in snapshots.expand_versions('import-test')
+
+	engine = league.LeagueEngine('t1', 3, 13, versions=['alphabot@import-test'])
+	assert 'alphabot@import-test' in list(engine.get_players())
+	assert engine.run_match(['alphabot', 'alphabot@import-test']) in (-1, 0, 1, 2)
+	assert 'alphabot@import-test' not in list(Engine('t1', 3, 13).get_players())
+
+
+def test_past_versions_stay_off_the_leaderboards(store, hack_db):
+	import harness
+
+	snapshots.take('harness-test', 'bots')
+	harness.run_one('bots/alphabot', 'ralphabot@harness-test', 0, 0, 0, 3, True, 'harness')
+	harness.run_one('bots/alphabot', 'ralphabot', 0, 0, 0, 3, True, 'harness')
+	assert {(player, opponent) for player, opponent, *_counts in db.head_to_head(0)} == {
+		('alphabot', 'ralphabot'),
+		('ralphabot', 'alphabot'),
+	}
+
+
+def test_league_caches_results_by_version(store, hack_db, tmp_path, monkeypatch):
+	shutil.copytree('bots', tmp_path / 'old', ignore=shutil.ignore_patterns('__pycache__'))
+	with open(tmp_path / 'old' / 'alphabot' / '__init__.py', 'a') as f:
+		f.write('# an older alphabot\n')
+	snapshots.take('league-test', str(tmp_path / 'old'))
+
+	class FieldEngine(league.LeagueEngine):
+		def get_players(self):
+			return ['alphabot', 'copybot', 'alphabot@league-test', 'copybot@league-test']
+
+	first = league.League(FieldEngine('league', 0, 3))
+	first.run(matches=4)
+	# copybot is the same as it was in the snapshot, so it isn't played against itself.
+	assert first.pairs() == [
+		('alphabot', 'alphabot@league-test'),
+		('alphabot', 'copybot@league-test'),
+		('alphabot@league-test', 'copybot'),
+	]
+	assert sum(sum(wins) for _a, _b, _games, *wins in first.table()) == 4
+
+	second = league.League(FieldEngine('league', 0, 3))
+	second.load()
+	second.refresh()
+	assert second.table() == first.table()
+
+	source_hash = league.bot_source_hash
+	monkeypatch.setattr(league, 'bot_source_hash', lambda player: 'new' if player == 'copybot' else source_hash(player))
+	second.refresh()
+	assert ('copybot', 'alphabot@league-test', 0, 0.0, 0.0) in second.table()
+	assert sqlite3.connect(hack_db).execute('select count(*) from pairing_results').fetchone() == (0, )
@@ -0,0 +1,59 @@
+import http.client
+import json
+
+import pytest
+
+import db
+import spectator
+from engine import Engine
+from spectator import Broadcast
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+def test_slow_reader_skips_ahead():
+	broadcast = Broadcast(size=3)
+	for i in range(5):
+		broadcast.publish('round', {'round': i})
+
+	events, missed = broadcast.read(0)
+	assert missed == 2
+	assert [seq for seq, _frame in events] == [3, 4, 5]
+
+	events, missed = broadcast.read(4)
+	assert (missed, [seq for seq, _frame in events]) == (0, [5])
+	assert broadcast.read(5, timeout=0) == ([], 0)
+
+
+def test_match_is_streamed(hack_db):
+	broadcast = Broadcast()
+	server = spectator.serve(broadcast, 0)
+	try:
+		engine = Engine('t1', 0, 3, spectators=broadcast)
+		engine.run_match(['alphabot', 'ralphabot'])
+
+		conn = http.client.HTTPConnection('localhost', server.server_address[1], timeout=5)
+		conn.request('GET', '/events', headers={'Last-Event-ID': '0'})
+		response = conn.getresponse()
+		assert response.getheader('Content-Type') == 'text/event-stream'
+
+		events = []
+		while not events or events[-1][0] != 'end':
+			kind = response.readline().decode()
+			if not kind.startswith('event: '):
+				continue
+			data = response.readline().decode()
+			events.append((kind.split()[1], json.loads(data.split(' ', 1)[1])))
+		conn.close()
+	finally:
+		server.shutdown()
+
+	assert [kind for kind, _data in events] == ['start', 'round', 'round', 'round', 'end']
+	assert events[0][1] == {'match': 't1: alphabot v ralphabot', 'gen': 0, 'rounds': 3}
+	assert events[3][1]['round'] == 3
+	assert events[-1][1]['scores'] == events[3][1]['scores']
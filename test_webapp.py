@@ -0,0 +1,61 @@
+import gzip
+import threading
+import types
+import urllib.request
+
+import pytest
+
+import db
+import webapp
+
+
+@pytest.fixture
+def hack_db(tmp_path, monkeypatch):
+	monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'hack.db'))
+	db.setupdb()
+	return db.DB_FILE
+
+
+def test_pages_render_once_per_change(hack_db, tmp_path):
+	renders = []
+
+	def render(conn):
+		renders.append(conn.execute('select count(*) from pairing_results').fetchone()[0])
+		return 'games: %d' % (renders[-1], )
+
+	server = webapp.make_server(0, 'localhost', views={'/index.html': types.SimpleNamespace(render=render)}, static=str(tmp_path))
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	url = 'http://localhost:%d/' % (server.server_address[1], )
+
+	try:
+		pages = [urllib.request.urlopen(url).read() for _ in range(3)]
+		db.save_pairing_result('t1', 0, 'a', 1, 'b', 0, 'win')
+		pages += [urllib.request.urlopen(url + 'index.html').read() for _ in range(2)]
+		compressed = urllib.request.urlopen(urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})).read()
+		pages.append(gzip.decompress(compressed))
+	finally:
+		server.shutdown()
+
+	assert renders == [0, 1]
+	assert pages == [b'games: 0'] * 3 + [b'games: 1'] * 3
+
+
+def test_clock_dependent_pages_expire(hack_db, monkeypatch):
+	renders = []
+
+	def render(conn):
+		renders.append(None)
+		return 'render %d' % (len(renders), )
+
+	now = [1000.0]
+	monkeypatch.setattr(webapp.time, 'monotonic', lambda: now[0])
+	cache = webapp.PageCache(
+		{'/leaderboard.html': types.SimpleNamespace(render=render, MAX_AGE=30)},
+		webapp.ConnectionPool(hack_db),
+	)
+
+	assert cache.get('/leaderboard.html')[0] == b'render 1'
+	now[0] += 29
+	assert cache.get('/leaderboard.html')[0] == b'render 1'
+	now[0] += 1
+	assert cache.get('/leaderboard.html')[0] == b'render 2'
@@ -0,0 +1,100 @@
+import datetime as dt
+import sqlite3
+
+from jinja2 import Template
+
+HEAD_TO_HEAD_QUERY = '''
+	select player, opponent, games, wins, losses, draws, fouls, chickens, score_for, score_against
+	from head_to_head
+	where gen = ?
+'''
+
+TEMPLATE = '''<html>
+	<head>
+		<style>
+			table, th, td {
+				border: 1px solid black;
+			}
+			td {
+				text-align: center;
+			}
+		</style>
+	</head>
+
+	<body>
+		<h2>Head to head, generation {{ gen }}</h2>
+
+		<p>Each cell is wins-draws-losses for the row bot against the column bot, with fouls (f) and chickens (c).</p>
+
+		<table>
+			<thead>
+				<tr>
+					<th></th>
+					{% for opponent in players %}
+						<th>{{ opponent }}</th>
+					{% endfor %}
+				</tr>
+			</thead>
+
+			<tbody>
+				{% for player in players %}
+					<tr>
+						<th>{{ player }}</th>
+						{% for opponent in players %}
+							{% set cell = matrix.get((player, opponent)) %}
+							{% if cell %}
+								<td title="{{ cell.games }} games, score {{ cell.score_for }} - {{ cell.score_against }}">
+									{{ cell.wins }}-{{ cell.draws }}-{{ cell.losses }}
+									{% if cell.fouls %}{{ cell.fouls }}f{% endif %}
+									{% if cell.chickens %}{{ cell.chickens }}c{% endif %}
+								</td>
+							{% else %}
+								<td></td>
+							{% endif %}
+						{% endfor %}
+					</tr>
+				{% endfor %}
+			</tbody>
+		</table>
+
+		<p>generated {{ now }}</p>
+	</body>
+</html>
+'''
+
+
+def render(conn):
+	cur = conn.cursor()
+	cur.execute('select generation from engine order by cr_date desc limit 1')
+	row = cur.fetchone()
+	gen = row[0] if row else 0
+
+	cur.execute(HEAD_TO_HEAD_QUERY, (gen, ))
+	matrix = {}
+	for player, opponent, games, wins, losses, draws, fouls, chickens, score_for, score_against in cur:
+		matrix[player, opponent] = {
+			'games': games,
+			'wins': wins,
+			'losses': losses,
+			'draws': draws,
+			'fouls': fouls,
+			'chickens': chickens,
+			'score_for': score_for,
+			'score_against': score_against,
+		}
+
+	players = sorted({player for player, _opponent in matrix})
+
+	template = Template(TEMPLATE)
+
+	return template.render(gen=gen, players=players, matrix=matrix, now=str(dt.datetime.now()))
+
+
+def main():
+	conn = sqlite3.connect('hack.db')
+	print(render(conn))
+	conn.close()
+
+
+if __name__ == '__main__':
+	main()
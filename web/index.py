@@ -47,6 +47,29 @@ The protocol consists of:
 - `round_footer`, `{'idx': 1, 'hands': ['P', 'S'], 'scores': [0, 1]}`
 - `idx` is your index in `players`, `hands`, and `scores`
 
+#### Protocol 2
+
+Everything above is protocol 1, which every bot gets unless it asks otherwise. Protocol 2 only sends what changed each
+round, which matters for long games. To use it, add `"protocol": 2` to the dictionary you send with `"ready": True`.
+`base.py` does this for you when your `Player` sets `PROTOCOL = 2`. It fills each message back in, so your `run` sees
+the protocol 1 shapes either way.
+
+- The `game_header` is the same. Where the generation fixes your deck (generations 0 and 1), it also contains that
+  `deck`.
+- A `round_header` no longer contains `deck`: you keep track of your own. In round 1 only, it contains the `scores`,
+  which can start below zero once special cards cost points.
+- A round footer contains your opponent's card as `played` and this round's `payoffs` instead of `hands` and `scores`.
+  Add the `payoffs` to the scores yourself.
+- When a Take changes your deck, the footer also says how. `took` is the card you stole. `returned` is the card you
+  played, handed back to you because your opponent took. `lost` is the card stolen from you. `look` is unchanged.
+
+##### Examples
+
+- setup, `{'ready': True, 'protocol': 2}`
+- `round_header`, `{'idx': 0, 'round': 1, 'scores': [0, 0]}`, then `{'idx': 0, 'round': 2}`
+- `round_footer`, `{'idx': 1, 'played': 'P', 'payoffs': [0, 1]}`
+- `round_footer` after your Rock was met by a Take, `{'idx': 0, 'played': 'T', 'payoffs': [1, 0], 'returned': 'R', 'lost': 'S'}`
+
 #### Deck
 
 Each players deck is 3x the size of `rounds` and contains equal amounts of:
@@ -151,6 +174,7 @@ You don't run the code, the system does. You can get data in a few ways:
 ## Leaderboard
 
 - [leaderboard](/leaderboard.html)
+- [head to head](/head_to_head.html)
 
 ## Source code dumps
 
@@ -177,16 +201,12 @@ TEMPLATE = '''<html>
 '''
 
 
-def latest_engine_params():
-	conn = sqlite3.connect('hack.db')
+def latest_engine_params(conn):
 	cur = conn.cursor()
 	cur.execute('select generation from engine order by cr_date desc limit 1')
 
 	row = cur.fetchone()
 
-	conn.commit()
-	conn.close()
-
 	if row:
 		(gen, ) = row
 	else:
@@ -195,12 +215,18 @@ def latest_engine_params():
 	return gen
 
 
-def main():
-	gen = latest_engine_params()
+def render(conn):
+	gen = latest_engine_params(conn)
 	rules = ''.join([HEADER] + PROTOCOL_RULES[:(gen + 1)] + [FOOTER])
 	markdown = markdown2.markdown(rules)
 
-	print(Template(TEMPLATE).render(markdown=markdown, now=str(dt.datetime.now())))
+	return Template(TEMPLATE).render(markdown=markdown, now=str(dt.datetime.now()))
+
+
+def main():
+	conn = sqlite3.connect('hack.db')
+	print(render(conn))
+	conn.close()
 
 
 if __name__ == '__main__':
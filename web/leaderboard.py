@@ -4,6 +4,9 @@ import sqlite3
 
 from jinja2 import Template
 
+# Seconds webapp.py keeps this page: the last ten minutes move on even when no results come in.
+MAX_AGE = 30
+
 LEADERBOARD_QUERY = '''
 	select player, sum(max(0,elimination_round*3+10))
 	from tournament_results
@@ -109,9 +112,7 @@ TEMPLATE = '''<html>
 '''
 
 
-def main():
-	conn = sqlite3.connect('hack.db')
-
+def render(conn):
 	cur = conn.cursor()
 	cur.execute(LEADERBOARD_QUERY)
 	leaderboard = cur.fetchall()
@@ -129,12 +130,15 @@ def main():
 			tournament_result.append(', '.join(rounds[elimination_round]))
 		tournament_results.append({'tournament_id': tournament_id, 'elimination_rounds': tournament_result})
 
-	conn.commit()
-	conn.close()
-
 	template = Template(TEMPLATE)
 
-	print(template.render(leaderboard=leaderboard, official_leaderboard=official_leaderboard, tournament_results=tournament_results, now=str(dt.datetime.now())))
+	return template.render(leaderboard=leaderboard, official_leaderboard=official_leaderboard, tournament_results=tournament_results, now=str(dt.datetime.now()))
+
+
+def main():
+	conn = sqlite3.connect('hack.db')
+	print(render(conn))
+	conn.close()
 
 
 if __name__ == '__main__':
@@ -53,19 +53,19 @@ TEMPLATE = '''<html>
 </html>
 '''
 
-def main():
-	conn = sqlite3.connect('hack.db')
-
+def render(conn):
 	cur = conn.cursor()
 	cur.execute('select * from pairing_results order by cr_date desc limit 100')
 	results = cur.fetchall()
 
-	conn.commit()
-	conn.close()
-
 	template = Template(TEMPLATE)
 
-	print(template.render(results=results, now=str(dt.datetime.now())))
+	return template.render(results=results, now=str(dt.datetime.now()))
+
+def main():
+	conn = sqlite3.connect('hack.db')
+	print(render(conn))
+	conn.close()
 
 if __name__ == '__main__':
 	main()
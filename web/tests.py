@@ -233,6 +233,27 @@ PROTOCOL_RULES = ['''
 		p2_deck = ['P', 'S']
 		p2_deck.remove(p1_response['took'])
 		assert game.decks[1] == p2_deck
+	
+	
+	def test_gen3_game_t_protocol_2():
+		game = GameGen3(['p1', 'p2'], 2)
+		game.setup(0, {'ready': True, 'deck': ['R', 'T'], 'protocol': 2})
+		game.setup(1, {'ready': True, 'deck': ['P', 'S']})
+	
+		p1_header, p2_header = game.round_headers()
+		assert p1_header == {'idx': 0, 'round': 1, 'scores': [-0.0, 0]}
+		assert p2_header['deck'] == ['P', 'S']
+	
+		p1_response, p2_response = game.apply(['T', 'S'])
+		assert p1_response['played'] == 'S'
+		assert p1_response['payoffs'] == [0, 1]
+		assert p1_response['took'] in ('P', 'S')
+		assert 'lost' not in p1_response
+	
+		assert p2_response['hands'] == ['T', 'S']
+	
+		with pytest.raises(P1FoulException):
+			GameGen3(['p1', 'p2'], 2).setup(0, {'ready': True, 'deck': ['R', 'T'], 'protocol': 3})
 ''',
 ]
 
@@ -253,16 +274,12 @@ TEMPLATE = '''<html>
 '''
 
 
-def latest_engine_params():
-	conn = sqlite3.connect('hack.db')
+def latest_engine_params(conn):
 	cur = conn.cursor()
 	cur.execute('select generation from engine order by cr_date desc limit 1')
 
 	row = cur.fetchone()
 
-	conn.commit()
-	conn.close()
-
 	if row:
 		(gen, ) = row
 	else:
@@ -271,12 +288,18 @@ def latest_engine_params():
 	return gen
 
 
-def main():
-	gen = latest_engine_params()
+def render(conn):
+	gen = latest_engine_params(conn)
 	rules = ''.join([HEADER] + PROTOCOL_RULES[:(gen + 1)] + [FOOTER])
 	markdown = markdown2.markdown(rules)
 
-	print(Template(TEMPLATE).render(markdown=markdown, now=str(dt.datetime.now())))
+	return Template(TEMPLATE).render(markdown=markdown, now=str(dt.datetime.now()))
+
+
+def main():
+	conn = sqlite3.connect('hack.db')
+	print(render(conn))
+	conn.close()
 
 
 if __name__ == '__main__':
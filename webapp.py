@@ -0,0 +1,186 @@
+'''
+Serve the site on demand instead of regenerating `www/` after every tournament.
+
+Each page is one of the `web/*.py` scripts, rendered with `render(conn)` on a read-only connection from a small pool.
+Rendered pages are cached on the database's `PRAGMA data_version` and the engine generation, so a page is rendered at
+most once per change to `hack.db` however many people are looking, and not at all while nobody is. A script whose page
+also changes with the clock, like the leaderboard's last ten minutes, sets `MAX_AGE` in seconds, and its page is
+rendered again once it's that old even if nothing was written. Source dumps
+(`/<name>.zip`) are zipped on the fly from `snapshots.py`'s store, and anything else (logs, style.css) is served from
+`www/` as before.
+'''
+import argparse
+import contextlib
+import gzip
+import importlib.util
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import db
+import snapshots
+
+LOGGER = logging.getLogger(__name__)
+
+WEB_DIR = 'web'
+STATIC_DIR = 'www'
+
+POOL_SIZE = 4
+
+
+def load_views(path=WEB_DIR):
+	'''
+	`{'/name.html': module}` for every script in `path` with a `render(conn)`.
+	'''
+	views = {}
+	for entry in sorted(os.listdir(path)):
+		name, ext = os.path.splitext(entry)
+		if ext != '.py':
+			continue
+		spec = importlib.util.spec_from_file_location('web_' + name, os.path.join(path, entry))
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+		if hasattr(module, 'render'):
+			views['/%s.html' % (name, )] = module
+	return views
+
+
+class ConnectionPool:
+	def __init__(self, db_file, size=POOL_SIZE):
+		self.connections = queue.Queue()
+		for _ in range(size):
+			self.connections.put(self.connect(db_file))
+
+		# Only ever used under the lock, to see whether anyone has written to the database. A connection's data_version
+		# only changes when other connections commit, and it never writes, so that's every change.
+		self.lock = threading.Lock()
+		self.watcher = self.connect(db_file)
+		self.data_version = None
+		self.version = None
+
+	@staticmethod
+	def connect(db_file):
+		return sqlite3.connect('file:%s?mode=ro' % (db_file, ), uri=True, timeout=db.BUSY_TIMEOUT, check_same_thread=False)
+
+	@contextlib.contextmanager
+	def connection(self):
+		conn = self.connections.get()
+		try:
+			yield conn
+		finally:
+			self.connections.put(conn)
+
+	def current_version(self):
+		'''
+		`(data_version, engine generation)`; the generation is only looked up again after a change.
+		'''
+		with self.lock:
+			(data_version, ) = self.watcher.execute('pragma data_version').fetchone()
+			if data_version != self.data_version:
+				row = self.watcher.execute('select generation from engine order by cr_date desc limit 1').fetchone()
+				self.data_version = data_version
+				self.version = (data_version, row[0] if row else 0)
+			return self.version
+
+
+class PageCache:
+	def __init__(self, views, pool):
+		self.views = views
+		self.pool = pool
+		self.pages = {}
+		self.locks = {path: threading.Lock() for path in views}
+
+	def get(self, path):
+		'''
+		`(body, gzipped body)` of the page, rendering it if the database changed since it was last rendered.
+		'''
+		version = self.pool.current_version()
+		cached = self.pages.get(path)
+		if self.fresh(path, cached, version):
+			return cached[2:]
+
+		# One render per change: whoever gets the lock renders, everyone else waiting on it gets the result.
+		with self.locks[path]:
+			cached = self.pages.get(path)
+			if self.fresh(path, cached, version):
+				return cached[2:]
+
+			LOGGER.info('rendering %s for %r', path, version)
+			rendered = time.monotonic()
+			with self.pool.connection() as conn:
+				body = self.views[path].render(conn).encode()
+			# Compressed once here rather than on every request.
+			self.pages[path] = (version, rendered, body, gzip.compress(body))
+			return self.pages[path][2:]
+
+	def fresh(self, path, cached, version):
+		if cached is None or cached[0] != version:
+			return False
+		max_age = getattr(self.views[path], 'MAX_AGE', None)
+		return max_age is None or time.monotonic() - cached[1] < max_age
+
+
+class WebHandler(SimpleHTTPRequestHandler):
+	cache = None
+
+	def do_GET(self):
+		path = self.path.split('?', 1)[0]
+		if path == '/':
+			path = '/index.html'
+		if path.endswith('.zip') and path[1:-len('.zip')] in snapshots.names():
+			return self.send_snapshot(path[1:-len('.zip')])
+		if path not in self.cache.views:
+			return super().do_GET()
+
+		body, gzipped = self.cache.get(path)
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/html; charset=utf-8')
+		self.send_header('Vary', 'Accept-Encoding')
+		if 'gzip' in self.headers.get('Accept-Encoding', ''):
+			body = gzipped
+			self.send_header('Content-Encoding', 'gzip')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def send_snapshot(self, name):
+		# Streamed as it's zipped, so there's no length up front; the response ends when the connection closes.
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/zip')
+		self.send_header('Content-Disposition', 'attachment; filename="%s.zip"' % (name, ))
+		self.send_header('Connection', 'close')
+		self.end_headers()
+		snapshots.write_zip(name, self.wfile)
+		self.close_connection = True
+
+	def log_message(self, format, *args):
+		LOGGER.debug('%s - ' + format, self.address_string(), *args)
+
+
+def make_server(port, host='', db_file=None, views=None, static=STATIC_DIR):
+	views = load_views() if views is None else views
+	cache = PageCache(views, ConnectionPool(db_file or db.DB_FILE))
+	handler = type('Handler', (WebHandler, ), {'cache': cache})
+	return ThreadingHTTPServer((host, port), partial(handler, directory=static))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--port', type=int, default=8080)
+	parser.add_argument('--host', default='')
+	args = parser.parse_args()
+
+	server = make_server(args.port, args.host)
+	LOGGER.info('serving on port %d', args.port)
+	server.serve_forever()
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	main()
@@ -0,0 +1,228 @@
+'''
+Arena workers that share one `hack.db` through the `jobs` table.
+
+Producers enqueue tournaments or pairings, and any number of workers (on this host, or others sharing the filesystem)
+lease jobs, run them through `Engine` and record results with the usual `db` functions. A worker keeps its lease alive
+while a job runs; if it dies, the lease expires and another worker picks the job up. Results are saved in the same
+transaction as a check that the lease is still held, so a worker that lost it can't record the job twice.
+'''
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import tracemalloc
+
+import affinity
+from db import setupdb, latest_engine_params, enqueue_job, claim_job, renew_lease, complete_job, fail_job, LeaseLost
+from db import save_worker_jitter
+from engine import Engine, TIMEOUT
+
+LOGGER = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+
+# How often a worker measures its scheduling jitter, in seconds.
+JITTER_INTERVAL = 60
+
+
+def run_job(kind, payload, zygote=None, cores=None, lease=None, memory_cap=None):
+	engine = Engine(
+		payload['tournament_id'],
+		payload['gen'],
+		payload['rounds'],
+		zygote,
+		payload.get('best_of', 1),
+		cores,
+		memory_cap=memory_cap,
+		lease=lease,
+	)
+
+	if kind == 'tournament':
+		engine.run()
+	elif kind == 'pairing' and engine.best_of > 1:
+		engine.run_series(payload['players'])
+	elif kind == 'pairing':
+		engine.run_match(payload['players'])
+	else:
+		raise ValueError('unknown job kind: %r' % (kind, ))
+
+
+def keep_leased(job_id, worker, lease_seconds, done):
+	while not done.wait(lease_seconds / 3):
+		if not renew_lease(job_id, worker, lease_seconds):
+			LOGGER.warning('lost lease on job %d', job_id)
+			return
+
+
+def record_jitter(worker, cores):
+	# On the players' cores, from a thread of its own: the worker's threads are kept off them.
+	measured = []
+
+	def probe():
+		affinity.pin(0, cores)
+		measured.append(affinity.measure_jitter())
+
+	thread = threading.Thread(target=probe)
+	thread.start()
+	thread.join()
+
+	median, p99, maximum = measured[0]
+	LOGGER.info('%s jitter: median %.3fms, p99 %.3fms, max %.3fms', worker, median * 1000, p99 * 1000, maximum * 1000)
+	save_worker_jitter(worker, cores, median, p99, maximum)
+
+
+def work(worker, lease_seconds=LEASE_SECONDS, poll=1.0, once=False, zygote=None, cores=None, memory_cap=None):
+	last_jitter = None
+	while True:
+		if last_jitter is None or time.monotonic() - last_jitter >= JITTER_INTERVAL:
+			record_jitter(worker, cores)
+			last_jitter = time.monotonic()
+
+		job = claim_job(worker, lease_seconds)
+		if job is None:
+			if once:
+				return
+			time.sleep(poll)
+			continue
+
+		job_id, kind, payload = job
+		LOGGER.info('%s running job %d: %s %r', worker, job_id, kind, payload)
+
+		done = threading.Event()
+		heartbeat = threading.Thread(target=keep_leased, args=(job_id, worker, lease_seconds, done), daemon=True)
+		heartbeat.start()
+
+		try:
+			run_job(kind, payload, zygote, cores, (job_id, worker), memory_cap)
+
+		except LeaseLost:
+			# Another worker has the job now, and records its results instead.
+			LOGGER.warning('job %d abandoned, its lease was lost', job_id)
+			done.set()
+			continue
+
+		except Exception as e:
+			LOGGER.exception('job %d failed', job_id)
+			done.set()
+			fail_job(job_id, worker, repr(e))
+			continue
+
+		done.set()
+		if not complete_job(job_id, worker):
+			LOGGER.warning('job %d finished after its lease was lost', job_id)
+
+
+def run_worker(worker, lease_seconds, poll, once, processes, cores=None, reserved=None, memory_cap=None):
+	# The worker, its engine and DB writes, and the zygote, stay off the slot's cores, which are only for the players.
+	affinity.pin(0, reserved)
+
+	zygote = None
+	if processes:
+		from zygote import Zygote
+		zygote = Zygote(TIMEOUT)
+		zygote.start()
+	elif memory_cap:
+		# Threads are only measured while tracing, see `engine.PlayerThread`.
+		tracemalloc.start()
+	try:
+		work(worker, lease_seconds, poll, once, zygote, cores, memory_cap)
+	finally:
+		if zygote is not None:
+			zygote.stop()
+
+
+def run_pool(worker, lease_seconds, poll, once, processes, slots, reserve, memory_cap=None):
+	'''
+	Run a worker per match slot, each pinned to its own cores.
+	'''
+	plan = affinity.plan_slots(reserve=reserve)
+	if slots is not None:
+		plan = plan[:slots]
+	reserved = affinity.reserved_cores(reserve=reserve)
+	LOGGER.info('running %d workers on %r, players on %r', len(plan), reserved, plan)
+
+	workers = [
+		multiprocessing.Process(
+			target=run_worker,
+			args=('%s/%d' % (worker, i), lease_seconds, poll, once, processes, cores, reserved, memory_cap),
+		)
+		for i, cores in enumerate(plan)
+	]
+	for process in workers:
+		process.start()
+	for process in workers:
+		process.join()
+
+
+def engine_payload(tournament_id, best_of=1):
+	gen, rounds = latest_engine_params()
+	return {
+		'tournament_id': tournament_id,
+		'gen': gen,
+		'rounds': rounds,
+		'best_of': best_of,
+	}
+
+
+def megabytes(value):
+	return int(value * 2 ** 20) if value else None
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	run = commands.add_parser('run', help='lease and run jobs until stopped')
+	run.add_argument('--worker', default='%s:%d' % (socket.gethostname(), os.getpid()))
+	run.add_argument('--lease', type=float, default=LEASE_SECONDS, help='lease length in seconds')
+	run.add_argument('--poll', type=float, default=1.0, help='seconds to wait when the queue is empty')
+	run.add_argument('--once', action='store_true', help='exit once the queue is empty')
+	run.add_argument('--processes', action='store_true', help='run each player in a process forked from a zygote')
+	run.add_argument('--memory-cap', type=float, help='foul players that use more than this many MB')
+
+	pool = commands.add_parser('pool', help='run a pinned worker per free pair of cores')
+	pool.add_argument('--worker', default='%s:%d' % (socket.gethostname(), os.getpid()))
+	pool.add_argument('--lease', type=float, default=LEASE_SECONDS, help='lease length in seconds')
+	pool.add_argument('--poll', type=float, default=1.0, help='seconds to wait when the queue is empty')
+	pool.add_argument('--once', action='store_true', help='exit once the queue is empty')
+	pool.add_argument('--processes', action='store_true', help='run each player in a process forked from a zygote')
+	pool.add_argument('--memory-cap', type=float, help='foul players that use more than this many MB')
+	pool.add_argument('--slots', type=int, help='at most this many workers (default: as many as the cores allow)')
+	pool.add_argument('--reserve', type=int, default=affinity.RESERVED_CORES, help='cores to leave unpinned')
+
+	tournament = commands.add_parser('tournament', help='enqueue a whole tournament')
+	tournament.add_argument('tournament_id')
+	tournament.add_argument('--best-of', type=int, default=1, help='play pairings as a series of up to this many games')
+
+	pairings = commands.add_parser('pairings', help='enqueue every pairing of the current bots')
+	pairings.add_argument('tournament_id')
+	pairings.add_argument('--repeat', type=int, default=1)
+	pairings.add_argument('--best-of', type=int, default=1, help='play each pairing as a series of up to this many games')
+
+	args = parser.parse_args()
+
+	if args.command == 'run':
+		run_worker(args.worker, args.lease, args.poll, args.once, args.processes, memory_cap=megabytes(args.memory_cap))
+
+	elif args.command == 'pool':
+		run_pool(args.worker, args.lease, args.poll, args.once, args.processes, args.slots, args.reserve, megabytes(args.memory_cap))
+
+	elif args.command == 'tournament':
+		enqueue_job('tournament', engine_payload(args.tournament_id, args.best_of))
+
+	elif args.command == 'pairings':
+		payload = engine_payload(args.tournament_id, args.best_of)
+		players = sorted(Engine(args.tournament_id, payload['gen'], payload['rounds']).get_players())
+		for _ in range(args.repeat):
+			for player_names in itertools.combinations(players, 2):
+				enqueue_job('pairing', dict(payload, players=list(player_names)))
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=logging.INFO)
+	setupdb()
+	main()
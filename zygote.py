@@ -0,0 +1,334 @@
+'''
+Run players in their own processes without paying for imports on every match.
+
+The zygote is a separate, single threaded process that imports `game`, `bots.base` and every bot module once, then
+forks a child for each player the engine asks for. Children share the zygote's memory pages copy-on-write, so they are
+ready in milliseconds. The engine talks to each child over its own socket, with the same interface as `PlayerThread`.
+
+When the bot sources change (e.g. `arena.sh` pulled new code) the next spawn replaces the zygote with a fresh one.
+'''
+import array
+import json
+import logging
+import os
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from engine import BudgetExceeded, MEMORY_FOUL, charged_wait
+from game import P1FoulException, P2FoulException
+
+LOGGER = logging.getLogger(__name__)
+
+BOTS_DIR = 'bots'
+
+
+def bots_fingerprint(path=BOTS_DIR):
+	'''
+	Cheap change detection for the bot sources: file names, sizes and modification times.
+	'''
+	entries = []
+	for root, dirs, files in os.walk(path):
+		dirs[:] = sorted(x for x in dirs if x not in ('__pycache__', '.git'))
+		for name in sorted(files):
+			try:
+				stat = os.stat(os.path.join(root, name))
+			except FileNotFoundError:
+				continue
+			entries.append((os.path.join(root, name), stat.st_size, stat.st_mtime_ns))
+	return hash(tuple(entries))
+
+
+def proc_status(pid, field):
+	'''
+	A size from /proc/<pid>/status, such as VmHWM (peak RSS), in bytes; None if the process is gone.
+	'''
+	try:
+		with open('/proc/%s/status' % (pid, )) as f:
+			for line in f:
+				if line.startswith(field + ':'):
+					return int(line.split()[1]) * 1024
+	except (FileNotFoundError, ProcessLookupError):
+		return None
+
+
+class SocketQueue:
+	'''
+	Child side: stands in for both of a bot's queues, with one JSON message per line.
+	'''
+
+	def __init__(self, sock):
+		self.sock = sock
+		self.buffer = b''
+
+	def put(self, obj):
+		self.sock.sendall(json.dumps(obj).encode() + b'\n')
+
+	def get(self):
+		while b'\n' not in self.buffer:
+			data = self.sock.recv(65536)
+			if not data:
+				raise EOFError('engine went away')
+			self.buffer += data
+		line, self.buffer = self.buffer.split(b'\n', 1)
+		return json.loads(line)
+
+
+class PlayerProcess:
+	'''
+	Engine side: a player running in a child of the zygote, with the same interface as `engine.PlayerThread`.
+	'''
+
+	def __init__(self, player_num, player_name, sock, pid, timeout, baseline=0, memory_cap=None):
+		self.player_num = player_num
+		self.player_name = player_name
+		self.exception_class = [P1FoulException, P2FoulException][player_num - 1]
+		self.sock = sock
+		self.pid = pid
+		self.timeout = timeout
+		self.buffer = b''
+		self.latencies = []
+		self.cpu_times = []
+		self.mark = None
+		# The child starts out sharing the zygote's pages, so those don't count towards its peak.
+		self.baseline = baseline
+		self.memory_cap = memory_cap
+		self.peak_mem = None
+
+	def start(self):
+		# The zygote started the process already.
+		pass
+
+	def send(self, obj):
+		LOGGER.debug('sending %r to %d', obj, self.player_num)
+		self.sock.settimeout(self.timeout)
+		try:
+			self.sock.sendall(json.dumps(obj).encode() + b'\n')
+		except socket.timeout:
+			raise self.exception_class('timed out on write')
+		except OSError:
+			raise self.exception_class('exited')
+		self.mark = (time.perf_counter(), self.cpu_time())
+
+	def restart_wall_clock(self):
+		if self.mark is not None:
+			self.mark = (time.perf_counter(), self.mark[1])
+
+	def cpu_time(self):
+		# The CPU-time clock of another process: MAKE_PROCESS_CPUCLOCK(pid, CPUCLOCK_SCHED) in the Linux ABI.
+		try:
+			return time.clock_gettime((~self.pid << 3) | 2)
+		except OSError:
+			return None
+
+	def _read_line(self, timeout):
+		deadline = time.perf_counter() + timeout
+		while b'\n' not in self.buffer:
+			remaining = deadline - time.perf_counter()
+			if remaining <= 0:
+				raise socket.timeout()
+			self.sock.settimeout(remaining)
+			data = self.sock.recv(65536)
+			if not data:
+				return None
+			self.buffer += data
+		line, self.buffer = self.buffer.split(b'\n', 1)
+		return line
+
+	def receive(self):
+		start = self.mark or (time.perf_counter(), self.cpu_time())
+		self.mark = None
+		try:
+			line = charged_wait(self._read_line, socket.timeout, self.cpu_time, start, self.timeout)
+		except BudgetExceeded:
+			raise self.exception_class('timed out on read')
+		except OSError:
+			raise self.exception_class('exited')
+		finally:
+			self.latencies.append(time.perf_counter() - start[0])
+			cpu = self.cpu_time()
+			if cpu is not None and start[1] is not None:
+				self.cpu_times.append(cpu - start[1])
+
+		if line is None:
+			raise self.exception_class('exited')
+
+		try:
+			obj = json.loads(line)
+		except ValueError:
+			raise self.exception_class('invalid message')
+
+		LOGGER.debug('recv. %r from %d', obj, self.player_num)
+		self.check_memory(obj)
+		return obj
+
+	def check_memory(self, obj):
+		if obj == {'zygote': 'memory'}:
+			# Sent by `run_child` when the bot ran into its RLIMIT_AS.
+			raise self.exception_class(MEMORY_FOUL)
+
+		peak = proc_status(self.pid, 'VmHWM')
+		if peak is None:
+			return
+		self.peak_mem = max(self.peak_mem or 0, peak - self.baseline)
+		if self.memory_cap is not None and self.peak_mem > self.memory_cap:
+			raise self.exception_class(MEMORY_FOUL)
+
+	def join(self):
+		# The child closes its socket when run() returns.
+		try:
+			line = charged_wait(self._read_line, socket.timeout, self.cpu_time, budget=self.timeout)
+		except (BudgetExceeded, OSError):
+			raise self.exception_class('timed out on exit')
+		if line is not None:
+			raise self.exception_class('sent after the final round')
+
+	def pin(self, cores):
+		os.sched_setaffinity(self.pid, cores)
+
+	def close(self):
+		self.sock.close()
+		try:
+			os.kill(self.pid, signal.SIGKILL)
+		except ProcessLookupError:
+			pass
+
+	def __str__(self):
+		return "%s(%s, %s, pid=%s)" % (self.__class__.__name__, self.player_num, self.player_name, self.pid)
+
+
+class Zygote:
+	'''
+	Engine side handle on the zygote process. Thread safe, so players can be spawned while a match is running.
+	'''
+
+	def __init__(self, timeout):
+		self.timeout = timeout
+		self.lock = threading.Lock()
+		self.process = None
+		self.control = None
+		self.fingerprint = None
+
+	def start(self):
+		self.fingerprint = bots_fingerprint()
+		self.control, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+		self.process = subprocess.Popen(
+			[sys.executable, os.path.abspath(__file__), str(theirs.fileno()), str(logging.getLogger().getEffectiveLevel())],
+			pass_fds=[theirs.fileno()],
+		)
+		theirs.close()
+
+		# Wait until every bot is imported, so the first match doesn't pay for it.
+		ready = json.loads(self.control.recv(65536))
+		LOGGER.info('zygote %d ready: %r', self.process.pid, ready)
+
+	def stop(self):
+		if self.process is not None:
+			self.control.close()
+			self.process.wait()
+			self.process = None
+
+	def spawn(self, player_num, player_name, memory_cap=None):
+		with self.lock:
+			if self.process is None:
+				self.start()
+			elif bots_fingerprint() != self.fingerprint:
+				LOGGER.info('bot sources changed, restarting zygote')
+				self.stop()
+				self.start()
+
+			self.control.send(json.dumps({'player': player_name, 'memory_cap': memory_cap}).encode())
+			data, ancdata, _flags, _addr = self.control.recvmsg(65536, socket.CMSG_SPACE(array.array('i').itemsize))
+
+		response = json.loads(data)
+		if 'error' in response:
+			raise ImportError(response['error'])
+
+		[(_level, _type, fd_data)] = ancdata
+		fds = array.array('i')
+		fds.frombytes(fd_data[:fds.itemsize])
+		sock = socket.socket(fileno=fds[0])
+		return PlayerProcess(player_num, player_name, sock, response['pid'], self.timeout, response['rss'], memory_cap)
+
+
+def run_child(player_module, sock, memory_cap=None):
+	# Forked children start with the zygote's random state; don't let every player share it.
+	random.seed()
+
+	if memory_cap is not None:
+		# Address space, not RSS, is what an rlimit can cap; count the cap on top of what the zygote already mapped.
+		_soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+		resource.setrlimit(resource.RLIMIT_AS, (proc_status('self', 'VmSize') + memory_cap, hard))
+
+	channel = SocketQueue(sock)
+	try:
+		player_module.Player(channel, channel).run()
+		status = 0
+	except MemoryError:
+		try:
+			channel.put({'zygote': 'memory'})
+		except (MemoryError, OSError):
+			pass
+		status = 1
+	except:
+		LOGGER.exception('player crashed')
+		status = 1
+	finally:
+		sock.close()
+		logging.shutdown()
+	os._exit(status)
+
+
+def serve(control):
+	# Children are never waited for by the engine, so let the kernel reap them.
+	signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+	from engine import Engine
+
+	loaded = []
+	for player_name in Engine(None, 0, 0).get_players():
+		try:
+			Engine.load_module(player_name)
+			loaded.append(player_name)
+		except:
+			LOGGER.exception('zygote could not import %s', player_name)
+
+	control.send(json.dumps({'loaded': loaded}).encode())
+
+	while True:
+		request = control.recv(65536)
+		if not request:
+			return
+
+		request = json.loads(request)
+		player_name = request['player']
+		try:
+			player_module = Engine.load_module(player_name)
+		except Exception as e:
+			control.send(json.dumps({'error': repr(e)}).encode())
+			continue
+
+		ours, theirs = socket.socketpair()
+		rss = proc_status('self', 'VmRSS')
+		pid = os.fork()
+		if pid == 0:
+			control.close()
+			theirs.close()
+			run_child(player_module, ours, request.get('memory_cap'))
+
+		ours.close()
+		control.sendmsg(
+			[json.dumps({'pid': pid, 'rss': rss}).encode()],
+			[(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [theirs.fileno()]))],
+		)
+		theirs.close()
+
+
+if __name__ == '__main__':
+	logging.basicConfig(level=int(sys.argv[2]))
+	serve(socket.socket(fileno=int(sys.argv[1])))